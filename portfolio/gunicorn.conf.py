@@ -0,0 +1,10 @@
+import os
+from typing import Any
+
+from prometheus_client import multiprocess
+
+
+def child_exit(server: Any, worker: Any) -> None:  # pylint: disable=unused-argument
+    # Samples of live gauges from a dead worker must not be summed into /metrics anymore
+    if "PROMETHEUS_MULTIPROC_DIR" in os.environ:
+        multiprocess.mark_process_dead(worker.pid)
@@ -74,6 +74,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    "utils.middleware.MetricsMiddleware",
+    "utils.middleware.ServerTimingMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "corsheaders.middleware.CorsMiddleware",
     "whitenoise.middleware.WhiteNoiseMiddleware",
@@ -115,10 +117,68 @@ DATABASES = {
 DATABASE_URL = env("DATABASE_URL")
 
 # Vector Database
-VECTOR_DB_COLLECTION = env("VECTOR_DB_COLLECTION")
+VECTOR_DB_COLLECTION = env("VECTOR_DB_COLLECTION", default="")  # Of the former langchain store, copied into vex.Chunk
 VECTOR_TEXT_EMBEDDING_MODEL = env("VECTOR_TEXT_EMBEDDING_MODEL", default="text-embedding-3-small")
-VECTOR_USE_JSONB = env.bool("USE_JSONB", default=True)
 VECTOR_RETRIEVE_K = env.int("RETRIEVE_K", default=6)
+VECTOR_EMBEDDING_CACHE_SIZE = env.int("VECTOR_EMBEDDING_CACHE_SIZE", default=1024)  # In-process LRU entries
+VECTOR_HNSW_EF_SEARCH = env.int("VECTOR_HNSW_EF_SEARCH", default=40)  # Query-time candidate list, recall vs latency
+
+# Vector Ingestion (chunks of all injected documents are embedded in concurrent batches and inserted in bulk)
+VECTOR_EMBEDDING_BATCH_SIZE = env.int("VECTOR_EMBEDDING_BATCH_SIZE", default=128)  # Texts per embedding request
+VECTOR_EMBEDDING_BATCH_TOKENS = env.int("VECTOR_EMBEDDING_BATCH_TOKENS", default=100_000)  # Tokens per request
+VECTOR_EMBEDDING_CONCURRENCY = env.int("VECTOR_EMBEDDING_CONCURRENCY", default=4)  # Halved on every 429
+VECTOR_EMBEDDING_MAX_RETRIES = env.int("VECTOR_EMBEDDING_MAX_RETRIES", default=6)  # Of a rate limited batch
+VECTOR_INSERT_BATCH_SIZE = env.int("VECTOR_INSERT_BATCH_SIZE", default=500)  # Chunks per INSERT
+
+# Ingestion Jobs (documents are injected by `manage.py ingestion_worker`, saving a document queues it)
+INGESTION_POLL_INTERVAL = env.float("INGESTION_POLL_INTERVAL", default=2.0)  # Seconds between checks of idle queue
+INGESTION_LEASE = env.int("INGESTION_LEASE", default=300)  # Seconds a job may go without progress before reclaimed
+INGESTION_MAX_ATTEMPTS = env.int("INGESTION_MAX_ATTEMPTS", default=3)
+INGESTION_RETRY_DELAY = env.int("INGESTION_RETRY_DELAY", default=60)  # Seconds, multiplied by the attempts so far
+INGESTION_PARSE_WORKERS = env.int("INGESTION_PARSE_WORKERS", default=1)  # Processes parsing a long PDF, per worker
+INGESTION_PARSE_PAGES_PER_TASK = env.int("INGESTION_PARSE_PAGES_PER_TASK", default=32)  # Range of pages per process
+
+# RAG Diversity (the vector leg re-ranks its closest candidates by maximal marginal relevance)
+RAG_MMR_ENABLED = env.bool("RAG_MMR_ENABLED", default=True)
+RAG_MMR_FETCH_K = env.int("RAG_MMR_FETCH_K", default=20)  # Candidates fetched with their embeddings
+RAG_MMR_LAMBDA = env.float("RAG_MMR_LAMBDA", default=0.7)  # 1 is pure relevance, 0 pure diversity
+
+# RAG Retrieval (vector, lexical and relational legs run concurrently, each bounded by its own timeout in seconds)
+RAG_RETRIEVAL_WORKERS = env.int("RAG_RETRIEVAL_WORKERS", default=8)
+RAG_VECTOR_TIMEOUT = env.float("RAG_VECTOR_TIMEOUT", default=5.0)
+RAG_RELATIONAL_TIMEOUT = env.float("RAG_RELATIONAL_TIMEOUT", default=3.0)
+RAG_LEXICAL_TIMEOUT = env.float("RAG_LEXICAL_TIMEOUT", default=3.0)
+
+# RAG Hybrid Retrieval (full-text hits fused with the vector ones by reciprocal rank)
+RAG_HYBRID_ENABLED = env.bool("RAG_HYBRID_ENABLED", default=True)
+RAG_HYBRID_K = env.int("RAG_HYBRID_K", default=4)  # Chunks kept after fusion
+RAG_HYBRID_RRF_K = env.int("RAG_HYBRID_RRF_K", default=60)  # Damps the weight of the top ranks
+RAG_LEXICAL_K = env.int("RAG_LEXICAL_K", default=6)
+RAG_LEXICAL_CONFIGS = {"en": "english", "pl": "simple"}  # Text search config per locale, indexed by vex.Chunk
+
+# RAG Chain (rebuilt when the Configuration changes; its version is re-read at most every TTL seconds)
+RAG_CHAIN_VERSION_TTL = env.float("RAG_CHAIN_VERSION_TTL", default=0.0)
+
+# RAG History (prompt keeps the newest messages within the token budget, older ones are folded into a summary)
+RAG_TOKENIZER_MODEL = env("RAG_TOKENIZER_MODEL", default="gpt-4o-mini")
+RAG_HISTORY_TOKEN_BUDGET = env.int("RAG_HISTORY_TOKEN_BUDGET", default=1500)
+RAG_HISTORY_SUMMARY_ENABLED = env.bool("RAG_HISTORY_SUMMARY_ENABLED", default=True)
+RAG_HISTORY_SUMMARY_MODEL = env("RAG_HISTORY_SUMMARY_MODEL", default="gpt-4o-mini")
+RAG_HISTORY_SUMMARY_BATCH = env.int("RAG_HISTORY_SUMMARY_BATCH", default=3000)  # Tokens folded per summary update
+
+# RAG Context (retrieved passages are deduplicated, ranked and packed into a token budget, 0 disables the limit)
+RAG_CONTEXT_TOKEN_BUDGET = env.int("RAG_CONTEXT_TOKEN_BUDGET", default=2000)
+RAG_CONTEXT_TOKEN_BUDGETS = env.dict(  # Per locale overrides, e.g. "pl=2500,en=2000"
+    "RAG_CONTEXT_TOKEN_BUDGETS", cast={"value": int}, default={"pl": 2500}
+)
+RAG_CONTEXT_NEAR_DUPLICATE = env.float("RAG_CONTEXT_NEAR_DUPLICATE", default=0.8)  # Jaccard similarity of shingles
+
+# RAG Answer Cache (first-turn answers reused for questions within the cosine similarity threshold)
+RAG_ANSWER_CACHE_ENABLED = env.bool("RAG_ANSWER_CACHE_ENABLED", default=True)
+RAG_ANSWER_CACHE_THRESHOLD = env.float("RAG_ANSWER_CACHE_THRESHOLD", default=0.95)
+RAG_ANSWER_CACHE_TTL = env.int("RAG_ANSWER_CACHE_TTL", default=3600)  # Seconds
+RAG_ANSWER_CACHE_SIZE = env.int("RAG_ANSWER_CACHE_SIZE", default=256)
+RAG_SINGLE_FLIGHT_ENABLED = env.bool("RAG_SINGLE_FLIGHT_ENABLED", default=True)  # Identical questions share a stream
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -194,6 +254,21 @@ REST_FRAMEWORK = {
 # Own Variables
 OPENAI_API_KEY = env("OPENAI_API_KEY")
 
-# RAG Debugging
+# Chat Streaming (LLM tokens are coalesced into SSE frames of up to SSE_COALESCE_BYTES or SSE_COALESCE_DELAY seconds)
+SSE_COALESCE_BYTES = env.int("SSE_COALESCE_BYTES", default=256)
+SSE_COALESCE_DELAY = env.float("SSE_COALESCE_DELAY", default=0.02)
+SSE_HEARTBEAT_INTERVAL = env.float("SSE_HEARTBEAT_INTERVAL", default=5.0)  # Comment sent after this many idle seconds
+
+# Metrics (Prometheus format under /metrics/, behind a bearer token when set; multiple workers share
+# PROMETHEUS_MULTIPROC_DIR, which prometheus_client reads from the environment directly)
+METRICS_TOKEN = env("METRICS_TOKEN", default="")
+
+# Stage Timing (per request stages, p50/p95 computed over the latest STAGE_TIMING_WINDOW samples of each stage)
+STAGE_TIMING_WINDOW = env.int("STAGE_TIMING_WINDOW", default=1000)
+
+# RAG Debugging (contexts are written by a background thread into rotated JSONL.gz files, dropped when it lags)
 RAG_DUMP_CONTEXTS = env.bool("RAG_DUMP_CONTEXTS", default=DEBUG)
 RAG_CONTEXT_DUMP_DIR = env("RAG_CONTEXT_DUMP_DIR", default=str(BASE_DIR / "media" / "rag_contexts"))
+RAG_CONTEXT_DUMP_MAX_BYTES = env.int("RAG_CONTEXT_DUMP_MAX_BYTES", default=10 * 1024 * 1024)  # Uncompressed, per file
+RAG_CONTEXT_DUMP_MAX_FILES = env.int("RAG_CONTEXT_DUMP_MAX_FILES", default=20)
+RAG_CONTEXT_DUMP_QUEUE_SIZE = env.int("RAG_CONTEXT_DUMP_QUEUE_SIZE", default=1000)
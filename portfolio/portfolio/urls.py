@@ -24,6 +24,8 @@ from drf_spectacular.views import SpectacularAPIView, SpectacularRedocView
 
 # Used for building examples with translations in the documentation
 from utils.drf import ParlerTranslatedFieldsFieldExtension  # noqa: F401  # pylint: disable=unused-import
+from utils.metrics import metrics
+from utils.timing import stage_percentiles
 
 urlpatterns = [
     # Admin panel under /admin/ and make the home page redirect to /admin/
@@ -31,6 +33,8 @@ urlpatterns = [
     path("", RedirectView.as_view(url="/admin/", permanent=False)),
     # Healthcheck
     path("healthcheck/", include("health_check.urls")),
+    path("metrics/", metrics, name="metrics"),
+    path("metrics/stages/", stage_percentiles, name="metrics-stages"),
     # RestAPI
     path("api/schema/", SpectacularAPIView.as_view(), name="schema"),
     path("api/docs/", SpectacularRedocView.as_view(url_name="schema"), name="redoc"),
@@ -1,8 +1,9 @@
+from django.core.handlers.asgi import ASGIRequest
 from django.core.handlers.wsgi import WSGIRequest
 from rest_framework.request import Request
 
 
-def ensure_session(request: Request | WSGIRequest) -> str | None:
+def ensure_session(request: Request | WSGIRequest | ASGIRequest) -> str | None:
     if not request.session.session_key:
         request.session.create()
     return request.session.session_key
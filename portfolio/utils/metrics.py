@@ -0,0 +1,87 @@
+import hmac
+import os
+import threading
+from collections.abc import Callable
+from contextvars import ContextVar
+from typing import Any
+
+from django.conf import settings
+from django.db.backends.base.base import BaseDatabaseWrapper
+from django.db.backends.signals import connection_created
+from django.http import HttpRequest, HttpResponse
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    generate_latest,
+    multiprocess,
+)
+
+# With PROMETHEUS_MULTIPROC_DIR set, every worker writes its samples into that directory and /metrics aggregates them
+REQUEST_DURATION = Histogram(
+    "http_request_duration_seconds",
+    "Request latency, until the last byte of streamed responses",
+    ["view", "method"],
+)
+REQUEST_QUERIES = Histogram(
+    "http_request_db_queries",
+    "ORM queries executed per request",
+    ["view"],
+    buckets=(0, 1, 2, 5, 10, 20, 50, 100, float("inf")),
+)
+STAGE_DURATION = Histogram(
+    "vex_stage_duration_seconds",
+    "Duration of the chat pipeline stages (vector and relational are the retrievers)",
+    ["stage"],
+)
+SSE_STREAMS = Gauge("vex_sse_streams_active", "Chat streams currently open", multiprocess_mode="livesum")
+LLM_TOKENS = Counter("vex_llm_tokens_streamed", "Tokens streamed from the LLM")
+EMBEDDING_CACHE = Counter("vex_embedding_cache_lookups", "Query embedding lookups by outcome", ["result"])
+EMBEDDING_RATE_LIMITED = Counter("vex_embedding_rate_limited", "Embedding requests rejected with 429 and retried")
+
+
+class QueryCounter:
+    def __init__(self) -> None:
+        self.count = 0
+        self._lock = threading.Lock()  # Queries of one request may run on several threads
+
+    def increment(self) -> None:
+        with self._lock:
+            self.count += 1
+
+
+# Counter of the request being handled - copied into tasks and `sync_to_async` threads with the rest of the context
+current_queries: ContextVar[QueryCounter | None] = ContextVar("current_queries", default=None)
+
+
+def count_query(execute: Callable, sql: str, params: Any, many: bool, context: dict[str, Any]) -> Any:
+    if (counter := current_queries.get()) is not None:
+        counter.increment()
+    return execute(sql, params, many, context)
+
+
+def install_query_counter(connection: BaseDatabaseWrapper, **kwargs: Any) -> None:
+    if count_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(count_query)
+
+
+connection_created.connect(install_query_counter, dispatch_uid="utils.metrics.install_query_counter")
+
+
+def registry() -> CollectorRegistry:
+    if "PROMETHEUS_MULTIPROC_DIR" not in os.environ:
+        return REGISTRY
+    collected = CollectorRegistry()
+    multiprocess.MultiProcessCollector(collected)
+    return collected
+
+
+def metrics(request: HttpRequest) -> HttpResponse:
+    if settings.METRICS_TOKEN and not hmac.compare_digest(
+        request.headers.get("Authorization", "").encode(), f"Bearer {settings.METRICS_TOKEN}".encode()
+    ):
+        return HttpResponse(status=401)
+    return HttpResponse(generate_latest(registry()), content_type=CONTENT_TYPE_LATEST)
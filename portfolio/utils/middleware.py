@@ -0,0 +1,126 @@
+import time
+from collections.abc import AsyncIterator, Awaitable, Callable, Iterator
+from contextvars import Token
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.http import HttpRequest, HttpResponseBase, StreamingHttpResponse
+
+from utils.metrics import REQUEST_DURATION, REQUEST_QUERIES, QueryCounter, current_queries
+from utils.timing import StageTimer, current_timer
+
+
+class MetricsMiddleware:
+    """
+    Records the latency and the ORM query count of every request per URL name.
+    Streaming responses are measured until their last chunk was sent, or the client went away.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response: Callable) -> None:
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request: HttpRequest) -> HttpResponseBase | Awaitable[HttpResponseBase]:
+        if self.async_mode:
+            return self.__acall__(request)
+
+        counter = QueryCounter()
+        observe = self._observer(request, counter)
+        token = current_queries.set(counter)
+        response = self.get_response(request)
+        return self._finish(response, observe, token)
+
+    async def __acall__(self, request: HttpRequest) -> HttpResponseBase:
+        counter = QueryCounter()
+        observe = self._observer(request, counter)
+        token = current_queries.set(counter)
+        response = await self.get_response(request)
+        return self._finish(response, observe, token)
+
+    @staticmethod
+    def _observer(request: HttpRequest, counter: QueryCounter) -> Callable[[], None]:
+        started = time.monotonic()
+
+        def observe() -> None:
+            view = getattr(request.resolver_match, "view_name", "") or "unmatched"  # Keeps label cardinality bounded
+            REQUEST_DURATION.labels(view, request.method).observe(time.monotonic() - started)
+            REQUEST_QUERIES.labels(view).observe(counter.count)
+
+        return observe
+
+    def _finish(
+        self, response: HttpResponseBase, observe: Callable[[], None], token: Token[QueryCounter | None]
+    ) -> HttpResponseBase:
+        if isinstance(response, StreamingHttpResponse):
+            # The counter stays set, the queries of the stream run after the middleware returned
+            content = response.streaming_content
+            if isinstance(content, AsyncIterator):
+                response.streaming_content = self._observed_async(content, observe)
+            else:
+                response.streaming_content = self._observed_sync(content, observe)
+            return response
+
+        current_queries.reset(token)
+        observe()
+        return response
+
+    @staticmethod
+    def _observed_sync(content: Iterator[bytes], observe: Callable[[], None]) -> Iterator[bytes]:
+        try:
+            yield from content
+        finally:
+            observe()
+
+    @staticmethod
+    async def _observed_async(content: AsyncIterator[bytes], observe: Callable[[], None]) -> AsyncIterator[bytes]:
+        try:
+            async for part in content:
+                yield part
+        finally:
+            observe()
+
+
+class ServerTimingMiddleware:
+    """
+    Times every request with a StageTimer. JSON responses carry the stages in a `Server-Timing` header;
+    streaming responses produce their content after the middleware returned, so they finish the timer themselves.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response: Callable) -> None:
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request: HttpRequest) -> HttpResponseBase | Awaitable[HttpResponseBase]:
+        if self.async_mode:
+            return self.__acall__(request)
+
+        timer = StageTimer()
+        token = current_timer.set(timer)
+        response = self.get_response(request)
+        return self._finish(timer, token, response)
+
+    async def __acall__(self, request: HttpRequest) -> HttpResponseBase:
+        timer = StageTimer()
+        token = current_timer.set(timer)
+        response = await self.get_response(request)
+        return self._finish(timer, token, response)
+
+    @staticmethod
+    def _finish(timer: StageTimer, token: Token[StageTimer | None], response: HttpResponseBase) -> HttpResponseBase:
+        if response.streaming:  # The timer has to outlive the middleware for the content to be measured
+            return response
+
+        current_timer.reset(token)
+        timer.finish()
+        if response.get("Content-Type", "").startswith("application/json"):
+            response["Server-Timing"] = timer.server_timing()
+        return response
@@ -0,0 +1,82 @@
+import os
+import secrets
+import tempfile
+from unittest.mock import patch
+
+from django.http import HttpRequest, HttpResponse, StreamingHttpResponse
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from prometheus_client import REGISTRY
+
+from utils.metrics import registry
+from utils.middleware import MetricsMiddleware
+from work.tests.factories import SkillFactory
+
+
+def sample(name: str, **labels: str) -> float:
+    return REGISTRY.get_sample_value(name, labels) or 0.0
+
+
+class MetricsEndpointTestCase(TestCase):
+    def test_exposes_prometheus_text(self) -> None:
+        response = self.client.get(reverse("metrics"))
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response["Content-Type"].startswith("text/plain"))
+        for name in ("http_request_duration_seconds", "vex_sse_streams_active", "vex_llm_tokens_streamed_total"):
+            self.assertIn(name, response.content.decode())
+
+    def test_requires_token_when_configured(self) -> None:
+        token = secrets.token_urlsafe()
+        with override_settings(METRICS_TOKEN=token):
+            self.assertEqual(self.client.get(reverse("metrics")).status_code, 401)
+            response = self.client.get(reverse("metrics"), HTTP_AUTHORIZATION=f"Bearer {token[:-1]}")
+            self.assertEqual(response.status_code, 401)
+            response = self.client.get(reverse("metrics"), HTTP_AUTHORIZATION=f"Bearer {token}")
+            self.assertEqual(response.status_code, 200)
+
+    def test_aggregates_worker_files_in_multiprocess_mode(self) -> None:
+        with (
+            tempfile.TemporaryDirectory() as directory,
+            patch.dict(os.environ, {"PROMETHEUS_MULTIPROC_DIR": directory}),
+        ):
+            self.assertIsNot(registry(), REGISTRY)
+        self.assertIs(registry(), REGISTRY)
+
+
+class MetricsMiddlewareTestCase(TestCase):
+    def test_records_latency_and_queries_per_url_name(self) -> None:
+        SkillFactory.create_batch(2)
+        before = sample("http_request_db_queries_count", view="work:skills")
+        queries = sample("http_request_db_queries_sum", view="work:skills")
+
+        self.client.get(reverse("work:skills"))
+
+        self.assertEqual(sample("http_request_db_queries_count", view="work:skills"), before + 1)
+        self.assertGreater(sample("http_request_db_queries_sum", view="work:skills"), queries)
+        self.assertGreater(sample("http_request_duration_seconds_count", view="work:skills", method="GET"), 0)
+
+    def test_unresolved_requests_share_a_label(self) -> None:
+        before = sample("http_request_duration_seconds_count", view="unmatched", method="GET")
+        self.client.get("/does-not-exist/")
+        self.assertEqual(sample("http_request_duration_seconds_count", view="unmatched", method="GET"), before + 1)
+
+    def test_streaming_response_is_measured_when_consumed(self) -> None:
+        request = HttpRequest()
+        request.method = "GET"
+        before = sample("http_request_duration_seconds_count", view="unmatched", method="GET")
+
+        response = MetricsMiddleware(lambda _request: StreamingHttpResponse(iter([b"a", b"b"])))(request)
+        self.assertEqual(sample("http_request_duration_seconds_count", view="unmatched", method="GET"), before)
+
+        self.assertEqual(b"".join(response.streaming_content), b"ab")
+        self.assertEqual(sample("http_request_duration_seconds_count", view="unmatched", method="GET"), before + 1)
+
+    async def test_async_requests_are_measured(self) -> None:
+        async def view(_request: HttpRequest) -> HttpResponse:
+            return HttpResponse("ok")
+
+        request = HttpRequest()
+        request.method = "POST"
+        before = sample("http_request_duration_seconds_count", view="unmatched", method="POST")
+        await MetricsMiddleware(view)(request)
+        self.assertEqual(sample("http_request_duration_seconds_count", view="unmatched", method="POST"), before + 1)
@@ -0,0 +1,44 @@
+from django.http import HttpRequest, HttpResponse, JsonResponse, StreamingHttpResponse
+from django.test import SimpleTestCase
+from django.urls import reverse
+
+from utils.middleware import ServerTimingMiddleware
+from utils.timing import current_timer, timed
+
+
+def json_view(_request: HttpRequest) -> JsonResponse:
+    with timed("vector"):
+        pass
+    return JsonResponse({"ok": True})
+
+
+async def async_json_view(request: HttpRequest) -> JsonResponse:
+    return json_view(request)
+
+
+class ServerTimingMiddlewareTestCase(SimpleTestCase):
+    def test_json_response_gets_server_timing(self) -> None:
+        before = current_timer.get()
+        response = ServerTimingMiddleware(json_view)(HttpRequest())
+        self.assertRegex(response["Server-Timing"], r"^vector;dur=[\d.]+, total;dur=[\d.]+$")
+        self.assertIs(current_timer.get(), before)
+
+    async def test_async_json_response_gets_server_timing(self) -> None:
+        response = await ServerTimingMiddleware(async_json_view)(HttpRequest())
+        self.assertIn("total;dur=", response["Server-Timing"])
+
+    def test_other_responses_have_no_header(self) -> None:
+        response = ServerTimingMiddleware(lambda _request: HttpResponse("<html></html>"))(HttpRequest())
+        self.assertNotIn("Server-Timing", response)
+
+    def test_streaming_response_keeps_the_timer(self) -> None:
+        before = current_timer.get()
+        middleware = ServerTimingMiddleware(lambda _request: StreamingHttpResponse(iter(["a"])))
+        response = middleware(HttpRequest())
+        self.assertNotIn("Server-Timing", response)
+        self.assertIsNot(current_timer.get(), before)
+        current_timer.set(before)
+
+    def test_installed_for_api(self) -> None:
+        response = self.client.get(reverse("schema"), HTTP_ACCEPT="application/json")
+        self.assertIn("total;dur=", response["Server-Timing"])
@@ -0,0 +1,95 @@
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.test import SimpleTestCase, TestCase
+from django.urls import reverse
+
+from utils.timing import StageStats, StageTimer, current_timer, mark, stage_stats, timed
+
+
+class StageStatsTestCase(SimpleTestCase):
+    def test_summarizes_percentiles_in_milliseconds(self) -> None:
+        stats = StageStats(window=100)
+        for ms in range(1, 101):
+            stats.observe("vector", ms / 1000)
+        summary = stats.summary()["vector"]
+        self.assertEqual(summary["count"], 100)
+        self.assertAlmostEqual(summary["p50"], 50.5)
+        self.assertAlmostEqual(summary["p95"], 95.0, places=0)
+
+    def test_keeps_only_latest_window(self) -> None:
+        stats = StageStats(window=2)
+        for seconds in (10.0, 0.001, 0.001):
+            stats.observe("llm_ttft", seconds)
+        self.assertEqual(stats.summary()["llm_ttft"], {"count": 2, "p50": 1.0, "p95": 1.0})
+        stats.clear()
+        self.assertEqual(stats.summary(), {})
+
+
+class StagesEndpointTestCase(TestCase):
+    def setUp(self) -> None:
+        stage_stats.clear()
+        self.addCleanup(stage_stats.clear)
+
+    def test_staff_reads_percentiles_of_the_worker(self) -> None:
+        stage_stats.observe("vector", 0.012)
+        self.client.force_login(get_user_model().objects.create(username="staff", is_staff=True))
+
+        response = self.client.get(reverse("metrics-stages"))
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["stages"], {"vector": {"count": 1, "p50": 12.0, "p95": 12.0}})
+
+    def test_requires_staff(self) -> None:
+        self.assertEqual(self.client.get(reverse("metrics-stages")).status_code, 302)  # to the admin login
+        self.client.force_login(get_user_model().objects.create(username="visitor"))
+        self.assertEqual(self.client.get(reverse("metrics-stages")).status_code, 302)
+
+
+class StageTimerTestCase(SimpleTestCase):
+    def setUp(self) -> None:
+        self.stats = StageStats(window=10)
+        self.timer = StageTimer(stats=self.stats)
+
+    def test_repeated_stages_add_up(self) -> None:
+        with patch("utils.timing.time.monotonic", side_effect=[1.0, 1.5, 2.0, 2.25]):
+            with self.timer.stage("history"):
+                pass
+            with self.timer.stage("history"):
+                pass
+        self.assertEqual(self.timer.as_dict(), {"history": 750.0})
+
+    def test_since_mark(self) -> None:
+        self.timer.since("llm", "llm_ttft")  # no mark, nothing recorded
+        with patch("utils.timing.time.monotonic", side_effect=[10.0, 10.2]):
+            self.timer.mark("llm")
+            self.timer.since("llm", "llm_ttft")
+        self.assertEqual(self.timer.as_dict(), {"llm_ttft": 200.0})
+
+    def test_finish_records_total_and_stats_once(self) -> None:
+        self.timer.record("vector", 0.012)
+        self.timer.finish()
+        self.timer.finish()
+        self.assertIn("total", self.timer.stages)
+        self.assertEqual({stage: s["count"] for stage, s in self.stats.summary().items()}, {"vector": 1, "total": 1})
+
+    def test_server_timing_header(self) -> None:
+        self.timer.record("session", 0.0015)
+        self.timer.record("vector", 0.25)
+        self.assertEqual(self.timer.server_timing(), "session;dur=1.5, vector;dur=250.0")
+
+
+class TimedTestCase(SimpleTestCase):
+    def test_no_op_without_current_timer(self) -> None:
+        with timed("vector"):
+            mark("llm")
+
+    def test_records_on_current_timer(self) -> None:
+        timer = StageTimer(stats=StageStats(window=10))
+        token = current_timer.set(timer)
+        try:
+            with timed("vector"):
+                mark("llm")
+        finally:
+            current_timer.reset(token)
+        self.assertEqual(list(timer.stages), ["vector"])
@@ -0,0 +1,122 @@
+import os
+import threading
+import time
+from collections import deque
+from collections.abc import Iterator
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+import numpy as np
+from django.conf import settings
+from django.contrib.admin.views.decorators import staff_member_required
+from django.http import HttpRequest, JsonResponse
+
+from utils.metrics import STAGE_DURATION
+
+
+class StageStats:
+    """Latest durations of every stage in a bounded window, summarized as percentiles (in milliseconds)."""
+
+    def __init__(self, *, window: int) -> None:
+        self.window = window
+
+        self._samples: dict[str, deque[float]] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, stage: str, seconds: float) -> None:
+        with self._lock:
+            self._samples.setdefault(stage, deque(maxlen=self.window)).append(seconds * 1000)
+
+    def summary(self) -> dict[str, dict[str, float]]:
+        with self._lock:
+            samples = {stage: list(values) for stage, values in self._samples.items()}
+        return {
+            stage: {
+                "count": len(values),
+                "p50": round(float(np.percentile(values, 50)), 1),
+                "p95": round(float(np.percentile(values, 95)), 1),
+            }
+            for stage, values in samples.items()
+        }
+
+    def clear(self) -> None:
+        with self._lock:
+            self._samples.clear()
+
+
+stage_stats = StageStats(window=settings.STAGE_TIMING_WINDOW)
+
+
+@staff_member_required
+def stage_percentiles(request: HttpRequest) -> JsonResponse:  # pylint: disable=unused-argument
+    # Of the worker process serving the request - the Prometheus histograms under /metrics/ add up all of them
+    return JsonResponse({"pid": os.getpid(), "window": stage_stats.window, "stages": stage_stats.summary()})
+
+
+class StageTimer:
+    """Durations of the stages of one request, measured with a monotonic clock. Repeated stages add up."""
+
+    def __init__(self, stats: StageStats = stage_stats) -> None:
+        self.stats = stats
+        self.started = time.monotonic()
+        self.stages: dict[str, float] = {}
+
+        self._marks: dict[str, float] = {}
+        self._finished = False
+        self._lock = threading.Lock()  # Stages are recorded from the retrieval threads as well
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        started = time.monotonic()
+        try:
+            yield
+        finally:
+            self.record(name, time.monotonic() - started)
+
+    def record(self, name: str, seconds: float) -> None:
+        with self._lock:
+            self.stages[name] = self.stages.get(name, 0.0) + seconds
+
+    def mark(self, name: str) -> None:
+        self._marks[name] = time.monotonic()
+
+    def since(self, start: str, name: str) -> None:
+        if (started := self._marks.get(start)) is not None:
+            self.record(name, time.monotonic() - started)
+
+    def finish(self) -> None:
+        """Record the total and feed all stages into the stats, once."""
+        with self._lock:
+            if self._finished:
+                return
+            self._finished = True
+            self.stages["total"] = time.monotonic() - self.started
+            stages = dict(self.stages)
+        for name, seconds in stages.items():
+            self.stats.observe(name, seconds)
+            STAGE_DURATION.labels(name).observe(seconds)
+
+    def as_dict(self) -> dict[str, float]:
+        with self._lock:
+            return {name: round(seconds * 1000, 1) for name, seconds in self.stages.items()}
+
+    def server_timing(self) -> str:
+        return ", ".join(f"{name};dur={ms}" for name, ms in self.as_dict().items())
+
+
+# Timer of the request being handled - copied into tasks and `sync_to_async` threads with the rest of the context
+current_timer: ContextVar[StageTimer | None] = ContextVar("current_timer", default=None)
+
+
+@contextmanager
+def timed(name: str) -> Iterator[None]:
+    if (timer := current_timer.get()) is None:
+        yield
+        return
+    with timer.stage(name):
+        yield
+
+
+def mark(name: str) -> None:
+    if (timer := current_timer.get()) is not None:
+        timer.mark(name)
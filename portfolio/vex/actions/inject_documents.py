@@ -1,27 +1,202 @@
+import hashlib
 import logging
+import time
+from collections import defaultdict
+from collections.abc import Callable, Iterable, Iterator
+from dataclasses import dataclass
 
+from django.conf import settings
 from django.contrib import admin
 from django.contrib.admin import ModelAdmin
+from django.db import transaction
 from django.db.models import QuerySet
 from django.http import HttpRequest
 from django.utils.translation import gettext_lazy as _
 from langchain_core.documents import Document
 from langchain_text_splitters import RecursiveCharacterTextSplitter
 
+from vex.ai.database.store import ChunkStore, content_digest
 from vex.ai.database.vector import store
+from vex.ai.tokens import count_tokens
+from vex.models import Chunk, ContentVersion, IngestionJob
 from vex.models import Document as VexDocument
 from vex.utils.document_loader import DocumentLoader
 
 logger = logging.getLogger(__name__)
 
 
-@admin.action(description=_("Inject Document(s) to Vector Database"))
-def run_inject_documents(model_admin: ModelAdmin, request: HttpRequest, queryset: QuerySet) -> None:
+@admin.action(description=_("Queue Document(s) for Injection"))
+def queue_inject_documents(model_admin: ModelAdmin, request: HttpRequest, queryset: QuerySet) -> None:
+    # Injected by the ingestion workers, never within the admin request
     for document in queryset:
-        injector = InjectDocument(document=document)
-        injector.inject()
+        IngestionJob.enqueue(document)
 
-    model_admin.message_user(request, _("Document(s) injected successfully."))
+    model_admin.message_user(request, _("%(count)d document(s) queued for injection.") % {"count": len(queryset)})
+
+
+@dataclass
+class InjectionReport:
+    documents: int
+    chunks: int  # Embedded
+    reused: int  # Unchanged, embedded before
+    removed: int
+    tokens: int
+    seconds: float
+
+    @property
+    def chunks_per_second(self) -> float:
+        return self.chunks / self.seconds if self.seconds else 0.0
+
+    @property
+    def tokens_per_second(self) -> float:
+        return self.tokens / self.seconds if self.seconds else 0.0
+
+
+@dataclass
+class Injection:
+    """
+    A document to inject: its chunks, streamed as its source is read, and its stored chunks by the digest of their text.
+    A stored chunk is kept for one chunk of the same text (a text may repeat), the ones left once read are stale.
+    """
+
+    document: VexDocument
+    digest: str
+    chunks: Iterator[Document]
+    stored: dict[str, list[int]]
+    loaded: Callable[[], float]  # Part of the source read so far, 0-1
+
+    @classmethod
+    def of(
+        cls, document: VexDocument, digest: str, chunks: Iterable[Document], loaded: Callable[[], float] = lambda: 1.0
+    ) -> "Injection":
+        stored: dict[str, list[int]] = defaultdict(list)
+        for pk, chunk_digest in document.chunks.values_list("pk", "digest"):
+            stored[chunk_digest].append(pk)
+        return cls(document=document, digest=digest, chunks=iter(chunks), stored=stored, loaded=loaded)
+
+    def keep(self, chunk: Document) -> Chunk | None:
+        """The stored chunk of the same text, moved to the chunk's position and metadata. None when the text is new."""
+        if pks := self.stored.get(content_digest(chunk.page_content)):
+            kept = ChunkStore.to_chunk(chunk.page_content, chunk.metadata, vector=None)
+            kept.pk = pks.pop()
+            return kept
+        return None
+
+    @property
+    def stale(self) -> list[int]:
+        return [pk for pks in self.stored.values() for pk in pks]
+
+
+class ChunkWriter:
+    """Buffers the chunks of injected documents: new ones are embedded and inserted, kept ones updated, in batches."""
+
+    def __init__(self, vector_store: ChunkStore) -> None:
+        self.vector_store = vector_store
+        self.new: list[Document] = []
+        self.kept: list[Chunk] = []
+
+        self.chunks = 0
+        self.reused = 0
+        self.tokens = 0
+
+    @property
+    def done(self) -> int:
+        return self.chunks + self.reused
+
+    def add(self, injection: Injection, chunk: Document) -> bool:
+        """Buffers the chunk, True when a full batch was written."""
+        if (kept := injection.keep(chunk)) is not None:
+            self.kept.append(kept)
+        else:
+            self.new.append(chunk)
+
+        # A slice of embedding batches keeps every concurrent request busy
+        if len(self.new) >= settings.VECTOR_EMBEDDING_BATCH_SIZE * settings.VECTOR_EMBEDDING_CONCURRENCY:
+            self.write_new()
+            return True
+        if len(self.kept) >= self.vector_store.batch_size:
+            self.write_kept()
+            return True
+        return False
+
+    def flush(self) -> None:
+        self.write_new()
+        self.write_kept()
+
+    def write_new(self) -> None:
+        if not self.new:
+            return
+        texts = [chunk.page_content for chunk in self.new]
+        vectors = self.vector_store.embeddings.embed_documents(texts)
+        self.vector_store.add_embeddings(texts, vectors, [chunk.metadata for chunk in self.new])
+        self.chunks += len(self.new)
+        self.tokens += sum(count_tokens(text, settings.VECTOR_TEXT_EMBEDDING_MODEL) for text in texts)
+        self.new = []
+
+    def write_kept(self) -> None:
+        if not self.kept:
+            return
+        Chunk.objects.bulk_update(self.kept, ["locale", "page", "offset", "metadata"])
+        self.reused += len(self.kept)
+        self.kept = []
+
+
+def inject_documents(
+    documents: Iterable[VexDocument],
+    *,
+    chunk_size: int = 1200,
+    chunk_overlap: int = 150,
+    on_progress: Callable[[int, int], None] | None = None,
+) -> InjectionReport:
+    """
+    Injects the documents as a stream: each source is read page by page and chunked as it goes, and new chunks are
+    embedded and inserted in fixed-size batches shared by the documents, so memory stays flat whatever their size.
+    Chunks of the same text embedded before are kept, the ones gone are removed once all documents were read.
+    A failed injection leaves the chunks written so far, the next attempt keeps them instead of embedding them again.
+    `on_progress` is called with the chunks done so far and an estimate of their total after every batch.
+    """
+    started = time.monotonic()
+    injectors = [
+        InjectDocument(document=document, chunk_size=chunk_size, chunk_overlap=chunk_overlap) for document in documents
+    ]
+    injections = [injection for injector in injectors if (injection := injector.prepare()) is not None]
+
+    writer = ChunkWriter(store())
+    for position, injection in enumerate(injections):
+        for chunk in injection.chunks:
+            if writer.add(injection, chunk) and on_progress is not None:
+                loaded = (position + injection.loaded()) / len(injections)
+                on_progress(writer.done, max(writer.done, round(writer.done / loaded)) if loaded else writer.done)
+    writer.flush()
+
+    with transaction.atomic():
+        removed, _ = Chunk.objects.filter(pk__in=[pk for injection in injections for pk in injection.stale]).delete()
+        for injection in injections:
+            injection.document.mark_as_injected(injection.digest)
+    if injections:
+        ContentVersion.bump()  # Marked by an update, which sends no signal
+    if on_progress is not None:
+        on_progress(writer.done, writer.done)
+
+    report = InjectionReport(
+        documents=len(injections),
+        chunks=writer.chunks,
+        reused=writer.reused,
+        removed=removed,
+        tokens=writer.tokens,
+        seconds=time.monotonic() - started,
+    )
+    logger.info(
+        "Injected %s documents, %s chunks (%s reused, %s removed) in %.1fs (%.1f chunks/s, %.0f tokens/s)",
+        report.documents,
+        report.chunks,
+        report.reused,
+        report.removed,
+        report.seconds,
+        report.chunks_per_second,
+        report.tokens_per_second,
+    )
+    return report
 
 
 class InjectDocument:
@@ -34,45 +209,56 @@ class InjectDocument:
         self._chunk_overlap = chunk_overlap
 
     def inject(self) -> None:
+        inject_documents([self.document], chunk_size=self._chunk_size, chunk_overlap=self._chunk_overlap)
+
+    def prepare(self) -> Injection | None:
+        """The document with its chunks to stream, None when there is nothing to inject."""
         logger.info("Injecting Document %s", self.document.pk)
 
-        if self.document.injected:
+        if (digest := self.digest()) is None:
+            logger.error("Document %s does not contain any content", self.document.pk)
+            return None
+
+        if self.document.injected and digest == self.document.digest:
             logger.info("Document %s already injected", self.document.pk)
-            return
+            return None
 
         if file := self.document.file:
             logger.debug("Injecting Document from a file: %s", file)
-            loader = self.DOCUMENT_LOADER(path=file.path)
-            raw = loader.load()
-        elif url := self.document.url:
-            logger.debug("Injecting Document from an URL: %s", url)
-            raw = [Document(page_content=f"URL: {url}", metadata={"source": url})]
-        else:
-            logger.error("Document %s does not contain any content", self.document.pk)
-            return
-
-        self._make_injection(raw=raw)
+            loader = self.DOCUMENT_LOADER(
+                path=file.path,
+                workers=settings.INGESTION_PARSE_WORKERS,
+                pages_per_task=settings.INGESTION_PARSE_PAGES_PER_TASK,
+            )
+            return Injection.of(self.document, digest, self._chunks(loader.lazy_load()), lambda: loader.loaded)
 
-        logger.info("Injected Document %s", self.document.pk)
-        self.document.mark_as_injected()
+        url = self.document.url
+        logger.debug("Injecting Document from an URL: %s", url)
+        placeholder = Document(page_content=f"URL: {url}", metadata={"source": url})
+        return Injection.of(self.document, digest, self._chunks([placeholder]))
 
-    def _make_injection(self, raw: list[Document]) -> None:
-        logger.debug("#%s Documents loaded", len(raw))
-
-        for d in raw:
-            d.metadata = {**(d.metadata or {}), "document_pk": self.document.pk, "title": self.document.title}
-
-        chunks = self._chunk(raw=raw)
-        logger.debug("#%s Chunks prepared", len(raw))
-        if not chunks:
-            return
-
-        for c in chunks:
-            c.metadata = {**(c.metadata or {}), "locale": self.document.language}
-
-        vector_store = store()
-        vector_store.add_documents(chunks)
+    def digest(self) -> str | None:
+        """Digest of the document's source: the bytes of its file or its URL."""
+        digest = hashlib.sha256()
+        if file := self.document.file:
+            with file.open("rb"):
+                for block in file.chunks():
+                    digest.update(block)
+        elif url := self.document.url:
+            digest.update(url.encode("utf-8"))
+        else:
+            return None
+        return digest.hexdigest()
 
-    def _chunk(self, raw: list[Document]) -> list[Document]:
-        splitter = RecursiveCharacterTextSplitter(chunk_size=self._chunk_size, chunk_overlap=self._chunk_overlap)
-        return splitter.split_documents(list(raw))
+    def _chunks(self, pages: Iterable[Document]) -> Iterator[Document]:
+        splitter = RecursiveCharacterTextSplitter(
+            chunk_size=self._chunk_size, chunk_overlap=self._chunk_overlap, add_start_index=True
+        )
+        for page in pages:
+            # Sections of plain text start at an offset, their chunks' start index is in the whole text
+            offset = page.metadata.pop("offset", 0)
+            page.metadata = {**page.metadata, "document_pk": self.document.pk, "title": self.document.title}
+            for chunk in splitter.split_documents([page]):
+                start = chunk.metadata["start_index"] + offset
+                chunk.metadata = {**chunk.metadata, "start_index": start, "locale": self.document.language}
+                yield chunk
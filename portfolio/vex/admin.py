@@ -1,9 +1,11 @@
 from django.contrib import admin
+from django.http import HttpRequest
 from django.utils.translation import gettext_lazy as _
 from parler.admin import TranslatableAdmin
 
-from vex.actions.inject_documents import run_inject_documents
-from vex.models import Configuration, Conversation, Document, Message
+from vex.actions.inject_documents import queue_inject_documents
+from vex.choices import JobStatuses
+from vex.models import Configuration, Conversation, Document, IngestionJob, Message
 
 
 class MessageInline(admin.TabularInline):
@@ -31,6 +33,8 @@ class ConversationAdmin(admin.ModelAdmin):
     search_fields = ("session",)
     readonly_fields = (
         "session",
+        "summary",
+        "summarized_until",
         "created_at",
         "updated_at",
     )
@@ -43,12 +47,37 @@ class ConversationAdmin(admin.ModelAdmin):
         return obj.messages.count()
 
 
+class IngestionJobInline(admin.TabularInline):
+    model = IngestionJob
+    fields = (
+        "status",
+        "progress",
+        "attempts",
+        "error",
+        "created_at",
+        "finished_at",
+    )
+    readonly_fields = fields
+    ordering = ("-created_at",)
+    extra = 0
+    can_delete = False
+
+    def has_add_permission(self, request: HttpRequest, obj: Document | None = None) -> bool:
+        return False
+
+    @admin.display(description=_("Progress"))
+    def progress(self, obj: IngestionJob) -> str:
+        return f"{obj.progress}%"
+
+
 @admin.register(Document)
 class DocumentAdmin(admin.ModelAdmin):
     list_display = (
         "title",
         "language",
         "injected",
+        "ingestion",
+        "number_of_chunks",
         "created_at",
     )
     search_fields = (
@@ -60,10 +89,66 @@ class DocumentAdmin(admin.ModelAdmin):
         "updated_at",
     )
 
+    inlines = [
+        IngestionJobInline,
+    ]
+
     actions = [
-        run_inject_documents,
+        queue_inject_documents,
     ]
 
+    @admin.display(description=_("Ingestion"))
+    def ingestion(self, obj: Document) -> str:
+        if (job := obj.jobs.order_by("-created_at").first()) is None:
+            return "-"
+        return f"{job.get_status_display()} ({job.progress}%)"
+
+    @admin.display(description=_("Number of Chunks"))
+    def number_of_chunks(self, obj: Document) -> int:
+        return obj.chunks.count()
+
+
+@admin.register(IngestionJob)
+class IngestionJobAdmin(admin.ModelAdmin):
+    list_display = (
+        "document",
+        "status",
+        "progress",
+        "throughput",
+        "attempts",
+        "created_at",
+        "finished_at",
+    )
+    list_filter = ("status",)
+    search_fields = ("document__title",)
+    readonly_fields = (
+        "document",
+        "status",
+        "attempts",
+        "available_at",
+        "started_at",
+        "finished_at",
+        "chunks_total",
+        "chunks_done",
+        "tokens",
+        "error",
+        "created_at",
+        "updated_at",
+    )
+
+    def has_add_permission(self, request: HttpRequest) -> bool:
+        return False  # Queued by saving a document
+
+    @admin.display(description=_("Progress"))
+    def progress(self, obj: IngestionJob) -> str:
+        return f"{obj.progress}%"
+
+    @admin.display(description=_("Throughput"))
+    def throughput(self, obj: IngestionJob) -> str:
+        if not (seconds := obj.seconds) or obj.status != JobStatuses.DONE:
+            return "-"
+        return f"{obj.chunks_done / seconds:.1f} chunks/s, {obj.tokens / seconds:.0f} tokens/s"
+
 
 @admin.register(Configuration)
 class ConfigurationAdmin(TranslatableAdmin):
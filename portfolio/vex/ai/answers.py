@@ -0,0 +1,98 @@
+import itertools
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+
+import numpy as np
+from django.conf import settings
+
+
+@dataclass
+class CachedAnswer:
+    locale: str
+    version: str
+    embedding: np.ndarray
+    answer: str
+    expires_at: float
+
+
+class SemanticAnswerCache:
+    """
+    In-process cache of final answers, matched by cosine similarity of the question embeddings.
+    Entries are only comparable within the same locale and configuration version.
+    """
+
+    def __init__(self, *, threshold: float, ttl: float, maxsize: int) -> None:
+        self.threshold = threshold
+        self.ttl = ttl
+        self.maxsize = maxsize
+
+        self._entries: OrderedDict[int, CachedAnswer] = OrderedDict()
+        self._ids = itertools.count()
+        self._lock = threading.Lock()
+        self._counters = {"hits": 0, "misses": 0}
+
+    @property
+    def stats(self) -> dict[str, int]:
+        with self._lock:
+            return {**self._counters, "size": len(self._entries)}
+
+    def get(self, embedding: list[float], *, locale: str, version: str) -> str | None:
+        query = self._unit(embedding)
+        now = time.monotonic()
+
+        with self._lock:
+            self._purge(now)
+            candidates = [(key, e) for key, e in self._entries.items() if e.locale == locale and e.version == version]
+            if not candidates:
+                self._counters["misses"] += 1
+                return None
+
+            similarities = np.stack([e.embedding for _, e in candidates]) @ query
+            best = int(np.argmax(similarities))
+            if similarities[best] < self.threshold:
+                self._counters["misses"] += 1
+                return None
+
+            key, entry = candidates[best]
+            self._entries.move_to_end(key)
+            self._counters["hits"] += 1
+            return entry.answer
+
+    def set(self, embedding: list[float], answer: str, *, locale: str, version: str) -> None:
+        if not answer.strip() or self.maxsize <= 0:
+            return
+
+        entry = CachedAnswer(
+            locale=locale,
+            version=version,
+            embedding=self._unit(embedding),
+            answer=answer,
+            expires_at=time.monotonic() + self.ttl,
+        )
+        with self._lock:
+            self._entries[next(self._ids)] = entry
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def _purge(self, now: float) -> None:
+        for key in [key for key, e in self._entries.items() if e.expires_at <= now]:
+            del self._entries[key]
+
+    @staticmethod
+    def _unit(embedding: list[float]) -> np.ndarray:
+        vector = np.asarray(embedding, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+
+answer_cache = SemanticAnswerCache(
+    threshold=settings.RAG_ANSWER_CACHE_THRESHOLD,
+    ttl=settings.RAG_ANSWER_CACHE_TTL,
+    maxsize=settings.RAG_ANSWER_CACHE_SIZE,
+)
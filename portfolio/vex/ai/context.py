@@ -0,0 +1,147 @@
+import logging
+import re
+import threading
+from dataclasses import dataclass
+
+from django.conf import settings
+from langchain_core.documents import Document
+
+from vex.ai.database.relational import tokenize
+from vex.ai.tokens import count_tokens, truncate_tokens
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class Passage:
+    content: str
+    score: float
+    tokens: int
+    shingles: frozenset[str]
+
+
+@dataclass
+class PackedContext:
+    passages: list[str]
+    tokens: int
+    original_tokens: int
+    duplicates: int
+
+    @property
+    def saved_tokens(self) -> int:
+        return self.original_tokens - self.tokens
+
+    @property
+    def text(self) -> str:
+        return "\n\n".join(f"[{i + 1}] {passage}" for i, passage in enumerate(self.passages))
+
+
+class ContextPacker:
+    """
+    Packs retrieved passages into the prompt context: drops exact and near-duplicate passages,
+    orders the rest by relevance and cuts them off at the token budget of the locale.
+    """
+
+    SHINGLE_SIZE = 3
+    MIN_TRUNCATED_TOKENS = 32  # A shorter tail of a passage is not worth its place in the prompt
+
+    def __init__(self, *, budget: int, budgets: dict[str, int] | None = None, similarity: float) -> None:
+        self.budget = budget
+        self.budgets = budgets or {}
+        self.similarity = similarity
+
+        self._lock = threading.Lock()
+        self._counters = {"packed": 0, "tokens_in": 0, "tokens_out": 0, "duplicates": 0}
+
+    @property
+    def stats(self) -> dict[str, int]:
+        with self._lock:
+            return {**self._counters, "saved": self._counters["tokens_in"] - self._counters["tokens_out"]}
+
+    def budget_for(self, locale: str) -> int:
+        return self.budgets.get(locale, self.budget)
+
+    def pack(self, question: str, locale: str, documents: list[Document]) -> PackedContext:
+        terms = tokenize(question, locale)
+        passages = sorted(
+            (self._passage(d, terms) for d in documents if d.page_content.strip()),
+            key=lambda p: p.score,
+            reverse=True,
+        )
+
+        unique = self._deduplicate(passages)
+        packed = self._fit(unique, self.budget_for(locale))
+
+        result = PackedContext(
+            passages=packed,
+            tokens=sum(count_tokens(p) for p in packed),
+            original_tokens=sum(p.tokens for p in passages),
+            duplicates=len(passages) - len(unique),
+        )
+        with self._lock:
+            self._counters["packed"] += 1
+            self._counters["tokens_in"] += result.original_tokens
+            self._counters["tokens_out"] += result.tokens
+            self._counters["duplicates"] += result.duplicates
+
+        logger.info(
+            "Packed context (%s): %d of %d passages, %d -> %d tokens, %d saved, %d duplicates",
+            locale,
+            len(packed),
+            len(passages),
+            result.original_tokens,
+            result.tokens,
+            result.saved_tokens,
+            result.duplicates,
+        )
+        return result
+
+    def _passage(self, document: Document, terms: set[str]) -> Passage:
+        content = document.page_content.strip()
+        words = re.findall(r"\w+", content.lower())
+
+        # Vector hits carry their similarity; relational ones are scored by the share of question terms they contain
+        score = document.metadata.get("score")
+        if score is None:
+            score = len(terms.intersection(words)) / len(terms) if terms else 0.0
+
+        size = self.SHINGLE_SIZE
+        shingles = frozenset(" ".join(words[i : i + size]) for i in range(max(1, len(words) - size + 1)))
+        return Passage(content=content, score=float(score), tokens=count_tokens(content), shingles=shingles)
+
+    def _deduplicate(self, passages: list[Passage]) -> list[Passage]:
+        # Passages come best first, so of every group of duplicates the most relevant one is kept
+        kept: list[Passage] = []
+        for passage in passages:
+            if not any(self._jaccard(passage.shingles, other.shingles) >= self.similarity for other in kept):
+                kept.append(passage)
+        return kept
+
+    def _fit(self, passages: list[Passage], budget: int) -> list[str]:
+        if budget <= 0:  # No limit configured
+            return [p.content for p in passages]
+
+        packed: list[str] = []
+        used = 0
+        for passage in passages:
+            if used + passage.tokens <= budget:
+                packed.append(passage.content)
+                used += passage.tokens
+                continue
+            if (remaining := budget - used) >= self.MIN_TRUNCATED_TOKENS:
+                packed.append(truncate_tokens(passage.content, remaining))
+            break
+        return packed
+
+    @staticmethod
+    def _jaccard(a: frozenset[str], b: frozenset[str]) -> float:
+        if not a or not b:
+            return float(a == b)
+        return len(a & b) / len(a | b)
+
+
+context_packer = ContextPacker(
+    budget=settings.RAG_CONTEXT_TOKEN_BUDGET,
+    budgets=settings.RAG_CONTEXT_TOKEN_BUDGETS,
+    similarity=settings.RAG_CONTEXT_NEAR_DUPLICATE,
+)
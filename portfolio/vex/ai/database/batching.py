@@ -0,0 +1,138 @@
+import logging
+import random
+import threading
+import time
+from collections.abc import Iterator
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+from langchain_core.embeddings import Embeddings
+
+from utils.metrics import EMBEDDING_RATE_LIMITED
+from vex.ai.tokens import count_tokens
+
+logger = logging.getLogger(__name__)
+
+
+def is_rate_limited(error: Exception) -> bool:
+    # Status of the provider's HTTP error (openai.RateLimitError and alike), without depending on a client library
+    return getattr(error, "status_code", None) == 429
+
+
+def retry_after(error: Exception) -> float | None:
+    headers = getattr(getattr(error, "response", None), "headers", None) or {}
+    try:
+        return float(headers["retry-after"])
+    except (KeyError, TypeError, ValueError):
+        return None
+
+
+class AdaptiveLimit:
+    """
+    Limit of concurrent requests that halves whenever the provider rate limits and grows back by one
+    over as many successes as the current limit (additive increase, multiplicative decrease).
+    """
+
+    def __init__(self, maximum: int) -> None:
+        self.maximum = maximum
+        self.limit = float(maximum)
+
+        self._active = 0
+        self._condition = threading.Condition()
+
+    @contextmanager
+    def slot(self) -> Iterator[None]:
+        with self._condition:
+            self._condition.wait_for(lambda: self._active < int(self.limit))
+            self._active += 1
+        try:
+            yield
+        finally:
+            with self._condition:
+                self._active -= 1
+                self._condition.notify_all()
+
+    def decrease(self) -> None:
+        with self._condition:
+            self.limit = max(1.0, self.limit / 2)
+
+    def increase(self) -> None:
+        with self._condition:
+            self.limit = min(float(self.maximum), self.limit + 1 / self.limit)
+            self._condition.notify_all()
+
+
+class BatchedEmbeddings(Embeddings):
+    """
+    Document embeddings requested in batches bounded by texts and tokens, several batches at a time.
+    Batches still rate limited (429) after the client's own retries are retried after the provider's Retry-After
+    or an exponential backoff, and lower the number of concurrent batches until requests succeed again.
+    Queries are passed through, so chat requests never wait for ingestion.
+    """
+
+    def __init__(  # pylint: disable=too-many-arguments
+        self,
+        embeddings: Embeddings,
+        *,
+        model: str,
+        batch_size: int = 128,
+        batch_tokens: int = 100_000,
+        concurrency: int = 4,
+        max_retries: int = 6,
+        backoff: float = 1.0,
+    ) -> None:
+        self.embeddings = embeddings
+        self.model = model
+        self.batch_size = batch_size
+        self.batch_tokens = batch_tokens
+        self.max_retries = max_retries
+        self.backoff = backoff
+
+        self.limit = AdaptiveLimit(concurrency)  # Shared by all calls, a rate limit applies to the whole process
+
+    def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        batches = list(self.batches(texts))
+        if len(batches) <= 1:
+            return [vector for batch in batches for vector in self._embed_batch(batch)]
+
+        with ThreadPoolExecutor(max_workers=min(self.limit.maximum, len(batches))) as executor:
+            return [vector for vectors in executor.map(self._embed_batch, batches) for vector in vectors]
+
+    def embed_query(self, text: str) -> list[float]:
+        return self.embeddings.embed_query(text)
+
+    def batches(self, texts: list[str]) -> Iterator[list[str]]:
+        batch: list[str] = []
+        tokens = 0
+        for text in texts:
+            text_tokens = count_tokens(text, self.model)
+            if batch and (len(batch) >= self.batch_size or tokens + text_tokens > self.batch_tokens):
+                yield batch
+                batch, tokens = [], 0
+            batch.append(text)
+            tokens += text_tokens
+        if batch:
+            yield batch
+
+    def _embed_batch(self, texts: list[str]) -> list[list[float]]:
+        attempt = 0
+        while True:
+            try:
+                with self.limit.slot():
+                    vectors = self.embeddings.embed_documents(texts)
+            except Exception as error:  # pylint: disable=broad-exception-caught
+                if not is_rate_limited(error) or attempt >= self.max_retries:
+                    raise
+                EMBEDDING_RATE_LIMITED.inc()
+                self.limit.decrease()
+                delay = retry_after(error) or self.backoff * 2**attempt * random.uniform(0.5, 1.0)
+                logger.warning(
+                    "Embedding rate limited, retrying in %.1fs with up to %d concurrent requests",
+                    delay,
+                    int(self.limit.limit),
+                )
+                time.sleep(delay)
+                attempt += 1
+            else:
+                self.limit.increase()
+                return vectors
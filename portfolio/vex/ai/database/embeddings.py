@@ -0,0 +1,108 @@
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+
+from django.db import DatabaseError
+from langchain_core.embeddings import Embeddings
+
+from utils.metrics import EMBEDDING_CACHE
+from vex.models import CachedEmbedding
+
+logger = logging.getLogger(__name__)
+
+
+def normalize(text: str) -> str:
+    return " ".join((text or "").split()).casefold()
+
+
+class CachedEmbeddings(Embeddings):
+    """
+    Query embeddings cached in two tiers: an in-process LRU in front of a Postgres table.
+    Document embeddings (ingestion) are passed through to the wrapped model untouched.
+    """
+
+    def __init__(self, embeddings: Embeddings, *, model: str, maxsize: int = 1024) -> None:
+        self.embeddings = embeddings
+        self.model = model
+        self.maxsize = maxsize
+
+        self._memory: OrderedDict[str, list[float]] = OrderedDict()
+        self._lock = threading.Lock()
+        self._counters = {"memory_hits": 0, "database_hits": 0, "misses": 0}
+
+    @property
+    def stats(self) -> dict[str, int]:
+        with self._lock:
+            return {**self._counters, "size": len(self._memory)}
+
+    @property
+    def hit_ratio(self) -> float:
+        stats = self.stats
+        hits = stats["memory_hits"] + stats["database_hits"]
+        return hits / (hits + stats["misses"]) if hits + stats["misses"] else 0.0
+
+    def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        return self.embeddings.embed_documents(texts)
+
+    async def aembed_documents(self, texts: list[str]) -> list[list[float]]:
+        return await self.embeddings.aembed_documents(texts)
+
+    def embed_query(self, text: str) -> list[float]:
+        text = normalize(text)
+        digest = hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+        if (vector := self._from_memory(digest)) is not None:
+            self._count("memory_hits")
+            return vector
+
+        if (vector := self._from_database(digest)) is not None:
+            self._count("database_hits")
+            self._to_memory(digest, vector)
+            return vector
+
+        self._count("misses")
+        vector = self.embeddings.embed_query(text)
+        self._to_database(digest, text, vector)
+        self._to_memory(digest, vector)
+        return vector
+
+    def clear(self) -> None:
+        with self._lock:
+            self._memory.clear()
+            self._counters = dict.fromkeys(self._counters, 0)
+
+    def _count(self, counter: str) -> None:
+        with self._lock:
+            self._counters[counter] += 1
+        EMBEDDING_CACHE.labels(counter).inc()  # Shared across workers, unlike the counters above
+
+    def _from_memory(self, digest: str) -> list[float] | None:
+        with self._lock:
+            if (vector := self._memory.get(digest)) is not None:
+                self._memory.move_to_end(digest)
+            return vector
+
+    def _to_memory(self, digest: str, vector: list[float]) -> None:
+        with self._lock:
+            self._memory[digest] = vector
+            self._memory.move_to_end(digest)
+            while len(self._memory) > self.maxsize:
+                self._memory.popitem(last=False)
+
+    def _from_database(self, digest: str) -> list[float] | None:
+        try:
+            return (
+                CachedEmbedding.objects.filter(model=self.model, digest=digest).values_list("vector", flat=True).first()
+            )
+        except DatabaseError as exception:
+            logger.warning("Embedding cache lookup failed: %s", exception)
+            return None
+
+    def _to_database(self, digest: str, text: str, vector: list[float]) -> None:
+        try:
+            CachedEmbedding.objects.bulk_create(
+                [CachedEmbedding(model=self.model, digest=digest, text=text, vector=vector)], ignore_conflicts=True
+            )
+        except DatabaseError as exception:
+            logger.warning("Embedding cache write failed: %s", exception)
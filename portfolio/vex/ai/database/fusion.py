@@ -0,0 +1,21 @@
+from langchain_core.documents import Document
+
+
+def reciprocal_rank_fusion(*rankings: list[Document], limit: int, rrf_k: int = 60) -> list[Document]:
+    """
+    Fuses ranked lists by reciprocal rank: a chunk scores the sum of 1 / (rrf_k + rank) over the lists it appears in.
+    Chunks are identified by their text. The fused score is scaled to 0-1, 1 being first in every non-empty list.
+    """
+    scores: dict[str, float] = {}
+    documents: dict[str, Document] = {}
+    for ranking in rankings:
+        for rank, document in enumerate(ranking, start=1):
+            key = document.page_content
+            scores[key] = scores.get(key, 0.0) + 1.0 / (rrf_k + rank)
+            documents.setdefault(key, document)
+
+    best = sum(1 for ranking in rankings if ranking) / (rrf_k + 1)
+    fused = sorted(scores, key=lambda key: scores[key], reverse=True)[:limit]
+    return [
+        Document(page_content=key, metadata={**documents[key].metadata, "score": scores[key] / best}) for key in fused
+    ]
@@ -0,0 +1,41 @@
+import re
+
+from django.conf import settings
+from django.contrib.postgres.search import SearchQuery, SearchRank, SearchVector
+from langchain_core.documents import Document
+
+from vex.ai.database.store import ChunkStore
+from vex.models import Chunk
+
+
+def search_config(locale: str) -> str:
+    return settings.RAG_LEXICAL_CONFIGS.get(locale, "simple")
+
+
+def any_term(query: str) -> str:
+    """
+    The words of the question joined by OR, as a raw tsquery - a question rarely has all its words in one chunk,
+    so chunks with any of them match and the rank orders them by how many they have and how close.
+    """
+    return " | ".join(re.findall(r"\w+", query))
+
+
+def search_lexical(query: str, locale: str, k: int = settings.RAG_LEXICAL_K) -> list[Document]:
+    """Top-k chunks of the locale by full-text rank, with the rank as `score` metadata."""
+    if not (terms := any_term(query)):
+        return []
+    config = search_config(locale)
+    # Same expression and locale condition as the partial GIN index of the locale
+    vector = SearchVector("content", config=config)
+    # Each word is normalized by the config, stop words of the english config drop out of the query
+    search = SearchQuery(terms, config=config, search_type="raw")
+    chunks = (
+        Chunk.objects.filter(locale=locale)
+        .annotate(text=vector, rank=SearchRank(vector, search, cover_density=True))
+        .filter(text=search)
+        .order_by("-rank")[:k]
+    )
+    return [
+        Document(page_content=chunk.content, metadata={**ChunkStore.to_document(chunk).metadata, "score": chunk.rank})
+        for chunk in chunks
+    ]
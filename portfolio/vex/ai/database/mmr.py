@@ -0,0 +1,29 @@
+import numpy as np
+
+
+def maximal_marginal_relevance(query: np.ndarray, candidates: np.ndarray, *, k: int, lambda_mult: float) -> list[int]:
+    """
+    Indices of `k` candidates picked greedily by maximal marginal relevance: similar to the query,
+    dissimilar to the ones picked before. All similarities come from two matrix products up front;
+    each pick then only updates the running maximum similarity to the picked set.
+    """
+    count = min(k, len(candidates))
+    if count <= 0:
+        return []
+
+    candidates = candidates / np.maximum(np.linalg.norm(candidates, axis=1, keepdims=True), 1e-12)
+    query = query / max(float(np.linalg.norm(query)), 1e-12)
+    relevance = candidates @ query
+    similarity = candidates @ candidates.T
+
+    picked = [int(np.argmax(relevance))]
+    available = np.ones(len(candidates), dtype=bool)
+    available[picked[0]] = False
+    redundancy = similarity[picked[0]].copy()
+    while len(picked) < count:
+        scores = np.where(available, lambda_mult * relevance - (1 - lambda_mult) * redundancy, -np.inf)
+        best = int(np.argmax(scores))
+        picked.append(best)
+        available[best] = False
+        np.maximum(redundancy, similarity[best], out=redundancy)
+    return picked
@@ -0,0 +1,163 @@
+# pylint: disable=redefined-builtin  # `filter` is part of the VectorStore interface
+
+import hashlib
+from collections.abc import Callable, Iterable
+from typing import Any
+
+import numpy as np
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import QuerySet
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+from langchain_core.vectorstores import VectorStore
+from pgvector.django import CosineDistance
+
+from utils.timing import timed
+from vex.ai.database.mmr import maximal_marginal_relevance
+from vex.models import Chunk
+
+
+def content_digest(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+class ChunkStore(VectorStore):
+    """
+    Vector store over `vex.Chunk`, queried through Django's connection. Filters are Chunk lookups
+    (e.g. `{"locale": "en"}`), so they hit real columns and their indexes. `as_retriever()` works as for any store.
+    Metadata keys with a column of their own (`document_pk`, `locale`, `page`, `start_index`) are stored there.
+    Every chunk keeps the digest of its text, so unchanged chunks of a re-injected document keep their embedding.
+    """
+
+    def __init__(
+        self, embedding: Embeddings, *, ef_search: int = settings.VECTOR_HNSW_EF_SEARCH, batch_size: int = 500
+    ) -> None:
+        self.embedding = embedding
+        self.ef_search = ef_search
+        self.batch_size = batch_size
+
+    @property
+    def embeddings(self) -> Embeddings:
+        return self.embedding
+
+    @classmethod
+    def from_texts(
+        cls, texts: list[str], embedding: Embeddings, metadatas: list[dict] | None = None, **kwargs: Any
+    ) -> "ChunkStore":
+        store = cls(embedding, **kwargs)
+        store.add_texts(texts, metadatas)
+        return store
+
+    def add_texts(self, texts: Iterable[str], metadatas: list[dict] | None = None, **kwargs: Any) -> list[str]:
+        texts = list(texts)
+        return self.add_embeddings(texts, self.embedding.embed_documents(texts), metadatas)
+
+    def add_embeddings(
+        self, texts: list[str], embeddings: list[list[float]], metadatas: list[dict] | None = None
+    ) -> list[str]:
+        """Inserts chunks embedded beforehand, in bulk."""
+        chunks = [
+            self.to_chunk(text, metadata, vector)
+            for text, metadata, vector in zip(texts, metadatas or [{}] * len(texts), embeddings, strict=True)
+        ]
+        return [str(chunk.pk) for chunk in Chunk.objects.bulk_create(chunks, batch_size=self.batch_size)]
+
+    def delete(self, ids: list[str] | None = None, **kwargs: Any) -> bool | None:
+        if ids is None:
+            return None
+        Chunk.objects.filter(pk__in=ids).delete()
+        return True
+
+    def similarity_search(self, query: str, k: int = 4, filter: dict | None = None, **kwargs: Any) -> list[Document]:
+        return [document for document, _ in self.similarity_search_with_score(query, k, filter, **kwargs)]
+
+    def similarity_search_with_score(  # pylint: disable=arguments-differ
+        self, query: str, k: int = 4, filter: dict | None = None, **kwargs: Any
+    ) -> list[tuple[Document, float]]:
+        chunks = self.nearest(self.embedding.embed_query(query), k, filter, **kwargs)
+        return [(self.to_document(chunk), chunk.distance) for chunk in chunks]  # type: ignore[attr-defined]
+
+    def similarity_search_by_vector(
+        self, embedding: list[float], k: int = 4, filter: dict | None = None, **kwargs: Any
+    ) -> list[Document]:
+        return [self.to_document(chunk) for chunk in self.nearest(embedding, k, filter, **kwargs)]
+
+    def max_marginal_relevance_search(  # pylint: disable=too-many-arguments,too-many-positional-arguments
+        self,
+        query: str,
+        k: int = 4,
+        fetch_k: int = 20,
+        lambda_mult: float = 0.5,
+        filter: dict | None = None,
+        **kwargs: Any,
+    ) -> list[Document]:
+        results = self.max_marginal_relevance_search_with_score(query, k, fetch_k, lambda_mult, filter, **kwargs)
+        return [document for document, _ in results]
+
+    def max_marginal_relevance_search_with_score(  # pylint: disable=too-many-arguments,too-many-positional-arguments
+        self,
+        query: str,
+        k: int = 4,
+        fetch_k: int = 20,
+        lambda_mult: float = 0.5,
+        filter: dict | None = None,
+        **kwargs: Any,
+    ) -> list[tuple[Document, float]]:
+        """The `k` of the `fetch_k` closest chunks picked by maximal marginal relevance, with their distance."""
+        embedding = self.embedding.embed_query(query)
+        candidates = self.nearest(embedding, fetch_k, filter, **kwargs)
+        if not candidates:
+            return []
+
+        with timed("mmr"):
+            picked = maximal_marginal_relevance(
+                np.asarray(embedding, dtype=np.float32),
+                np.stack([candidate.embedding for candidate in candidates]),
+                k=k,
+                lambda_mult=lambda_mult,
+            )
+        return [(self.to_document(candidates[i]), candidates[i].distance) for i in picked]  # type: ignore[attr-defined]
+
+    def _select_relevance_score_fn(self) -> Callable[[float], float]:
+        return lambda distance: 1.0 - distance  # Cosine distance, 0 is the same direction
+
+    @staticmethod
+    def nearest_queryset(embedding: list[float], k: int, filter: dict | None = None) -> QuerySet[Chunk]:
+        return (
+            Chunk.objects.filter(**(filter or {}))
+            .annotate(distance=CosineDistance("embedding", embedding))
+            .order_by("distance")[:k]
+        )
+
+    def nearest(
+        self, embedding: list[float], k: int, filter: dict | None = None, *, ef_search: int | None = None
+    ) -> list[Chunk]:
+        with transaction.atomic(), connection.cursor() as cursor:
+            # The index scan returns at most ef_search rows, so it may never be lower than the chunks wanted
+            cursor.execute("SET LOCAL hnsw.ef_search = %s", [max(ef_search or self.ef_search, k)])
+            return list(self.nearest_queryset(embedding, k, filter))
+
+    @staticmethod
+    def to_chunk(text: str, metadata: dict, vector: list[float] | None) -> Chunk:
+        metadata = dict(metadata)
+        return Chunk(
+            document_id=metadata.pop("document_pk"),
+            locale=metadata.pop("locale"),
+            page=metadata.pop("page", None),
+            offset=metadata.pop("start_index", None),
+            content=text,
+            digest=metadata.pop("digest", None) or content_digest(text),
+            embedding=vector,
+            metadata=metadata,
+        )
+
+    @staticmethod
+    def to_document(chunk: Chunk) -> Document:
+        columns = {
+            "document_pk": chunk.document_id,
+            "locale": chunk.locale,
+            "page": chunk.page,
+            "start_index": chunk.offset,
+        }
+        return Document(id=str(chunk.pk), page_content=chunk.content, metadata={**chunk.metadata, **columns})
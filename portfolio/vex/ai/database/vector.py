@@ -1,20 +1,61 @@
 from functools import lru_cache
 
 from django.conf import settings
-from langchain_community.vectorstores import PGVector
-from langchain_core.vectorstores import VectorStoreRetriever
+from langchain_core.documents import Document
 from langchain_openai import OpenAIEmbeddings
 
+from vex.ai.database.batching import BatchedEmbeddings
+from vex.ai.database.embeddings import CachedEmbeddings
+from vex.ai.database.store import ChunkStore
+
 
 @lru_cache(maxsize=1)
-def store() -> PGVector:
-    return PGVector(
-        connection_string=settings.DATABASE_URL,
-        collection_name=settings.VECTOR_DB_COLLECTION,
-        embedding_function=OpenAIEmbeddings(model=settings.VECTOR_TEXT_EMBEDDING_MODEL),
-        use_jsonb=settings.VECTOR_USE_JSONB,
+def embeddings() -> CachedEmbeddings:
+    batched = BatchedEmbeddings(
+        OpenAIEmbeddings(model=settings.VECTOR_TEXT_EMBEDDING_MODEL),
+        model=settings.VECTOR_TEXT_EMBEDDING_MODEL,
+        batch_size=settings.VECTOR_EMBEDDING_BATCH_SIZE,
+        batch_tokens=settings.VECTOR_EMBEDDING_BATCH_TOKENS,
+        concurrency=settings.VECTOR_EMBEDDING_CONCURRENCY,
+        max_retries=settings.VECTOR_EMBEDDING_MAX_RETRIES,
+    )
+    return CachedEmbeddings(
+        batched,
+        model=settings.VECTOR_TEXT_EMBEDDING_MODEL,
+        maxsize=settings.VECTOR_EMBEDDING_CACHE_SIZE,
     )
 
 
-def retriever_topk(k: int = settings.VECTOR_RETRIEVE_K, _filter: dict | None = None) -> VectorStoreRetriever:
-    return store().as_retriever(search_type="similarity", search_kwargs={"k": k, "filter": (_filter or {})})
+@lru_cache(maxsize=1)
+def store() -> ChunkStore:
+    return ChunkStore(
+        embeddings(), ef_search=settings.VECTOR_HNSW_EF_SEARCH, batch_size=settings.VECTOR_INSERT_BATCH_SIZE
+    )
+
+
+def search_topk(query: str, k: int = settings.VECTOR_RETRIEVE_K, _filter: dict | None = None) -> list[Document]:
+    """Top-k documents closest to the query, with their relevance (0-1, higher is closer) as `score` metadata."""
+    results = store().similarity_search_with_relevance_scores(query, k=k, filter=(_filter or {}))
+    return [Document(page_content=d.page_content, metadata={**d.metadata, "score": score}) for d, score in results]
+
+
+def search_mmr(  # pylint: disable=too-many-arguments
+    query: str,
+    locale: str,
+    k: int = settings.VECTOR_RETRIEVE_K,
+    *,
+    fetch_k: int = settings.RAG_MMR_FETCH_K,
+    lambda_mult: float = settings.RAG_MMR_LAMBDA,
+    ef_search: int = settings.VECTOR_HNSW_EF_SEARCH,
+) -> list[Document]:
+    """
+    Top-k documents by maximal marginal relevance among the `fetch_k` closest ones, so overlapping chunks
+    (e.g. neighbours of the same page) do not crowd out the rest. Relevance is kept as `score` metadata.
+    """
+    results = store().max_marginal_relevance_search_with_score(
+        query, k=k, fetch_k=fetch_k, lambda_mult=lambda_mult, filter={"locale": locale}, ef_search=ef_search
+    )
+    return [
+        Document(page_content=d.page_content, metadata={**d.metadata, "score": 1.0 - distance})
+        for d, distance in results
+    ]
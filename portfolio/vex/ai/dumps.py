@@ -0,0 +1,129 @@
+import atexit
+import gzip
+import itertools
+import json
+import logging
+import os
+import queue
+import threading
+import uuid
+from datetime import datetime
+from pathlib import Path
+from typing import Any
+
+from django.conf import settings
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+
+class ContextDumpWriter:  # pylint: disable=too-many-instance-attributes
+    """
+    Writes RAG context dumps from a background thread into size-rotated, gzip-compressed JSONL files.
+    Records are handed over through a bounded queue - when it is full they are dropped and counted, never waited for.
+    """
+
+    PATTERN = "contexts-*.jsonl.gz"
+
+    def __init__(self, directory: str | Path, *, max_bytes: int, max_files: int, queue_size: int) -> None:
+        self.directory = Path(directory)
+        self.max_bytes = max_bytes
+        self.max_files = max_files
+
+        self._queue: queue.Queue[dict[str, Any] | None] = queue.Queue(maxsize=queue_size)
+        self._thread: threading.Thread | None = None
+        self._lock = threading.Lock()
+        self._counters = {"written": 0, "dropped": 0, "failed": 0, "files": 0}
+
+        self._file: gzip.GzipFile | None = None
+        self._file_bytes = 0
+        self._sequence = itertools.count()
+
+    @property
+    def stats(self) -> dict[str, int]:
+        with self._lock:
+            return {**self._counters, "queued": self._queue.qsize()}
+
+    def submit(self, record: dict[str, Any]) -> bool:
+        self._ensure_started()
+        try:
+            self._queue.put_nowait({"id": uuid.uuid4().hex, "created_at": timezone.now().isoformat(), **record})
+        except queue.Full:
+            self._count("dropped")
+            return False
+        return True
+
+    def close(self, timeout: float = 5.0) -> None:
+        """Write out the queued records and stop the writer thread."""
+        with self._lock:
+            thread, self._thread = self._thread, None
+        if thread is None:
+            return
+        try:
+            self._queue.put(None, timeout=timeout)
+        except queue.Full:
+            logger.warning("Context dump queue did not drain, stopping the writer without it")
+            return
+        thread.join(timeout)
+
+    def _ensure_started(self) -> None:
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="rag-context-dump", daemon=True)
+                self._thread.start()
+
+    def _run(self) -> None:
+        while (record := self._queue.get()) is not None:
+            try:
+                self._write(record)
+                if self._queue.empty() and self._file is not None:
+                    self._file.flush()  # Keeps the open file readable while the writer is idle
+            except Exception:  # pylint: disable=broad-exception-caught
+                logger.exception("Writing context dump %s failed", record["id"])
+                self._count("failed")
+        self._close_file()
+
+    def _write(self, record: dict[str, Any]) -> None:
+        line = (json.dumps(record, ensure_ascii=False, default=str) + "\n").encode("utf-8")
+        file = self._file
+        if file is None or (self._file_bytes and self._file_bytes + len(line) > self.max_bytes):
+            file = self._rotate()
+
+        file.write(line)
+        self._file_bytes += len(line)
+        self._count("written")
+
+    def _rotate(self) -> gzip.GzipFile:
+        self._close_file()
+        self.directory.mkdir(parents=True, exist_ok=True)
+
+        # Process id and sequence keep file names unique across workers and within the same second
+        name = f"contexts-{datetime.now():%Y%m%dT%H%M%S}-{os.getpid()}-{next(self._sequence):04d}.jsonl.gz"
+        self._file = file = gzip.GzipFile(self.directory / name, "wb")
+        self._file_bytes = 0
+        self._count("files")
+
+        if self.max_files > 0:
+            files = sorted(self.directory.glob(self.PATTERN), key=lambda p: (p.stat().st_mtime, p.name))
+            for path in files[: -self.max_files]:
+                path.unlink(missing_ok=True)
+
+        return file
+
+    def _close_file(self) -> None:
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def _count(self, counter: str) -> None:
+        with self._lock:
+            self._counters[counter] += 1
+
+
+context_dumps = ContextDumpWriter(
+    settings.RAG_CONTEXT_DUMP_DIR,
+    max_bytes=settings.RAG_CONTEXT_DUMP_MAX_BYTES,
+    max_files=settings.RAG_CONTEXT_DUMP_MAX_FILES,
+    queue_size=settings.RAG_CONTEXT_DUMP_QUEUE_SIZE,
+)
+atexit.register(context_dumps.close)
@@ -0,0 +1,86 @@
+import asyncio
+from collections.abc import AsyncIterator, Callable, Hashable
+
+
+class Flight:
+    """One in-flight answer: the chunks produced so far and the queues of everybody streaming it."""
+
+    def __init__(self) -> None:
+        self.chunks: list[str] = []
+        self.done = False
+        self.error: BaseException | None = None
+        self.task: asyncio.Task | None = None
+
+        self._subscribers: set[asyncio.Queue[str | None]] = set()
+
+    def publish(self, chunk: str) -> None:
+        self.chunks.append(chunk)
+        for queue in self._subscribers:
+            queue.put_nowait(chunk)
+
+    def finish(self, error: BaseException | None = None) -> None:
+        self.done = True
+        self.error = error
+        for queue in self._subscribers:
+            queue.put_nowait(None)
+
+    async def subscribe(self) -> AsyncIterator[str]:
+        """Replays the chunks produced so far, then follows the producer until it finishes."""
+        queue: asyncio.Queue[str | None] = asyncio.Queue()
+        backlog = list(self.chunks)  # Taken together with registering, nothing is published in between
+        self._subscribers.add(queue)
+        try:
+            for chunk in backlog:
+                yield chunk
+            if not self.done:  # Registered while producing, so the end is announced on the queue as well
+                while (published := await queue.get()) is not None:
+                    yield published
+            if self.error is not None:
+                raise self.error
+        finally:
+            self._subscribers.discard(queue)
+            if not self._subscribers and not self.done and self.task is not None:
+                # Nobody is listening anymore - stop the producer (and its LLM request) and let it clean up
+                self.task.cancel()
+                await asyncio.wait({self.task})
+
+
+class SingleFlight:
+    """
+    Runs at most one producer per key at a time. Whoever asks for a key that is already in flight
+    subscribes to its stream instead of producing the same answer again.
+    The producer runs in its own task, so it keeps going as long as anybody - not only its starter - listens.
+    """
+
+    def __init__(self) -> None:
+        self._flights: dict[Hashable, Flight] = {}
+
+    def __len__(self) -> int:
+        return len(self._flights)
+
+    def join(self, key: Hashable, produce: Callable[[], AsyncIterator[str]]) -> tuple[Flight, bool]:
+        """The flight for the key and whether this call started it."""
+        if (flight := self._flights.get(key)) is not None and not flight.done:
+            return flight, False
+
+        flight = self._flights[key] = Flight()
+        flight.task = asyncio.create_task(self._run(key, flight, produce))
+        return flight, True
+
+    async def _run(self, key: Hashable, flight: Flight, produce: Callable[[], AsyncIterator[str]]) -> None:
+        try:
+            async for chunk in produce():
+                flight.publish(chunk)
+        except asyncio.CancelledError:
+            flight.finish()
+            raise
+        except Exception as error:  # pylint: disable=broad-exception-caught
+            flight.finish(error)  # Raised to every subscriber
+        else:
+            flight.finish()
+        finally:
+            if self._flights.get(key) is flight:
+                del self._flights[key]
+
+
+single_flight = SingleFlight()
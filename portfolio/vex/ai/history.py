@@ -1,31 +1,185 @@
+import logging
+import threading
+from collections.abc import Sequence
+from concurrent.futures import ThreadPoolExecutor
+from functools import cached_property
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import close_old_connections, transaction
 from langchain_core.chat_history import BaseChatMessageHistory
+from langchain_core.language_models import BaseChatModel
 from langchain_core.messages import AIMessage, BaseMessage, HumanMessage, SystemMessage
+from langchain_core.prompts import ChatPromptTemplate
+from langchain_openai import ChatOpenAI
 
+from utils.timing import timed
+from vex.ai.tokens import count_tokens
 from vex.choices import Roles
 from vex.models import Conversation, Message
 
+logger = logging.getLogger(__name__)
+
+SUMMARY_PREFIX = "Summary of the earlier conversation:\n"
+SUMMARY_PROMPT = ChatPromptTemplate.from_messages(
+    [
+        (
+            "system",
+            "You maintain a running summary of a conversation between a visitor and an assistant. "
+            "Merge the new messages into the current summary. Keep names, facts, preferences and open questions, "
+            "drop small talk. Answer with the updated summary only, in at most 200 words, "
+            "in the language of the conversation.",
+        ),
+        ("user", "Current summary:\n{summary}\n\nNew messages:\n{messages}"),
+    ]
+)
+
+
+def to_langchain(message: Message) -> BaseMessage:
+    method: type[BaseMessage]
+    match message.role:
+        case Roles.USER:
+            method = HumanMessage
+        case Roles.ASSISTANT:
+            method = AIMessage
+        case _:
+            method = SystemMessage
+    return method(message.content)
+
+
+def split_window(conversation: Conversation, budget: int) -> tuple[list[Message], bool]:
+    """
+    Newest not yet summarized messages that fit into the token budget (in chronological order),
+    and whether older ones had to be left out. Messages are read newest first and only as far as needed.
+    """
+    window: list[Message] = []
+    used = 0
+
+    queryset = conversation.messages.order_by("-created_at", "-pk")
+    if conversation.summarized_until_id:
+        queryset = queryset.filter(pk__gt=conversation.summarized_until_id)
+
+    for message in queryset.iterator(chunk_size=32):
+        tokens = count_tokens(message.content)
+        if window and used + tokens > budget:
+            return window[::-1], True
+        window.append(message)
+        used += tokens
+
+    return window[::-1], False
+
+
+class HistorySummarizer:
+    def __init__(self, llm: BaseChatModel | None = None) -> None:
+        self._llm = llm
+
+    @property
+    def llm(self) -> BaseChatModel:
+        if self._llm is None:
+            self._llm = ChatOpenAI(model=settings.RAG_HISTORY_SUMMARY_MODEL, temperature=0)
+        return self._llm
+
+    def summarize(self, conversation_id: int) -> bool:
+        """Fold the oldest messages outside the history window into the conversation summary."""
+        if (conversation := Conversation.objects.filter(pk=conversation_id).first()) is None:
+            return False
+
+        window, overflowed = split_window(conversation, settings.RAG_HISTORY_TOKEN_BUDGET)
+        if not overflowed:
+            return False
+
+        batch = self._overflow_batch(conversation, before=window[0].pk)
+        response = self.llm.invoke(
+            SUMMARY_PROMPT.format_messages(
+                summary=conversation.summary or "-",
+                messages="\n".join(f"{m.role}: {m.content}" for m in batch),
+            )
+        )
+
+        # Compare-and-swap: a concurrent update of the same conversation wins, this pass is dropped
+        updated = Conversation.objects.filter(
+            pk=conversation.pk, summarized_until_id=conversation.summarized_until_id
+        ).update(summary=str(response.content).strip(), summarized_until=batch[-1])
+        return bool(updated)
+
+    @staticmethod
+    def _overflow_batch(conversation: Conversation, before: int) -> list[Message]:
+        batch: list[Message] = []
+        used = 0
+
+        queryset = conversation.messages.filter(pk__lt=before).order_by("created_at", "pk")
+        if conversation.summarized_until_id:
+            queryset = queryset.filter(pk__gt=conversation.summarized_until_id)
+
+        for message in queryset.iterator(chunk_size=32):
+            tokens = count_tokens(message.content)
+            if batch and used + tokens > settings.RAG_HISTORY_SUMMARY_BATCH:
+                break
+            batch.append(message)
+            used += tokens
+
+        return batch
+
+
+summarizer = HistorySummarizer()
+
+_summary_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="history-summary")
+_summarizing: set[int] = set()
+_summarizing_lock = threading.Lock()
+
+
+def schedule_summary(conversation_id: int) -> None:
+    if not settings.RAG_HISTORY_SUMMARY_ENABLED:
+        return
+    with _summarizing_lock:
+        if conversation_id in _summarizing:
+            return
+        _summarizing.add(conversation_id)
+    _summary_executor.submit(_run_summary, conversation_id)
+
+
+def _run_summary(conversation_id: int) -> None:
+    close_old_connections()
+    try:
+        summarizer.summarize(conversation_id)
+    except Exception:  # pylint: disable=broad-exception-caught
+        logger.exception("Summarizing conversation %s failed", conversation_id)
+    finally:
+        close_old_connections()
+        with _summarizing_lock:
+            _summarizing.discard(conversation_id)
+
 
 class MessageHistory(BaseChatMessageHistory):
     def __init__(self, session_key: str) -> None:
-        self.conversation, _ = Conversation.objects.get_or_create(session=session_key)
+        self.session_key = session_key
+
+    @cached_property
+    def conversation(self) -> Conversation:
+        # Resolved lazily, so the history can be constructed inside an event loop (async chain streaming)
+        conversation, _ = Conversation.objects.get_or_create(session=self.session_key)
+        return conversation
 
     @property
     def messages(self) -> list[BaseMessage]:  # type: ignore
-        out: list[BaseMessage] = []
+        with timed("history"):
+            window, overflowed = split_window(self.conversation, settings.RAG_HISTORY_TOKEN_BUDGET)
+        if overflowed:
+            schedule_summary(self.conversation.pk)
 
-        for message in self.conversation.messages.order_by("created_at").iterator():
-            method: type[BaseMessage]
-            match message.role:
-                case Roles.USER:
-                    method = HumanMessage
-                case Roles.ASSISTANT:
-                    method = AIMessage
-                case _:
-                    method = SystemMessage
-            out.append(method(message.content))
+        out: list[BaseMessage] = []
+        if self.conversation.summary:
+            out.append(SystemMessage(SUMMARY_PREFIX + self.conversation.summary))
+        out.extend(to_langchain(message) for message in window)
 
         return out
 
+    async def aget_messages(self) -> list[BaseMessage]:
+        return await sync_to_async(lambda: self.messages)()
+
+    def is_empty(self) -> bool:
+        return not self.conversation.messages.exists()
+
     def add_message(self, message: BaseMessage) -> None:
         match message.type:
             case "ai":
@@ -36,5 +190,12 @@ class MessageHistory(BaseChatMessageHistory):
                 role = Roles.SYSTEM
         Message.objects.create(conversation=self.conversation, role=role, content=str(message.content))
 
+    async def aadd_messages(self, messages: Sequence[BaseMessage]) -> None:
+        await sync_to_async(self.add_messages)(messages)
+
     def clear(self) -> None:
-        self.conversation.messages.all().delete()
+        # The summary folds in the deleted messages - dropped with them, so a cleared conversation starts over
+        with transaction.atomic():
+            self.conversation.summary, self.conversation.summarized_until = "", None
+            self.conversation.save(update_fields=["summary", "summarized_until"])
+            self.conversation.messages.all().delete()
@@ -1,21 +1,56 @@
-from collections.abc import Callable
+import asyncio
+import logging
+import re
+import threading
+import time
+from collections.abc import AsyncIterator, Callable, Iterator
+from concurrent.futures import Future, ThreadPoolExecutor
+from contextlib import aclosing
+from contextvars import copy_context
 from dataclasses import dataclass
 from datetime import datetime
-from operator import itemgetter
-from pathlib import Path
 from typing import Any
 
+from asgiref.sync import sync_to_async
 from django.conf import settings
+from django.db import close_old_connections
+from langchain_core.documents import Document
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage
 from langchain_core.output_parsers import StrOutputParser
 from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
-from langchain_core.runnables import RunnablePassthrough, RunnableSerializable
+from langchain_core.runnables import RunnableConfig, RunnableLambda, RunnablePassthrough, RunnableSerializable
 from langchain_core.runnables.history import RunnableWithMessageHistory
 from langchain_openai import ChatOpenAI
 
+from utils.metrics import LLM_TOKENS
+from utils.timing import mark, timed
+from vex.ai.answers import SemanticAnswerCache, answer_cache
+from vex.ai.context import context_packer
+from vex.ai.database.embeddings import normalize
+from vex.ai.database.fusion import reciprocal_rank_fusion
+from vex.ai.database.lexical import search_lexical
 from vex.ai.database.relational import RelationalContextGetter
-from vex.ai.database.vector import retriever_topk
+from vex.ai.database.vector import embeddings, search_mmr, search_topk
+from vex.ai.dumps import context_dumps
+from vex.ai.flights import SingleFlight, single_flight
 from vex.ai.history import MessageHistory
-from vex.models import Configuration
+from vex.models import Configuration, ContentVersion
+
+logger = logging.getLogger(__name__)
+
+TRUNCATED_MARKER = " [truncated]"  # Appended to answers the visitor disconnected from
+
+# Shared by all chains of the process: every chat turn runs its retrieval legs here side by side
+_retrieval_executor = ThreadPoolExecutor(max_workers=settings.RAG_RETRIEVAL_WORKERS, thread_name_prefix="rag-retrieval")
+
+
+def configuration_version(updated_at: datetime | None) -> str:
+    return updated_at.isoformat() if updated_at else "default"
+
+
+def current_configuration_version() -> str:
+    # Same row as RagChain._get_config, but only its timestamp - no model instance, no translations
+    return configuration_version(Configuration.objects.order_by("pk").values_list("updated_at", flat=True).first())
 
 
 @dataclass
@@ -35,16 +70,20 @@ class RagConfig:
 
 class RagChain:
     RELATIONAL_CONTEXT_GETTER = RelationalContextGetter
+    PROMPT_CACHE_SIZE = 16
 
     def __init__(self) -> None:
         self.config = self._get_config()
         self.llm = ChatOpenAI(model=self.config.model, temperature=self.config.temperature)
 
+        # Prompt templates compiled once per (configuration version, locale)
+        self._prompts: dict[tuple[str, str], ChatPromptTemplate] = {}
+
     @staticmethod
     def _get_config() -> RagConfig | Configuration:
         db_config: Configuration | None = None
         try:
-            db_config = Configuration.objects.first()
+            db_config = Configuration.objects.prefetch_related("translations").first()
         except Exception:  # pylint: disable=broad-exception-caught
             db_config = None
         if db_config is not None:
@@ -56,6 +95,10 @@ class RagChain:
             user_prompt="Question: {question}\nContext: {context}",
         )
 
+    @property
+    def version(self) -> str:
+        return configuration_version(getattr(self.config, "updated_at", None))
+
     def build(self) -> RunnableWithMessageHistory:
         return RunnableWithMessageHistory(
             self._get_core(),
@@ -65,11 +108,23 @@ class RagChain:
         )
 
     def _get_core(self) -> RunnableSerializable[dict[str, Any], str]:
-        return RunnablePassthrough.assign(context=self._merge_context) | self.prompt | self.llm | StrOutputParser()
+        merge_context = RunnableLambda(self._merge_context, afunc=self._amerge_context)
+        return RunnablePassthrough.assign(context=merge_context) | self.prompt | self.llm | StrOutputParser()
 
     def prompt(self, values: dict[str, Any]) -> ChatPromptTemplate:
         locale = values.get("locale") or settings.LANGUAGE_CODE
 
+        key = (self.version, locale)
+        with timed("prompt"):
+            if (template := self._prompts.get(key)) is None:
+                template = self._compile_prompt(locale)
+                # Locale comes from the request - keep the cache bounded
+                if len(self._prompts) < self.PROMPT_CACHE_SIZE:
+                    self._prompts[key] = template
+        mark("llm")  # The model is called right after the prompt is built
+        return template
+
+    def _compile_prompt(self, locale: str) -> ChatPromptTemplate:
         system_prompt = self.config.safe_translation_getter("system_prompt", language_code=locale).strip()
         user_prompt = self.config.safe_translation_getter("user_prompt", language_code=locale).strip()
 
@@ -85,22 +140,119 @@ class RagChain:
         question = context["question"]
         locale = context["locale"]
 
-        # Extract documents from Vector DB
-        active_retriever = retriever_topk(_filter={"locale": locale})
-        vector_docs = (itemgetter("question") | active_retriever).invoke(context)
+        started = time.monotonic()
+        # Legs run in a copy of the caller's context, so their stages are timed for the current request
+        legs = self._legs()
+        futures = {
+            name: _retrieval_executor.submit(copy_context().run, self._run_leg, leg, question, locale)
+            for name, (leg, _) in legs.items()
+        }
+        results = {
+            name: self._collect_leg(name, futures[name], started + timeout) for name, (_, timeout) in legs.items()
+        }
 
-        # Extract documents from PostgreSQL
-        relational_getter = self.RELATIONAL_CONTEXT_GETTER(question=question, locale=locale)
-        structured_docs = relational_getter.get_context()
+        return self._merge(question=question, locale=locale, documents=self._combine(results))
 
-        merged = "\n\n".join(
-            f"[{i+1}] {d.page_content}" for i, d in enumerate((vector_docs or []) + (structured_docs or []))
+    async def _amerge_context(self, context: dict) -> str:
+        question = context["question"]
+        locale = context["locale"]
+
+        loop = asyncio.get_running_loop()
+        legs = self._legs()
+        gathered = await asyncio.gather(
+            *(
+                asyncio.wait_for(
+                    loop.run_in_executor(_retrieval_executor, copy_context().run, self._run_leg, leg, question, locale),
+                    timeout=timeout,
+                )
+                for leg, timeout in legs.values()
+            ),
+            return_exceptions=True,
         )
 
+        results = {name: self._leg_result(name, result) for name, result in zip(legs, gathered, strict=True)}
+        return self._merge(question=question, locale=locale, documents=self._combine(results))
+
+    def _legs(self) -> dict[str, tuple[Callable[[str, str], list[Document]], float]]:
+        legs: dict[str, tuple[Callable[[str, str], list[Document]], float]] = {
+            "vector": (self._get_vector_docs, settings.RAG_VECTOR_TIMEOUT)
+        }
+        if settings.RAG_HYBRID_ENABLED:
+            legs["lexical"] = (self._get_lexical_docs, settings.RAG_LEXICAL_TIMEOUT)
+        legs["relational"] = (self._get_structured_docs, settings.RAG_RELATIONAL_TIMEOUT)
+        return legs
+
+    @staticmethod
+    def _combine(results: dict[str, list[Document]]) -> list[Document]:
+        # Exact terms (e.g. technology names) rank high lexically even where their embedding is only vaguely close
+        retrieved = results["vector"]
+        if "lexical" in results:
+            retrieved = reciprocal_rank_fusion(
+                retrieved, results["lexical"], limit=settings.RAG_HYBRID_K, rrf_k=settings.RAG_HYBRID_RRF_K
+            )
+        return retrieved + results["relational"]
+
+    @staticmethod
+    def _get_vector_docs(question: str, locale: str) -> list[Document]:
+        with timed("vector"):
+            if settings.RAG_MMR_ENABLED:
+                return search_mmr(question, locale)
+            return search_topk(question, _filter={"locale": locale})
+
+    @staticmethod
+    def _get_lexical_docs(question: str, locale: str) -> list[Document]:
+        with timed("lexical"):
+            return search_lexical(question, locale)
+
+    def _get_structured_docs(self, question: str, locale: str) -> list[Document]:
+        with timed("relational"):
+            return self.RELATIONAL_CONTEXT_GETTER(question=question, locale=locale).get_context()
+
+    @staticmethod
+    def _run_leg(leg: Callable[[str, str], list[Document]], question: str, locale: str) -> list[Document]:
+        # Legs run on pool threads, which own their DB connections - apply the same lifecycle as a request would
+        close_old_connections()
+        try:
+            return leg(question, locale) or []
+        finally:
+            close_old_connections()
+
+    @classmethod
+    def _collect_leg(cls, name: str, future: Future, deadline: float) -> list[Document]:
+        result: list[Document] | BaseException
+        try:
+            result = future.result(timeout=max(0.0, deadline - time.monotonic()))
+        except Exception as exception:  # pylint: disable=broad-exception-caught
+            future.cancel()
+            result = exception
+        return cls._leg_result(name, result)
+
+    @staticmethod
+    def _leg_result(name: str, result: list[Document] | BaseException) -> list[Document]:
+        if isinstance(result, TimeoutError):
+            logger.warning("Retrieval leg '%s' timed out, merging context without it", name)
+            return []
+        if isinstance(result, BaseException):
+            logger.warning("Retrieval leg '%s' failed, merging context without it: %s", name, result)
+            return []
+        return result
+
+    def _merge(self, question: str, locale: str, documents: list[Document]) -> str:
+        with timed("pack"):
+            packed = context_packer.pack(question=question, locale=locale, documents=documents)
+
         if settings.RAG_DUMP_CONTEXTS:
-            self._save_context_to_file(question=question, locale=locale, merged=merged)
+            context_dumps.submit(
+                {
+                    "locale": locale,
+                    "question": question,
+                    "context": packed.text,
+                    "tokens": packed.tokens,
+                    "saved_tokens": packed.saved_tokens,
+                }
+            )
 
-        return merged
+        return packed.text
 
     @staticmethod
     def _get_history_factory() -> Callable[[str | None], MessageHistory]:
@@ -111,27 +263,148 @@ class RagChain:
 
         return history_factory
 
+
+class CachedAnswerChain:
+    """
+    Streams answers of the RAG chain and serves near-duplicate first-turn questions from the semantic answer cache.
+    Cached answers are replayed in chunks and written to the conversation history like generated ones.
+    Identical first-turn questions asked while one is being answered follow that answer.
+    """
+
+    def __init__(
+        self,
+        chain: RunnableWithMessageHistory,
+        *,
+        version: str,
+        cache: SemanticAnswerCache = answer_cache,
+        flights: SingleFlight = single_flight,
+    ) -> None:
+        self.chain = chain
+        self.version = version
+        self.cache = cache
+        self.flights = flights
+
+    async def astream(self, values: dict[str, Any], config: RunnableConfig) -> AsyncIterator[str]:
+        question, locale, history = self._unpack(values, config)
+
+        first_turn = await sync_to_async(history.is_empty)()
+        if not (first_turn and settings.RAG_SINGLE_FLIGHT_ENABLED):
+            async for chunk in self._agenerate(values, config, history, first_turn=first_turn):
+                yield chunk
+            return
+
+        # Identical first questions in flight share one answer, only its starter's session is written by the chain
+        key = (normalize(question), locale, self.version)
+        flight, started = self.flights.join(key, lambda: self._agenerate(values, config, history, first_turn=True))
+
+        chunks: list[str] = []
+        try:
+            async for chunk in flight.subscribe():
+                chunks.append(chunk)
+                yield chunk
+        except (asyncio.CancelledError, GeneratorExit):
+            if not started:
+                await asyncio.shield(history.aadd_messages(self._truncated(question, chunks)))
+            raise
+
+        if not started:
+            await history.aadd_messages([HumanMessage(question), AIMessage("".join(chunks))])
+
+    async def _agenerate(
+        self, values: dict[str, Any], config: RunnableConfig, history: MessageHistory, *, first_turn: bool
+    ) -> AsyncIterator[str]:
+        question, locale = values["question"], values.get("locale") or settings.LANGUAGE_CODE
+
+        embedding = await sync_to_async(self._cacheable_embedding)(question, first_turn=first_turn)
+        version = await sync_to_async(self._cache_version)() if embedding is not None else ""
+        if embedding is not None and (answer := self.cache.get(embedding, locale=locale, version=version)):
+            await history.aadd_messages([HumanMessage(question), AIMessage(answer)])
+            for chunk in self._replay(answer):
+                yield chunk
+            return
+
+        chunks: list[str] = []
+        try:
+            # Runnables stream from async generators, closing one stops its LLM request
+            async with aclosing(self.chain.astream(values, config=config)) as stream:  # type: ignore[type-var]
+                async for chunk in stream:
+                    chunks.append(chunk)
+                    LLM_TOKENS.inc()
+                    yield chunk
+        except (asyncio.CancelledError, GeneratorExit):
+            # The visitor disconnected - shielded, so a repeated cancel does not lose the partial answer
+            await asyncio.shield(history.aadd_messages(self._truncated(question, chunks)))
+            raise
+
+        if embedding is not None:
+            self.cache.set(embedding, "".join(chunks), locale=locale, version=version)
+
+    def _cache_version(self) -> str:
+        # Read before generating - an answer made of content changed meanwhile is stored under the old version
+        return f"{self.version}/{ContentVersion.current()}"
+
+    @staticmethod
+    def _unpack(values: dict[str, Any], config: RunnableConfig) -> tuple[str, str, MessageHistory]:
+        session_key = (config.get("configurable") or {}).get("session_id")
+        if not session_key:
+            raise ValueError("Missing session key! Cannot retrieve chat history!")
+        return values["question"], values.get("locale") or settings.LANGUAGE_CODE, MessageHistory(session_key)
+
+    @staticmethod
+    def _cacheable_embedding(question: str, *, first_turn: bool) -> list[float] | None:
+        # Answers depend on the conversation, so only first-turn questions are served from and stored in the cache
+        if not settings.RAG_ANSWER_CACHE_ENABLED or not first_turn:
+            return None
+        with timed("embedding"):
+            return embeddings().embed_query(question)
+
+    @staticmethod
+    def _truncated(question: str, chunks: list[str]) -> list[BaseMessage]:
+        # The history runnable only records finished runs - an interrupted one is recorded here, marked as cut off
+        return [HumanMessage(question), AIMessage("".join(chunks) + TRUNCATED_MARKER)]
+
     @staticmethod
-    def _save_context_to_file(question: str, locale: str, merged: str) -> None:
-        dump_dir = Path(settings.RAG_CONTEXT_DUMP_DIR)
-        if not dump_dir.exists():
-            dump_dir.mkdir(parents=True, exist_ok=True)
-        filename = dump_dir / f"{datetime.now().strftime('%Y-%m-%dT%H:%M:%S')}.txt"
-        with open(filename, "w", encoding="utf-8") as f:
-            f.write(f"Locale: {locale}\nQuestion: {question}\n\n")
-            f.write(merged)
+    def _replay(answer: str) -> Iterator[str]:
+        yield from re.findall(r"\S+\s*|\s+", answer)
 
 
-def build_rag_chain() -> RunnableWithMessageHistory:
+def build_rag_chain() -> CachedAnswerChain:
     pipeline = RagChain()
-    return pipeline.build()
+    return CachedAnswerChain(pipeline.build(), version=pipeline.version)
+
+
+class ChainRegistry:
+    """
+    Holds the process' RAG chain and rebuilds it lazily once the Configuration version changes.
+    The version is re-read at most every `ttl` seconds; `invalidate` forces a re-read on the next request.
+    """
+
+    def __init__(self, factory: Callable[[], CachedAnswerChain] = build_rag_chain, *, ttl: float = 0.0) -> None:
+        self.factory = factory
+        self.ttl = ttl
+
+        self._chain: CachedAnswerChain | None = None
+        self._checked_at = float("-inf")
+        self._lock = threading.Lock()
+
+    def get(self) -> CachedAnswerChain:
+        if self._chain is not None and time.monotonic() - self._checked_at < self.ttl:
+            return self._chain
+
+        version = current_configuration_version()
+        with self._lock:
+            if self._chain is None or self._chain.version != version:
+                logger.info("Building RAG chain for configuration version %s", version)
+                self._chain = self.factory()
+            self._checked_at = time.monotonic()
+            return self._chain
+
+    def invalidate(self) -> None:
+        self._checked_at = float("-inf")
 
 
-_rag_chain: RunnableWithMessageHistory | None = None
+chain_registry = ChainRegistry(ttl=settings.RAG_CHAIN_VERSION_TTL)
 
 
-def get_rag_chain() -> RunnableWithMessageHistory:
-    global _rag_chain  # pylint: disable=global-statement
-    if _rag_chain is None:
-        _rag_chain = build_rag_chain()
-    return _rag_chain
+def get_rag_chain() -> CachedAnswerChain:
+    return chain_registry.get()
@@ -0,0 +1,38 @@
+import logging
+from functools import lru_cache
+
+import tiktoken
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+CHARACTERS_PER_TOKEN = 4  # Rough estimate used when the tokenizer files cannot be loaded
+
+
+@lru_cache(maxsize=8)
+def encoding_for(model: str) -> tiktoken.Encoding | None:
+    try:
+        return tiktoken.encoding_for_model(model)
+    except KeyError:
+        return tiktoken.get_encoding("o200k_base")
+    except Exception as exception:  # pylint: disable=broad-exception-caught
+        # tiktoken downloads its BPE files on first use - without them fall back to the estimate
+        logger.warning("Tokenizer for %s unavailable, estimating token counts: %s", model, exception)
+        return None
+
+
+def count_tokens(text: str, model: str | None = None) -> int:
+    if not text:
+        return 0
+    if (encoding := encoding_for(model or settings.RAG_TOKENIZER_MODEL)) is None:
+        return -(-len(text) // CHARACTERS_PER_TOKEN)
+    return len(encoding.encode(text, disallowed_special=()))
+
+
+def truncate_tokens(text: str, limit: int, model: str | None = None) -> str:
+    if limit <= 0:
+        return ""
+    if (encoding := encoding_for(model or settings.RAG_TOKENIZER_MODEL)) is None:
+        return text[: limit * CHARACTERS_PER_TOKEN]
+    tokens = encoding.encode(text, disallowed_special=())
+    return text if len(tokens) <= limit else encoding.decode(tokens[:limit])
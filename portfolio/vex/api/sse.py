@@ -1,36 +1,144 @@
-from collections.abc import Iterator
+import asyncio
+import json
+import re
+from collections.abc import AsyncGenerator, AsyncIterator, Callable
+from contextlib import aclosing
 
+from asgiref.sync import sync_to_async
 from django.conf import settings
-from django.core.handlers.wsgi import WSGIRequest
+from django.core.handlers.asgi import ASGIRequest
 from django.http import HttpResponseBadRequest, StreamingHttpResponse
 
 from utils.functions import ensure_session
+from utils.metrics import SSE_STREAMS
+from utils.timing import StageTimer, current_timer
 from vex.ai.rag import get_rag_chain
 
+LINE_BREAK = re.compile(r"\r\n|\r|\n")
+HEARTBEAT = ": ping\n\n"
 
-def chat(request: WSGIRequest) -> StreamingHttpResponse | HttpResponseBadRequest:
+
+def sse_event(data: str, event: str | None = None) -> str:
+    # Every line of the payload needs its own `data:` field, EventSource joins them back with "\n"
+    lines = "".join(f"data: {line}\n" for line in LINE_BREAK.split(data))
+    return f"event: {event}\n{lines}\n" if event else f"{lines}\n"
+
+
+async def ticking[T](items: AsyncIterator[T], timeout: Callable[[], float | None]) -> AsyncGenerator[T | None]:
+    """
+    Yields the items, and None whenever `timeout()` seconds pass without a new one.
+    On close the pending read is cancelled and awaited, so the source can clean up (e.g. stop the LLM stream).
+    """
+    iterator = aiter(items)
+    pending: asyncio.Future[T] | None = None
+    try:
+        while True:
+            if pending is None:
+                pending = asyncio.ensure_future(anext(iterator))
+
+            # The pending read survives a timeout, so no item is lost while the caller handles the tick
+            done, _ = await asyncio.wait({pending}, timeout=timeout())
+            if not done:
+                yield None
+                continue
+
+            try:
+                item = pending.result()
+            except StopAsyncIteration:
+                return
+            finally:
+                pending = None
+            yield item
+    finally:
+        if pending is not None:
+            pending.cancel()
+            await asyncio.wait({pending})
+
+
+async def coalesce(chunks: AsyncIterator[str], *, max_bytes: int, max_delay: float) -> AsyncIterator[str]:
+    """Batches stream chunks, flushed once `max_bytes` are buffered or the oldest chunk waited `max_delay` seconds."""
+    loop = asyncio.get_running_loop()
+    buffer: list[str] = []
+    size = 0
+    deadline = 0.0
+
+    def timeout() -> float | None:
+        return max(0.0, deadline - loop.time()) if buffer else None
+
+    async with aclosing(ticking(chunks, timeout)) as ticks:
+        async for chunk in ticks:
+            if chunk:
+                if not buffer:
+                    deadline = loop.time() + max_delay
+                buffer.append(chunk)
+                size += len(chunk.encode("utf-8"))
+            if buffer and (chunk is None or size >= max_bytes):
+                yield "".join(buffer)
+                buffer, size = [], 0
+
+    if buffer:
+        yield "".join(buffer)
+
+
+async def heartbeat(frames: AsyncIterator[str], *, interval: float) -> AsyncIterator[str]:
+    """Sends an SSE comment whenever no frame was sent for `interval` seconds, so proxies keep the stream open."""
+    async with aclosing(ticking(frames, lambda: interval)) as ticks:
+        async for frame in ticks:
+            yield HEARTBEAT if frame is None else frame
+
+
+async def timed_generation(chunks: AsyncIterator[str], timer: StageTimer) -> AsyncIterator[str]:
+    """Records the LLM's time to first token and total generation time, both counted from the prompt being ready."""
+    first = True
+    async for chunk in chunks:
+        if first:
+            timer.since("llm", "llm_ttft")
+            first = False
+        yield chunk
+    timer.since("llm", "llm_total")
+
+
+async def chat(request: ASGIRequest) -> StreamingHttpResponse | HttpResponseBadRequest:
     if not (question := (request.GET.get(key="question") or "").strip()):
         return HttpResponseBadRequest(content="You request must contain a question.")
 
-    session_key = request.GET.get(key="session_key") or ensure_session(request=request)
+    if (timer := current_timer.get()) is None:  # Not set up by the ServerTimingMiddleware
+        timer = StageTimer()
+        current_timer.set(timer)
+
+    with timer.stage("session"):
+        session_key = request.GET.get(key="session_key") or await sync_to_async(ensure_session)(request=request)
     locale = request.GET.get(key="locale") or settings.LANGUAGE_CODE
 
-    def event_stream() -> Iterator[str]:
-        yield "event: received\ndata: ok\n\n"
-        try:
-            chain = get_rag_chain()
-            for chunk in chain.stream(
-                {"question": question, "locale": locale},
-                config={"configurable": {"session_id": session_key}},
-            ):
-                if not chunk:
-                    continue
-                yield f"data: {chunk}\n\n"
-            yield "event: finished\ndata: done\n\n"
-        except Exception as e:  # pylint: disable=broad-exception-caught
-            yield f"event: error\ndata: {str(e)}\n\n"
-
-    response = StreamingHttpResponse(event_stream(), content_type="text/event-stream")
+    async def event_stream() -> AsyncIterator[str]:
+        with SSE_STREAMS.track_inprogress():
+            yield sse_event("ok", event="received")
+            try:
+                chain = await sync_to_async(get_rag_chain)()
+                chunks = timed_generation(
+                    chain.astream(
+                        {"question": question, "locale": locale},
+                        config={"configurable": {"session_id": session_key}},
+                    ),
+                    timer,
+                )
+                async for text in coalesce(
+                    chunks, max_bytes=settings.SSE_COALESCE_BYTES, max_delay=settings.SSE_COALESCE_DELAY
+                ):
+                    yield sse_event(text)
+                outcome = sse_event("done", event="finished")
+            except Exception as e:  # pylint: disable=broad-exception-caught
+                outcome = sse_event(str(e), event="error")
+            finally:
+                timer.finish()
+
+            # Sent before the closing event, as clients close the EventSource once the answer finished
+            yield sse_event(json.dumps(timer.as_dict()), event="timing")
+            yield outcome
+
+    response = StreamingHttpResponse(
+        heartbeat(event_stream(), interval=settings.SSE_HEARTBEAT_INTERVAL), content_type="text/event-stream"
+    )
     response["Cache-Control"] = "no-cache"
     response["X-Accel-Buffering"] = "no"
 
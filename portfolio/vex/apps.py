@@ -1,6 +1,13 @@
 from django.apps import AppConfig
+from django.core.checks import register
 
 
 class VexConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "vex"
+
+    def ready(self) -> None:
+        from vex import checks, signals  # pylint: disable=import-outside-toplevel
+
+        register(checks.check_embedding_model, "vex")
+        signals.connect()
@@ -0,0 +1,37 @@
+from typing import Any
+
+from django.conf import settings
+from django.core.checks import CheckMessage, Error, Warning  # pylint: disable=redefined-builtin
+
+from vex.models import EMBEDDING_DIMENSIONS
+
+# Dimensions of the vectors of OpenAI embedding models
+EMBEDDING_MODEL_DIMENSIONS = {
+    "text-embedding-3-small": 1536,
+    "text-embedding-3-large": 3072,
+    "text-embedding-ada-002": 1536,
+}
+
+
+def check_embedding_model(**kwargs: Any) -> list[CheckMessage]:  # pylint: disable=unused-argument
+    """The embedding model must fill the column of vex.Chunk - a mismatch only fails at the first insert or query."""
+    model = settings.VECTOR_TEXT_EMBEDDING_MODEL
+    dimensions = EMBEDDING_MODEL_DIMENSIONS.get(model)
+    if dimensions is None:
+        return [
+            Warning(
+                f"Dimensions of the embedding model {model!r} are unknown.",
+                hint=f"Make sure it embeds into {EMBEDDING_DIMENSIONS} dimensions, the size of vex.Chunk.embedding.",
+                id="vex.W001",
+            )
+        ]
+    if dimensions != EMBEDDING_DIMENSIONS:
+        return [
+            Error(
+                f"The embedding model {model!r} embeds into {dimensions} dimensions, "
+                f"vex.Chunk.embedding holds {EMBEDDING_DIMENSIONS}.",
+                hint="Set VECTOR_TEXT_EMBEDDING_MODEL to a model of the same dimensions, or migrate the column.",
+                id="vex.E001",
+            )
+        ]
+    return []
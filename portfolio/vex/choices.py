@@ -1,7 +1,15 @@
 from django.db import models
+from django.utils.translation import gettext_lazy as _
 
 
 class Roles(models.TextChoices):  # pylint: disable=too-many-ancestors
     USER = "user", "user"
     ASSISTANT = "assistant", "assistant"
     SYSTEM = "system", "system"
+
+
+class JobStatuses(models.TextChoices):  # pylint: disable=too-many-ancestors
+    QUEUED = "queued", _("Queued")
+    RUNNING = "running", _("Running")
+    DONE = "done", _("Done")
+    FAILED = "failed", _("Failed")
@@ -0,0 +1,89 @@
+import logging
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Exists, OuterRef
+from django.utils import timezone
+
+from vex.actions.inject_documents import inject_documents
+from vex.choices import JobStatuses
+from vex.models import ContentVersion, IngestionJob
+
+logger = logging.getLogger(__name__)
+
+
+def lease() -> timedelta:
+    return timedelta(seconds=settings.INGESTION_LEASE)
+
+
+def claim() -> IngestionJob | None:
+    """
+    Takes the longest waiting job: a queued one, or a running one whose worker stopped extending its lease.
+    Workers skip the rows locked by each other instead of waiting, so each job is claimed by exactly one of them.
+    A document is injected by one worker at a time - its jobs wait while another of them runs under a live lease,
+    and its row stays locked until the claim is committed, so workers claiming at once skip its other jobs too.
+    """
+    now = timezone.now()
+    running = IngestionJob.objects.filter(
+        document=OuterRef("document"), status=JobStatuses.RUNNING, available_at__gt=now
+    ).exclude(pk=OuterRef("pk"))
+    with transaction.atomic():
+        job = (
+            IngestionJob.objects.select_for_update(skip_locked=True, of=("self", "document"))
+            .select_related("document")
+            .filter(status__in=[JobStatuses.QUEUED, JobStatuses.RUNNING], available_at__lte=now)
+            .exclude(Exists(running))
+            .order_by("available_at")
+            .first()
+        )
+        if job is None:
+            return None
+
+        update(
+            job,
+            status=JobStatuses.RUNNING,
+            attempts=job.attempts + 1,
+            available_at=now + lease(),
+            started_at=now,
+            finished_at=None,
+            error="",
+        )
+    return job
+
+
+def run(job: IngestionJob) -> None:
+    """Injects the document of a claimed job, reporting its progress. Failed jobs are retried after a delay."""
+    if job.attempts > settings.INGESTION_MAX_ATTEMPTS:  # Its workers died on it every time
+        finish(job, JobStatuses.FAILED, error="Worker lost while running the job")
+        return
+
+    def progress(done: int, total: int) -> None:
+        update(job, chunks_done=done, chunks_total=total, available_at=timezone.now() + lease())  # Still alive
+
+    logger.info("Running ingestion job %s of Document %s (attempt %s)", job.pk, job.document_id, job.attempts)
+    try:
+        report = inject_documents([job.document], on_progress=progress)
+    except Exception as error:  # pylint: disable=broad-exception-caught
+        logger.exception("Ingestion job %s failed", job.pk)
+        message = f"{type(error).__name__}: {error}"
+        if job.attempts < settings.INGESTION_MAX_ATTEMPTS:
+            retry_at = timezone.now() + timedelta(seconds=settings.INGESTION_RETRY_DELAY * job.attempts)
+            finish(job, JobStatuses.QUEUED, error=message, available_at=retry_at)
+        else:
+            finish(job, JobStatuses.FAILED, error=message)
+        return
+
+    finish(job, JobStatuses.DONE, chunks_done=report.chunks, chunks_total=report.chunks, tokens=report.tokens)
+
+
+def finish(job: IngestionJob, status: str, **fields: object) -> None:
+    update(job, status=status, finished_at=timezone.now(), **fields)
+    ContentVersion.bump()  # Chunks were written or removed, even by a failed injection
+
+
+def update(job: IngestionJob, **fields: object) -> None:
+    # An UPDATE by primary key - a job whose document was deleted meanwhile is not brought back by saving it
+    for field, value in fields.items():
+        setattr(job, field, value)
+    IngestionJob.objects.filter(pk=job.pk).update(**fields, updated_at=timezone.now())
@@ -0,0 +1,76 @@
+import logging
+import multiprocessing
+import signal
+import threading
+from typing import Any
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandParser
+from django.db import connections
+
+from vex.jobs import claim, run
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = (
+        "Runs the ingestion jobs of documents - parsing, chunking and embedding - outside of the web workers. "
+        "Jobs are claimed from the database with SKIP LOCKED, so any number of workers can run side by side. "
+        "Bulk imports are parsed in parallel by --processes, one document per process; a long PDF is further split "
+        "into ranges of pages parsed by INGESTION_PARSE_WORKERS processes of its own."
+    )
+
+    def add_arguments(self, parser: CommandParser) -> None:
+        parser.add_argument("--processes", type=int, default=1, help="Worker processes to run")
+        parser.add_argument(
+            "--poll", type=float, default=settings.INGESTION_POLL_INTERVAL, help="Seconds between checks of idle queue"
+        )
+        parser.add_argument("--burst", action="store_true", help="Exit once the queue is empty")
+
+    def handle(self, *args: Any, **options: Any) -> None:
+        if options["processes"] <= 1:
+            work(poll=options["poll"], burst=options["burst"])
+            return
+
+        connections.close_all()  # Every process opens its own connection, none may share the inherited one
+        context = multiprocessing.get_context("fork")
+        processes = [
+            context.Process(target=work, kwargs={"poll": options["poll"], "burst": options["burst"]}, daemon=False)
+            for _ in range(options["processes"])
+        ]
+        for process in processes:
+            process.start()
+        self.stdout.write(f"Started {len(processes)} ingestion workers")
+
+        def stop(_signum: int, _frame: Any) -> None:
+            for process in processes:
+                if process.is_alive():
+                    process.terminate()  # SIGTERM, each of them finishes its current job first
+
+        handlers = {signum: signal.signal(signum, stop) for signum in (signal.SIGTERM, signal.SIGINT)}
+        try:
+            for process in processes:
+                process.join()
+        finally:
+            for signum, handler in handlers.items():
+                signal.signal(signum, handler)
+
+
+def work(*, poll: float, burst: bool) -> None:
+    """Claims and runs jobs until stopped by SIGTERM/SIGINT (or, in burst mode, until the queue is empty)."""
+    stopping = threading.Event()
+    handlers = {signum: signal.signal(signum, lambda *_: stopping.set()) for signum in (signal.SIGTERM, signal.SIGINT)}
+    logger.info("Ingestion worker started")
+    try:
+        while not stopping.is_set():
+            if (job := claim()) is None:
+                if burst:
+                    break
+                stopping.wait(poll)
+                continue
+            run(job)
+    finally:
+        for signum, handler in handlers.items():
+            signal.signal(signum, handler)
+        logger.info("Ingestion worker stopped")
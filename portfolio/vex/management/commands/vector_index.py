@@ -0,0 +1,74 @@
+import time
+from typing import Any
+
+import numpy as np
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandParser
+from django.db import connection, transaction
+
+from vex.ai.database.store import ChunkStore
+from vex.models import HNSW_EF_CONSTRUCTION, HNSW_M, Chunk, embedding_index
+
+
+class Command(BaseCommand):
+    help = (
+        "Rebuilds the HNSW indexes over the chunk embeddings of each locale with new parameters. "
+        "Each is built concurrently next to the old one, which keeps serving searches until it is swapped in. "
+        "Prints the query plan and latencies of sample similarity searches before and after."
+    )
+
+    def add_arguments(self, parser: CommandParser) -> None:
+        parser.add_argument("--m", type=int, default=HNSW_M, help="Links per node of the graph")
+        parser.add_argument("--ef-construction", type=int, default=HNSW_EF_CONSTRUCTION, help="Build-time list size")
+        parser.add_argument(
+            "--ef-search", type=int, default=settings.VECTOR_HNSW_EF_SEARCH, help="Query-time list size to measure"
+        )
+        parser.add_argument("--queries", type=int, default=20, help="Sample searches per measurement")
+        parser.add_argument("--k", type=int, default=settings.RAG_MMR_FETCH_K, help="Chunks fetched per search")
+
+    def handle(self, *args: Any, **options: Any) -> None:
+        # Stored chunks serve as queries, each searching among the chunks of its locale
+        samples = list(Chunk.objects.order_by("?").values_list("embedding", "locale")[: options["queries"]])
+        if samples:
+            self._report("Before", samples, options)
+
+        started = time.monotonic()
+        # Outside of a transaction - CONCURRENTLY takes no lock blocking the searches and writes of chunks
+        with connection.schema_editor(atomic=False) as editor:
+            for locale, _name in settings.LANGUAGES:
+                index = embedding_index(locale, m=options["m"], ef_construction=options["ef_construction"])
+                building = index.clone()
+                building.name = f"{index.name}_new"
+                editor.remove_index(Chunk, building, concurrently=True)  # Left invalid by an interrupted build
+                editor.add_index(Chunk, building, concurrently=True)
+                editor.remove_index(Chunk, index, concurrently=True)  # By name, whatever parameters it was built with
+                editor.execute(
+                    f"ALTER INDEX {editor.quote_name(building.name)} RENAME TO {editor.quote_name(index.name)}"
+                )
+            editor.execute(f"ANALYZE {editor.quote_name(Chunk._meta.db_table)}")
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"HNSW indexes of {len(settings.LANGUAGES)} locales rebuilt in {time.monotonic() - started:.2f}s "
+                f"(m={options['m']}, ef_construction={options['ef_construction']})"
+            )
+        )
+
+        if samples:
+            self._report("After", samples, options)
+
+    def _report(self, title: str, samples: list[tuple[np.ndarray, str]], options: dict[str, Any]) -> None:
+        latencies = []
+        plan = ""
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.execute("SET LOCAL hnsw.ef_search = %s", [options["ef_search"]])
+            for embedding, locale in samples:
+                queryset = ChunkStore.nearest_queryset(embedding.tolist(), options["k"], {"locale": locale})
+                plan = plan or queryset.explain(analyze=True, buffers=True)
+                started = time.perf_counter()
+                list(queryset.all())
+                latencies.append((time.perf_counter() - started) * 1000)
+
+        p50, p95 = np.percentile(latencies, [50, 95])
+        self.stdout.write(self.style.MIGRATE_HEADING(f"{title} (ef_search={options['ef_search']}, k={options['k']})"))
+        self.stdout.write("\n".join(f"  {line}" for line in plan.splitlines()))
+        self.stdout.write(f"  Latency over {len(latencies)} searches: p50 {p50:.2f} ms, p95 {p95:.2f} ms")
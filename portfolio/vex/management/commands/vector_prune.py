@@ -0,0 +1,45 @@
+from typing import Any
+
+from django.core.management.base import BaseCommand, CommandParser
+from django.db.models import Q, QuerySet
+
+from vex.choices import JobStatuses
+from vex.models import Chunk, ContentVersion, Document
+
+
+def orphans() -> QuerySet[Chunk]:
+    """
+    Chunks no document stands behind any more: of documents without a file and URL, and of documents
+    whose source changed but whose injection gave up (not injected, with no job queued or running).
+    """
+    unsourced = (Q(document__file="") | Q(document__file__isnull=True)) & (
+        Q(document__url="") | Q(document__url__isnull=True)
+    )
+    abandoned = Document.objects.filter(injected=False).exclude(
+        jobs__status__in=[JobStatuses.QUEUED, JobStatuses.RUNNING]
+    )
+    return Chunk.objects.filter(unsourced | Q(document__in=abandoned))
+
+
+class Command(BaseCommand):
+    help = (
+        "Removes orphan chunks, which would otherwise keep showing up in answers. "
+        "Deleted in batches, each in a transaction of its own, so searches and ingestion are never blocked for long."
+    )
+
+    def add_arguments(self, parser: CommandParser) -> None:
+        parser.add_argument("--batch-size", type=int, default=1000, help="Chunks deleted per statement")
+        parser.add_argument("--dry-run", action="store_true", help="Only count the orphan chunks")
+
+    def handle(self, *args: Any, **options: Any) -> None:
+        if options["dry_run"]:
+            self.stdout.write(f"{orphans().count()} orphan chunks found")
+            return
+
+        removed = 0
+        while pks := list(orphans().values_list("pk", flat=True)[: options["batch_size"]]):
+            deleted, _ = Chunk.objects.filter(pk__in=pks).delete()
+            removed += deleted
+        if removed:
+            ContentVersion.bump()  # Bulk deletes send no signals
+        self.stdout.write(self.style.SUCCESS(f"{removed} orphan chunks removed"))
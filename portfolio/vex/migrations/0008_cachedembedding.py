@@ -0,0 +1,37 @@
+# Generated by Django 5.2.5 on 2026-10-18 04:12
+
+import django.contrib.postgres.fields
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("vex", "0007_configuration_configurationtranslation"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="CachedEmbedding",
+            fields=[
+                ("id", models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name="ID")),
+                ("created_at", models.DateTimeField(auto_now_add=True, verbose_name="Created At")),
+                ("updated_at", models.DateTimeField(auto_now=True, verbose_name="Updated At")),
+                ("model", models.CharField(max_length=256, verbose_name="Model")),
+                ("digest", models.CharField(max_length=64, verbose_name="Digest")),
+                ("text", models.TextField(verbose_name="Text")),
+                (
+                    "vector",
+                    django.contrib.postgres.fields.ArrayField(
+                        base_field=models.FloatField(), size=None, verbose_name="Vector"
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Cached Embedding",
+                "verbose_name_plural": "Cached Embeddings",
+                "constraints": [
+                    models.UniqueConstraint(fields=("model", "digest"), name="vex_cached_embedding_model_digest_unique")
+                ],
+            },
+        ),
+    ]
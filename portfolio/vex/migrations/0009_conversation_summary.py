@@ -0,0 +1,30 @@
+# Generated by Django 5.2.5 on 2026-10-18 04:22
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("vex", "0008_cachedembedding"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="conversation",
+            name="summarized_until",
+            field=models.ForeignKey(
+                blank=True,
+                null=True,
+                on_delete=django.db.models.deletion.SET_NULL,
+                related_name="+",
+                to="vex.message",
+                verbose_name="Summarized Until",
+            ),
+        ),
+        migrations.AddField(
+            model_name="conversation",
+            name="summary",
+            field=models.TextField(blank=True, default="", verbose_name="Summary"),
+        ),
+    ]
@@ -0,0 +1,12 @@
+from django.db import migrations
+
+# Formerly full-text indexes on the table of the langchain vector store, which 0012_chunk replaces by vex.Chunk -
+# left empty so no index is built on a table nothing queries any more, and dropped with it in 0017
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("vex", "0009_conversation_summary"),
+    ]
+
+    operations = []
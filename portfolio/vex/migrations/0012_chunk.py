@@ -0,0 +1,89 @@
+# Generated by Django 5.2.5 on 2026-10-18 05:06
+
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+import django.db.models.deletion
+import pgvector.django.indexes
+import pgvector.django.vector
+from django.conf import settings
+from django.db import migrations, models
+
+
+def copy_langchain_chunks(apps, schema_editor) -> None:
+    # Chunks of the former langchain store, for documents that still exist - orphans are left behind
+    if "langchain_pg_embedding" not in schema_editor.connection.introspection.table_names():
+        return
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute(
+            """
+            INSERT INTO vex_chunk
+                (created_at, updated_at, document_id, locale, content, embedding, page, "offset", metadata)
+            SELECT now(), now(), d.id, coalesce(m ->> 'locale', d.language), e.document, e.embedding,
+                (m ->> 'page')::integer, (m ->> 'start_index')::integer,
+                m - 'document_pk' - 'locale' - 'page' - 'start_index'
+            FROM langchain_pg_embedding e
+            JOIN langchain_pg_collection c ON c.uuid = e.collection_id
+            CROSS JOIN LATERAL (SELECT e.cmetadata::jsonb AS m) metadata
+            JOIN vex_document d ON d.id = (m ->> 'document_pk')::bigint
+            WHERE c.name = %s AND e.document IS NOT NULL
+            """,
+            [settings.VECTOR_DB_COLLECTION],
+        )
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("vex", "0011_hnsw_index"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="Chunk",
+            fields=[
+                ("id", models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name="ID")),
+                ("created_at", models.DateTimeField(auto_now_add=True, verbose_name="Created At")),
+                ("updated_at", models.DateTimeField(auto_now=True, verbose_name="Updated At")),
+                (
+                    "locale",
+                    models.CharField(
+                        choices=[("en", "English"), ("pl", "Polski")], max_length=2, verbose_name="Locale"
+                    ),
+                ),
+                ("content", models.TextField(verbose_name="Content")),
+                ("embedding", pgvector.django.vector.VectorField(dimensions=1536, verbose_name="Embedding")),
+                ("page", models.PositiveIntegerField(blank=True, null=True, verbose_name="Page")),
+                ("offset", models.PositiveIntegerField(blank=True, null=True, verbose_name="Offset")),
+                ("metadata", models.JSONField(blank=True, default=dict, verbose_name="Metadata")),
+                (
+                    "document",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE, related_name="chunks", to="vex.document"
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Chunk",
+                "verbose_name_plural": "Chunks",
+                "indexes": [
+                    pgvector.django.indexes.HnswIndex(
+                        ef_construction=64,
+                        fields=["embedding"],
+                        m=16,
+                        name="vex_chunk_embedding_hnsw",
+                        opclasses=["vector_cosine_ops"],
+                    ),
+                    django.contrib.postgres.indexes.GinIndex(
+                        django.contrib.postgres.search.SearchVector("content", config="english"),
+                        condition=models.Q(("locale", "en")),
+                        name="vex_chunk_fts_en",
+                    ),
+                    django.contrib.postgres.indexes.GinIndex(
+                        django.contrib.postgres.search.SearchVector("content", config="simple"),
+                        condition=models.Q(("locale", "pl")),
+                        name="vex_chunk_fts_pl",
+                    ),
+                ],
+            },
+        ),
+        migrations.RunPython(copy_langchain_chunks, reverse_code=migrations.RunPython.noop),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 5.2.5 on 2026-10-18 05:10
+
+import pgvector.django.indexes
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("vex", "0012_chunk"),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name="chunk",
+            name="vex_chunk_embedding_hnsw",
+        ),
+        migrations.AddIndex(
+            model_name="chunk",
+            index=pgvector.django.indexes.HnswIndex(
+                condition=models.Q(("locale", "en")),
+                ef_construction=64,
+                fields=["embedding"],
+                m=16,
+                name="vex_chunk_embedding_hnsw_en",
+                opclasses=["vector_cosine_ops"],
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="chunk",
+            index=pgvector.django.indexes.HnswIndex(
+                condition=models.Q(("locale", "pl")),
+                ef_construction=64,
+                fields=["embedding"],
+                m=16,
+                name="vex_chunk_embedding_hnsw_pl",
+                opclasses=["vector_cosine_ops"],
+            ),
+        ),
+    ]
@@ -0,0 +1,66 @@
+# Generated by Django 5.2.5 on 2026-10-18 05:20
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+def queue_pending_documents(apps, schema_editor) -> None:
+    # Documents waiting for the admin action until now are picked up by the workers
+    Document = apps.get_model("vex", "Document")
+    IngestionJob = apps.get_model("vex", "IngestionJob")
+    IngestionJob.objects.bulk_create(
+        IngestionJob(document_id=pk) for pk in Document.objects.filter(injected=False).values_list("pk", flat=True)
+    )
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("vex", "0013_locale_hnsw_indexes"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="IngestionJob",
+            fields=[
+                ("id", models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name="ID")),
+                ("created_at", models.DateTimeField(auto_now_add=True, verbose_name="Created At")),
+                ("updated_at", models.DateTimeField(auto_now=True, verbose_name="Updated At")),
+                (
+                    "status",
+                    models.CharField(
+                        choices=[("queued", "Queued"), ("running", "Running"), ("done", "Done"), ("failed", "Failed")],
+                        default="queued",
+                        max_length=16,
+                        verbose_name="Status",
+                    ),
+                ),
+                ("attempts", models.PositiveSmallIntegerField(default=0, verbose_name="Attempts")),
+                ("available_at", models.DateTimeField(default=django.utils.timezone.now, verbose_name="Available At")),
+                ("started_at", models.DateTimeField(blank=True, null=True, verbose_name="Started At")),
+                ("finished_at", models.DateTimeField(blank=True, null=True, verbose_name="Finished At")),
+                ("chunks_total", models.PositiveIntegerField(default=0, verbose_name="Chunks Total")),
+                ("chunks_done", models.PositiveIntegerField(default=0, verbose_name="Chunks Done")),
+                ("tokens", models.PositiveIntegerField(default=0, verbose_name="Tokens")),
+                ("error", models.TextField(blank=True, default="", verbose_name="Error")),
+                (
+                    "document",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE, related_name="jobs", to="vex.document"
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Ingestion Job",
+                "verbose_name_plural": "Ingestion Jobs",
+                "indexes": [
+                    models.Index(
+                        condition=models.Q(("status__in", ["queued", "running"])),
+                        fields=["available_at"],
+                        name="vex_job_pending",
+                    )
+                ],
+            },
+        ),
+        migrations.RunPython(queue_pending_documents, reverse_code=migrations.RunPython.noop),
+    ]
@@ -0,0 +1,26 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("vex", "0014_ingestion_job"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="document",
+            name="digest",
+            field=models.CharField(blank=True, default="", max_length=64, verbose_name="Digest"),
+        ),
+        migrations.AddField(
+            model_name="chunk",
+            name="digest",
+            field=models.CharField(default="", max_length=64, verbose_name="Digest"),
+            preserve_default=False,
+        ),
+        # Same digest as vex.ai.database.store.content_digest, so the chunks stored so far are reused on re-injection
+        migrations.RunSQL(
+            "UPDATE vex_chunk SET digest = encode(sha256(convert_to(content, 'UTF8')), 'hex')",
+            reverse_sql=migrations.RunSQL.noop,
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 5.2.5 on 2026-10-18 06:58
+
+from django.db import migrations, models
+
+
+def create_content_version(apps, schema_editor) -> None:
+    # The one row bumped from then on, so that no two first bumps can race to create it
+    apps.get_model("vex", "ContentVersion").objects.create(pk=1, number=0)
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("vex", "0015_content_digests"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ContentVersion",
+            fields=[
+                ("id", models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name="ID")),
+                ("number", models.PositiveBigIntegerField(default=0, verbose_name="Number")),
+            ],
+            options={
+                "verbose_name": "Content Version",
+                "verbose_name_plural": "Content Versions",
+            },
+        ),
+        migrations.RunPython(create_content_version, reverse_code=migrations.RunPython.noop),
+    ]
@@ -0,0 +1,20 @@
+from django.db import migrations
+
+# The tables of the former langchain vector store, whose chunks 0012_chunk copied into vex.Chunk.
+# Embeddings first, they reference their collection.
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("vex", "0016_content_version"),
+    ]
+
+    operations = [
+        migrations.RunSQL(
+            [
+                "DROP TABLE IF EXISTS langchain_pg_embedding",
+                "DROP TABLE IF EXISTS langchain_pg_collection",
+            ],
+            reverse_sql=migrations.RunSQL.noop,
+        ),
+    ]
@@ -1,16 +1,32 @@
 from django.conf import settings
+from django.contrib.postgres.fields import ArrayField
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVector
 from django.db import models
+from django.utils import timezone
 from django.utils.translation import gettext_lazy as _
 from parler.managers import TranslatableManager
 from parler.models import TranslatableModel, TranslatedFields
+from pgvector.django import HnswIndex, VectorField
 
 from utils.models import TimestampedModel
-from vex.choices import Roles
+from vex.choices import JobStatuses, Roles
 
 
 class Conversation(TimestampedModel):
     session = models.CharField(_("Session Key"), max_length=64, db_index=True)
 
+    # Rolling summary of the messages that no longer fit into the history window
+    summary = models.TextField(_("Summary"), blank=True, default="")
+    summarized_until = models.ForeignKey(
+        "Message",
+        on_delete=models.SET_NULL,
+        related_name="+",
+        null=True,
+        blank=True,
+        verbose_name=_("Summarized Until"),
+    )
+
     def __str__(self) -> str:
         return f"{_("Conversation")}: {self.session}"
 
@@ -38,10 +54,26 @@ class Document(TimestampedModel):
     url = models.URLField(_("Source URL"), null=True, blank=True)
 
     injected = models.BooleanField(_("Injected"), default=False)
-
-    def mark_as_injected(self) -> None:
+    digest = models.CharField(_("Digest"), max_length=64, blank=True, default="")  # Of the source last injected
+
+    def source(self) -> dict[str, str | None]:
+        """What the chunks are made of - a change of any of it calls for injecting the document again."""
+        return {"file": self.file.name or "", "url": self.url, "language": self.language, "title": self.title}
+
+    def mark_as_injected(self, digest: str = "") -> bool:
+        """
+        Marks the document injected, unless its source was changed since it was read: the edit is kept rather than
+        saved over, and injected by the job it queued. Only the injection fields are written.
+        """
+        source = self.source()
+        file = models.Q(file=name) if (name := source.pop("file")) else models.Q(file="") | models.Q(file__isnull=True)
+        if not Document.objects.filter(file, pk=self.pk, **source).update(
+            injected=True, digest=digest, updated_at=timezone.now()
+        ):
+            return False
         self.injected = True
-        self.save()
+        self.digest = digest
+        return True
 
     def __str__(self) -> str:
         return f"Document: {self.title}"
@@ -51,6 +83,125 @@ class Document(TimestampedModel):
         verbose_name_plural = _("Documents")
 
 
+class IngestionJob(TimestampedModel):
+    document = models.ForeignKey(Document, on_delete=models.CASCADE, related_name="jobs")
+    status = models.CharField(_("Status"), choices=JobStatuses.choices, default=JobStatuses.QUEUED, max_length=16)
+    attempts = models.PositiveSmallIntegerField(_("Attempts"), default=0)
+
+    # Not claimable before: the retry delay of a queued job, the lease of a running one (extended as it progresses)
+    available_at = models.DateTimeField(_("Available At"), default=timezone.now)
+    started_at = models.DateTimeField(_("Started At"), null=True, blank=True)
+    finished_at = models.DateTimeField(_("Finished At"), null=True, blank=True)
+
+    chunks_total = models.PositiveIntegerField(_("Chunks Total"), default=0)
+    chunks_done = models.PositiveIntegerField(_("Chunks Done"), default=0)
+    tokens = models.PositiveIntegerField(_("Tokens"), default=0)
+    error = models.TextField(_("Error"), blank=True, default="")
+
+    @classmethod
+    def enqueue(cls, document: Document) -> "IngestionJob":
+        """A queued job of the document, created unless one is waiting already."""
+        return cls.objects.filter(document=document, status=JobStatuses.QUEUED).first() or cls.objects.create(
+            document=document
+        )
+
+    @property
+    def progress(self) -> int:
+        if self.status == JobStatuses.DONE:
+            return 100
+        return self.chunks_done * 100 // self.chunks_total if self.chunks_total else 0
+
+    @property
+    def seconds(self) -> float | None:
+        if self.started_at is None or self.finished_at is None:
+            return None
+        return (self.finished_at - self.started_at).total_seconds()
+
+    def __str__(self) -> str:
+        return f"{_("Ingestion Job")}: {self.document_id} ({self.status})"
+
+    class Meta:
+        verbose_name = _("Ingestion Job")
+        verbose_name_plural = _("Ingestion Jobs")
+        indexes = [
+            # Workers only ever look for pending jobs, which stay few however long the history grows
+            models.Index(
+                fields=["available_at"],
+                condition=models.Q(status__in=[JobStatuses.QUEUED, JobStatuses.RUNNING]),
+                name="vex_job_pending",
+            ),
+        ]
+
+
+# Part of the schema, so not read from the environment - the `vector_index` command rebuilds tuned indexes
+EMBEDDING_DIMENSIONS = 1536  # Of the embedding model, text-embedding-3-small
+HNSW_M = 16  # Links per node of the HNSW graph
+HNSW_EF_CONSTRUCTION = 64  # Build-time candidate list
+
+
+def embedding_index(locale: str, *, m: int = HNSW_M, ef_construction: int = HNSW_EF_CONSTRUCTION) -> HnswIndex:
+    """
+    HNSW index over the embeddings of one locale only. A search filtered by `locale = <code>` walks the graph
+    of its own locale, instead of a shared graph whose nearest nodes of other locales are thrown away afterwards.
+    """
+    return HnswIndex(
+        name=f"vex_chunk_embedding_hnsw_{locale}",
+        fields=["embedding"],
+        condition=models.Q(locale=locale),
+        m=m,
+        ef_construction=ef_construction,
+        opclasses=["vector_cosine_ops"],
+    )
+
+
+class Chunk(TimestampedModel):
+    document = models.ForeignKey(Document, on_delete=models.CASCADE, related_name="chunks")
+    locale = models.CharField(_("Locale"), choices=settings.LANGUAGES, max_length=2)
+    content = models.TextField(_("Content"))
+    digest = models.CharField(_("Digest"), max_length=64)  # Of the content, matched on re-injection
+    embedding = VectorField(_("Embedding"), dimensions=EMBEDDING_DIMENSIONS)
+
+    page = models.PositiveIntegerField(_("Page"), null=True, blank=True)
+    offset = models.PositiveIntegerField(_("Offset"), null=True, blank=True)  # Of the chunk within its page
+    metadata = models.JSONField(_("Metadata"), default=dict, blank=True)
+
+    def __str__(self) -> str:
+        return f"{_("Chunk")}: {self.content[:64]}"
+
+    class Meta:
+        verbose_name = _("Chunk")
+        verbose_name_plural = _("Chunks")
+        indexes = [
+            *(embedding_index(locale) for locale, _name in settings.LANGUAGES),
+            # Full-text search of one locale, the queries repeat the exact expression and condition
+            *(
+                GinIndex(
+                    SearchVector("content", config=config),
+                    condition=models.Q(locale=locale),
+                    name=f"vex_chunk_fts_{locale}",
+                )
+                for locale, config in settings.RAG_LEXICAL_CONFIGS.items()
+            ),
+        ]
+
+
+class CachedEmbedding(TimestampedModel):
+    model = models.CharField(_("Model"), max_length=256)
+    digest = models.CharField(_("Digest"), max_length=64)
+    text = models.TextField(_("Text"))
+    vector = ArrayField(models.FloatField(), verbose_name=_("Vector"))
+
+    def __str__(self) -> str:
+        return f"{_("Cached Embedding")}: {self.text[:64]}"
+
+    class Meta:
+        verbose_name = _("Cached Embedding")
+        verbose_name_plural = _("Cached Embeddings")
+        constraints = [
+            models.UniqueConstraint(fields=["model", "digest"], name="vex_cached_embedding_model_digest_unique"),
+        ]
+
+
 class Configuration(TranslatableModel, TimestampedModel):
     translations = TranslatedFields(
         title=models.CharField(_("Title"), max_length=256),
@@ -66,3 +217,28 @@ class Configuration(TranslatableModel, TimestampedModel):
     class Meta:
         verbose_name = _("Configuration")
         verbose_name_plural = _("Configurations")
+
+
+class ContentVersion(models.Model):
+    """
+    Single row counting the changes of the content answers are made of, in whichever process they happen.
+    Cached answers are kept per version, so a change made by any worker stales them in all the others too.
+    """
+
+    number = models.PositiveBigIntegerField(_("Number"), default=0)
+
+    @classmethod
+    def current(cls) -> int:
+        return cls.objects.filter(pk=1).values_list("number", flat=True).first() or 0
+
+    @classmethod
+    def bump(cls) -> None:
+        # Incremented in the database, so concurrent bumps are never lost - the row is created by the migration
+        cls.objects.filter(pk=1).update(number=models.F("number") + 1)
+
+    def __str__(self) -> str:
+        return f"{_("Content Version")}: {self.number}"
+
+    class Meta:
+        verbose_name = _("Content Version")
+        verbose_name_plural = _("Content Versions")
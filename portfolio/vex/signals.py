@@ -0,0 +1,72 @@
+from typing import Any
+
+from django.db import models
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.utils import timezone
+
+from vex.ai.answers import answer_cache
+from vex.ai.database.relational import RelationalContextGetter
+from vex.ai.rag import chain_registry
+from vex.models import Configuration, ContentVersion, Document, IngestionJob
+
+ConfigurationTranslation = Configuration._parler_meta.root_model  # pylint: disable=protected-access
+
+
+def invalidate_answer_cache(**kwargs: Any) -> None:  # pylint: disable=unused-argument
+    # Bumped in the database for the other workers, whose cached answers no longer match; cleared here at once
+    ContentVersion.bump()
+    answer_cache.clear()
+
+
+def invalidate_rag_chain(sender: type[models.Model], instance: models.Model, **kwargs: Any) -> None:
+    if sender is ConfigurationTranslation:
+        # Translations live in their own table - bump the master's timestamp, so every worker sees a new version
+        master_id = instance.master_id  # type: ignore[attr-defined]
+        Configuration.objects.filter(pk=master_id).update(updated_at=timezone.now())
+    chain_registry.invalidate()
+
+
+def reset_injection(instance: Document, **kwargs: Any) -> None:  # pylint: disable=unused-argument
+    # What the chunks are made of changed - injected again, re-embedding only the chunks whose text changed
+    if instance.pk is None or not instance.injected:
+        return
+    current = instance.source()
+    previous = Document.objects.filter(pk=instance.pk).values(*current).first()
+    if previous is not None and {**previous, "file": previous["file"] or ""} != current:
+        instance.injected = False
+
+
+def remove_unsourced_chunks(instance: Document, **kwargs: Any) -> None:  # pylint: disable=unused-argument
+    # Nothing left to inject the chunks from - removed at once rather than answering from a source that is gone.
+    # A replaced source keeps them until injected again, so unchanged chunks are not embedded twice.
+    if not instance.file and not instance.url:
+        instance.chunks.all().delete()
+
+
+def queue_injection(instance: Document, **kwargs: Any) -> None:  # pylint: disable=unused-argument
+    if not instance.injected:
+        IngestionJob.enqueue(instance)
+
+
+def answer_sources() -> set[type[models.Model]]:
+    """Models whose content ends up in answers: the relational context, the documents and the configuration."""
+    sources: set[type[models.Model]] = {Configuration, Document}
+    for lexicon in RelationalContextGetter.LEXICON_BY_LOCALE.values():
+        sources.update(lexicon)
+
+    for model in list(sources):
+        if parler_meta := getattr(model, "_parler_meta", None):
+            sources.update(parler_meta.get_all_models())
+
+    return sources
+
+
+def connect() -> None:
+    for signal in (post_save, post_delete):
+        for model in answer_sources():
+            signal.connect(invalidate_answer_cache, sender=model, dispatch_uid=f"answer-cache-{model._meta.label}")
+        for model in (Configuration, ConfigurationTranslation):
+            signal.connect(invalidate_rag_chain, sender=model, dispatch_uid=f"rag-chain-{model._meta.label}")
+    pre_save.connect(reset_injection, sender=Document, dispatch_uid="document-reinjection")
+    post_save.connect(remove_unsourced_chunks, sender=Document, dispatch_uid="document-unsourced-chunks")
+    post_save.connect(queue_injection, sender=Document, dispatch_uid="document-ingestion")
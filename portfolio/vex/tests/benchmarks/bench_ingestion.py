@@ -0,0 +1,112 @@
+"""
+Peak memory of injecting a synthetic PDF, streamed page by page, next to loading, chunking and embedding it whole.
+Run from `portfolio/` against a database: python -m vex.tests.benchmarks.bench_ingestion [--pages 1000]
+Every measurement runs in a fresh process; embeddings are fake vectors of the model's dimensions.
+Exits with 1 when the streamed peak grows by more than the budget from a quarter of the pages to all of them
+(the default of 1000 pages makes even a quarter span several slices of embedding batches).
+"""
+
+# ruff: noqa: E402
+
+import argparse
+import multiprocessing
+import os
+import resource
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from unittest.mock import patch
+
+import django
+
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "portfolio.settings")
+django.setup()
+
+# Imported once Django is set up  # pylint: disable=wrong-import-position
+from django.test import override_settings
+from langchain_core.embeddings import DeterministicFakeEmbedding, Embeddings
+from langchain_text_splitters import RecursiveCharacterTextSplitter
+
+from vex.actions.inject_documents import inject_documents
+from vex.ai.database.store import ChunkStore
+from vex.models import EMBEDDING_DIMENSIONS, Document
+from vex.tests.benchmarks.documents import synthetic_pdf
+from vex.utils.document_loader import DocumentLoader
+
+BUDGET_MB = 32.0
+
+
+def rss_mb() -> float:
+    for line in Path("/proc/self/status").read_text(encoding="utf-8").splitlines():
+        if line.startswith("VmRSS:"):
+            return int(line.split()[1]) / 1024
+    return 0.0
+
+
+def peak_mb() -> float:
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024  # Kilobytes on Linux
+
+
+def whole(path: str, embeddings: Embeddings) -> int:
+    # Every page, chunk and vector in memory at once, as before streaming
+    pages = DocumentLoader(path).load()
+    chunks = RecursiveCharacterTextSplitter(chunk_size=1200, chunk_overlap=150).split_documents(pages)
+    return len(embeddings.embed_documents([chunk.page_content for chunk in chunks]))
+
+
+def streamed(path: str, embeddings: Embeddings) -> int:
+    document = Document.objects.create(title="Benchmark", injected=True)  # Not queued for the workers
+    Document.objects.filter(pk=document.pk).update(file=Path(path).name, injected=False)
+    document.refresh_from_db()
+    try:
+        with (
+            override_settings(MEDIA_ROOT=str(Path(path).parent)),
+            patch("vex.actions.inject_documents.store", return_value=ChunkStore(embeddings)),
+        ):
+            return inject_documents([document]).chunks
+    finally:
+        document.delete()
+
+
+def measure(mode: str, path: str) -> tuple[float, int, float]:
+    embeddings = DeterministicFakeEmbedding(size=EMBEDDING_DIMENSIONS)
+    baseline = rss_mb()
+    started = time.monotonic()
+    chunks = {"whole": whole, "streamed": streamed}[mode](path, embeddings)
+    return peak_mb() - baseline, chunks, time.monotonic() - started
+
+
+def run(mode: str, path: Path) -> tuple[float, int, float]:
+    # A fresh process per measurement, its peak is of that measurement alone
+    with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context("spawn")) as executor:
+        return executor.submit(measure, mode, str(path)).result()
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pages", type=int, default=1000)
+    args = parser.parse_args()
+
+    sizes = (args.pages // 4, args.pages)  # Both beyond a slice of embedding batches
+    growth = {}
+    with tempfile.TemporaryDirectory() as directory:
+        for pages in sizes:
+            path = Path(directory) / f"synthetic-{pages}.pdf"
+            synthetic_pdf(path, pages)
+            for mode in ("whole", "streamed"):
+                peak, chunks, seconds = run(mode, path)
+                growth[mode, pages] = peak
+                print(f"{mode:>8} {pages:>5} pages: {chunks:>5} chunks, peak RSS +{peak:.1f} MB in {seconds:.1f}s")
+
+    increase = growth["streamed", sizes[1]] - growth["streamed", sizes[0]]
+    verdict = "ok" if increase < BUDGET_MB else "EXCEEDED"
+    print(
+        f"streamed peak +{increase:.1f} MB over {sizes[1] - sizes[0]} more pages, budget {BUDGET_MB:.0f} MB: {verdict}"
+    )
+    return 0 if increase < BUDGET_MB else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
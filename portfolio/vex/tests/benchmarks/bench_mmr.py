@@ -0,0 +1,59 @@
+"""
+MMR overhead of the vector leg, next to langchain's implementation.
+Run from `portfolio/`: python -m vex.tests.benchmarks.bench_mmr [--fetch-k 50] [--k 6] [--dimensions 1536]
+Exits with 1 when the p95 of the vectorized MMR exceeds the budget.
+"""
+
+import argparse
+import sys
+import time
+from collections.abc import Callable
+
+import numpy as np
+from langchain_community.vectorstores.utils import maximal_marginal_relevance as langchain_mmr
+
+from vex.ai.database.mmr import maximal_marginal_relevance
+
+BUDGET_MS = 1.0
+
+
+def measure(run: Callable[[], object], repeat: int) -> np.ndarray:
+    run()  # warm-up
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        run()
+        samples.append((time.perf_counter() - started) * 1000)
+    return np.array(samples)
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--fetch-k", type=int, default=50)
+    parser.add_argument("--k", type=int, default=6)
+    parser.add_argument("--dimensions", type=int, default=1536)  # text-embedding-3-small
+    parser.add_argument("--lambda-mult", type=float, default=0.7)
+    parser.add_argument("--repeat", type=int, default=2000)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    query = rng.normal(size=args.dimensions).astype(np.float32)
+    candidates = rng.normal(size=(args.fetch_k, args.dimensions)).astype(np.float32)
+
+    runs = {
+        "vectorized": lambda: maximal_marginal_relevance(query, candidates, k=args.k, lambda_mult=args.lambda_mult),
+        "langchain": lambda: langchain_mmr(query, list(candidates), k=args.k, lambda_mult=args.lambda_mult),
+    }
+    print(f"fetch_k={args.fetch_k} k={args.k} dimensions={args.dimensions} repeat={args.repeat}")
+    results = {name: measure(run, args.repeat) for name, run in runs.items()}
+    for name, samples in results.items():
+        p50, p95 = np.percentile(samples, [50, 95])
+        print(f"{name:>10}: p50 {p50:.3f} ms  p95 {p95:.3f} ms")
+
+    p95 = float(np.percentile(results["vectorized"], 95))
+    print(f"budget {BUDGET_MS:.1f} ms: {'ok' if p95 < BUDGET_MS else 'EXCEEDED'}")
+    return 0 if p95 < BUDGET_MS else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
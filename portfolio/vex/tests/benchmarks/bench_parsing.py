@@ -0,0 +1,84 @@
+"""
+Pages parsed per second in processes, next to the serial loader: dozens of synthetic PDFs of a bulk import,
+one per process as `ingestion_worker --processes` runs them, and one long PDF split into ranges of pages.
+Run from `portfolio/`: python -m vex.tests.benchmarks.bench_parsing [--documents 24] [--pages 100] [--workers 4]
+Exits with 1 when the pool's pages differ from the serial loader's, in content or order.
+"""
+
+import argparse
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+from collections.abc import Callable
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+from langchain_core.documents import Document
+
+from vex.tests.benchmarks.documents import synthetic_pdf
+from vex.utils.document_loader import DocumentLoader
+
+
+def parse(path: str) -> list[Document]:
+    return DocumentLoader(path).load()
+
+
+def load_in_processes(paths: list[str], workers: int) -> list[list[Document]]:
+    with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn")) as pool:
+        return list(pool.map(parse, paths))
+
+
+def measure(load: Callable[[], list[list[Document]]]) -> tuple[list[list[Document]], float]:
+    started = time.perf_counter()
+    documents = load()
+    pages = sum(len(document) for document in documents)
+    return documents, pages / (time.perf_counter() - started)
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--documents", type=int, default=24)
+    parser.add_argument("--pages", type=int, default=100)
+    parser.add_argument("--long", type=int, default=1000, help="Pages of the long PDF")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--pages-per-task", type=int, default=32)
+    args = parser.parse_args()
+
+    print(f"workers={args.workers} pages_per_task={args.pages_per_task} cpus={os.cpu_count()}")
+    identical = True
+    with tempfile.TemporaryDirectory() as directory:
+        paths = [str(Path(directory) / f"bulk-{number}.pdf") for number in range(args.documents)]
+        for path in paths:
+            synthetic_pdf(Path(path), args.pages)
+        long = str(Path(directory) / "long.pdf")
+        synthetic_pdf(Path(long), args.long)
+
+        cases = {
+            f"{args.documents} x {args.pages} pages": (
+                lambda: [parse(path) for path in paths],
+                lambda: load_in_processes(paths, args.workers),
+            ),
+            f"1 x {args.long} pages": (
+                lambda: [DocumentLoader(long).load()],
+                lambda: [DocumentLoader(long, workers=args.workers, pages_per_task=args.pages_per_task).load()],
+            ),
+        }
+        for case, (serial, pool) in cases.items():
+            expected, serial_rate = measure(serial)
+            documents, pool_rate = measure(pool)
+            identical &= [[page.page_content for page in document] for document in documents] == [
+                [page.page_content for page in document] for document in expected
+            ]
+            print(
+                f"{case:>20}: serial {serial_rate:,.0f} pages/s, pool {pool_rate:,.0f} pages/s "
+                f"({pool_rate / serial_rate:.2f}x)"
+            )
+
+    print(f"pages of the pool {'identical to' if identical else 'DIFFER from'} the serial loader's")
+    return 0 if identical else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,16 @@
+import random
+from pathlib import Path
+
+import pymupdf
+
+WORDS = "vector index chunk embedding portfolio django postgres query page document stream batch memory".split()
+
+
+def synthetic_pdf(path: Path, pages: int) -> None:
+    with pymupdf.open() as pdf:
+        for number in range(pages):
+            words = random.Random(number).choices(WORDS, k=400)  # About 2.5k characters, a page of prose
+            pdf.new_page().insert_textbox(
+                pymupdf.Rect(36, 36, 576, 806), f"Page {number}. {' '.join(words)}.", fontsize=8
+            )
+        pdf.save(path)
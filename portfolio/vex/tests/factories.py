@@ -4,7 +4,7 @@ from factory.django import DjangoModelFactory
 
 from utils.factories import i18nMixin
 from vex.choices import Roles
-from vex.models import Configuration, Conversation, Document, Message
+from vex.models import EMBEDDING_DIMENSIONS, Chunk, Configuration, Conversation, Document, Message
 
 fake = faker.Faker()
 
@@ -35,6 +35,21 @@ class DocumentFactory(DjangoModelFactory):
     injected = False
 
 
+def vector(*values: float) -> list[float]:
+    """An embedding starting with the values, zero-padded to the model's dimensions (cosine distances unchanged)."""
+    return [*values, *[0.0] * (EMBEDDING_DIMENSIONS - len(values))]
+
+
+class ChunkFactory(DjangoModelFactory):
+    class Meta:
+        model = Chunk
+
+    document = factory.SubFactory(DocumentFactory)
+    locale = "en"
+    content = factory.Faker("sentence")
+    embedding = factory.LazyFunction(lambda: vector(fake.pyfloat(), fake.pyfloat(), 1.0))
+
+
 class ConfigurationFactory(DjangoModelFactory, i18nMixin):
     class Meta:
         model = Configuration
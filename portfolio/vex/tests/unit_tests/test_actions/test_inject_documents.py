@@ -1,13 +1,31 @@
 import shutil
 import tempfile
+from collections.abc import Iterator
 from unittest.mock import MagicMock, patch
 
 from django.core.files.uploadedfile import SimpleUploadedFile
-from django.test import TestCase
+from django.test import TestCase, override_settings
 from langchain_core.documents import Document
 
-from vex.actions.inject_documents import InjectDocument
-from vex.tests.factories import DocumentFactory
+from vex.actions.inject_documents import (
+    InjectDocument,
+    Injection,
+    InjectionReport,
+    inject_documents,
+    queue_inject_documents,
+)
+from vex.ai.database.store import ChunkStore, content_digest
+from vex.choices import JobStatuses
+from vex.models import Chunk
+from vex.models import Document as VexDocument
+from vex.tests.factories import DocumentFactory, vector
+from vex.utils.document_loader import DocumentLoader
+
+
+def fake_embeddings() -> MagicMock:
+    embeddings = MagicMock()
+    embeddings.embed_documents.side_effect = lambda texts: [vector(1.0, float(i)) for i in range(len(texts))]
+    return embeddings
 
 
 class InjectDocumentsActionTestCase(TestCase):
@@ -17,70 +35,259 @@ class InjectDocumentsActionTestCase(TestCase):
         self._override = self.settings(MEDIA_ROOT=self._tmp_media)
         self._override.enable()
 
+        self.embeddings = fake_embeddings()
+        store_patch = patch("vex.actions.inject_documents.store", return_value=ChunkStore(self.embeddings))
+        store_patch.start()
+        self.addCleanup(store_patch.stop)
+
     def tearDown(self) -> None:
         self._override.disable()
         shutil.rmtree(self._tmp_media, ignore_errors=True)
 
+    def upload(self, content: bytes) -> SimpleUploadedFile:
+        return SimpleUploadedFile("test.txt", content, content_type="text/plain")
+
     def test_inject_from_file_marks_as_injected_and_writes_chunks(self) -> None:
-        # Prepare a small text file
-        content = b"This is a small test document.\nIt has multiple lines.\n"
-        upload = SimpleUploadedFile("test.txt", content, content_type="text/plain")
-        doc = DocumentFactory(title="Test Doc", file=upload, url=None, injected=False)
+        doc = DocumentFactory(title="Test Doc", file=self.upload(b"Hello World"), url=None, injected=False)
 
         # Mock loader to return a single Document
-        with (
-            patch("vex.actions.inject_documents.DocumentLoader") as Loader,
-            patch("vex.actions.inject_documents.store") as store_fn,
-        ):
-            loader_instance = Loader.return_value
-            loader_instance.load.return_value = [Document(page_content="Hello World")]  # raw docs
-
-            vector_store = MagicMock()
-            store_fn.return_value = vector_store
+        with patch.object(InjectDocument, "DOCUMENT_LOADER") as Loader:
+            Loader.return_value.lazy_load.return_value = [Document(page_content="Hello World")]  # raw docs
 
             InjectDocument(document=doc, chunk_size=50, chunk_overlap=0).inject()
 
-            # mark_as_injected should be called (field flipped)
-            doc.refresh_from_db()
-            self.assertTrue(doc.injected)
+        # mark_as_injected should be called (field flipped), remembering the digest of the file
+        doc.refresh_from_db()
+        self.assertTrue(doc.injected)
+        self.assertEqual(len(doc.digest), 64)
+
+        # Chunks were added to the vector store
+        chunk = Chunk.objects.get(document=doc)
+        self.assertEqual((chunk.content, chunk.metadata["title"]), ("Hello World", "Test Doc"))
+        self.assertEqual(chunk.digest, content_digest("Hello World"))
+
+    def test_chunks_of_text_sections_are_indexed_in_the_whole_text(self) -> None:
+        text = "".join(f"Paragraph number {i}.\n" for i in range(12))
+        doc = DocumentFactory(file=SimpleUploadedFile("notes.txt", text.encode()), url=None, injected=False)
+
+        with patch.object(DocumentLoader, "SECTION_SIZE", 60):
+            InjectDocument(document=doc, chunk_size=30, chunk_overlap=0).inject()
 
-            # Chunks were added to the vector store
-            vector_store.add_documents.assert_called()
-            args, kwargs = vector_store.add_documents.call_args
-            self.assertTrue(args)
-            self.assertGreater(len(args[0]), 0)  # at least one chunk
+        chunks = Chunk.objects.filter(document=doc).order_by("offset")
+        self.assertEqual(len(chunks), 12)
+        for chunk in chunks:
+            self.assertEqual(text[chunk.offset : chunk.offset + len(chunk.content)], chunk.content)
 
     def test_inject_from_url_adds_placeholder(self) -> None:
         doc = DocumentFactory(title="URL Doc", url="https://example.com/paper.pdf", file=None, injected=False)
 
-        with patch("vex.actions.inject_documents.store") as store_fn:
-            vector_store = MagicMock()
-            store_fn.return_value = vector_store
+        InjectDocument(document=doc).inject()
 
-            InjectDocument(document=doc).inject()
-            doc.refresh_from_db()
-            self.assertTrue(doc.injected)
-            vector_store.add_documents.assert_called()
+        doc.refresh_from_db()
+        self.assertTrue(doc.injected)
+        self.assertEqual(list(Chunk.objects.values_list("content", flat=True)), ["URL: https://example.com/paper.pdf"])
 
     def test_inject_skips_when_already_injected(self) -> None:
-        doc = DocumentFactory(title="Done", url="https://example.com", file=None, injected=True)
+        doc = DocumentFactory(title="Done", url="https://example.com", file=None, injected=False)
+        InjectDocument(document=doc).inject()
+        self.embeddings.embed_documents.reset_mock()
 
-        with patch("vex.actions.inject_documents.store") as store_fn:
-            vector_store = MagicMock()
-            store_fn.return_value = vector_store
+        InjectDocument(document=doc).inject()
 
-            InjectDocument(document=doc).inject()
-            # No additional writes expected
-            vector_store.add_documents.assert_not_called()
+        # No additional writes expected
+        self.embeddings.embed_documents.assert_not_called()
+        self.assertEqual(Chunk.objects.count(), 1)
 
     def test_inject_handles_no_content(self) -> None:
         doc = DocumentFactory(title="Empty", file=None, url=None, injected=False)
 
-        with patch("vex.actions.inject_documents.store") as store_fn:
-            vector_store = MagicMock()
-            store_fn.return_value = vector_store
+        InjectDocument(document=doc).inject()
+
+        doc.refresh_from_db()
+        self.assertFalse(doc.injected)
+        self.embeddings.embed_documents.assert_not_called()
+
+
+class ReinjectDocumentTestCase(TestCase):
+    PAGES = ["Python and Django backend.", "Postgres with pgvector.", "Hiking in the Tatra mountains."]
+
+    def setUp(self) -> None:
+        self._tmp_media = tempfile.mkdtemp()
+        self._override = self.settings(MEDIA_ROOT=self._tmp_media)
+        self._override.enable()
+        self.addCleanup(shutil.rmtree, self._tmp_media, ignore_errors=True)
+        self.addCleanup(self._override.disable)
+
+        self.embeddings = fake_embeddings()
+        store_patch = patch("vex.actions.inject_documents.store", return_value=ChunkStore(self.embeddings))
+        store_patch.start()
+        self.addCleanup(store_patch.stop)
+
+        self.document = DocumentFactory(file=SimpleUploadedFile("cv.pdf", b"v1"), url=None, injected=False)
+        self.inject(self.PAGES)
+
+    def inject(self, pages: list[str]) -> InjectionReport:
+        self.embeddings.embed_documents.reset_mock()
+        with patch.object(InjectDocument, "DOCUMENT_LOADER") as loader:
+            loader.return_value.lazy_load.return_value = [
+                Document(page_content=text, metadata={"page": page}) for page, text in enumerate(pages)
+            ]
+            return inject_documents([self.document], chunk_size=40, chunk_overlap=0)
+
+    def replace_file(self, content: bytes) -> None:
+        self.document.file = SimpleUploadedFile("cv.pdf", content)
+        self.document.save()
+        self.document.refresh_from_db()
+
+    def test_only_changed_chunks_are_embedded_and_stale_ones_removed(self) -> None:
+        before = dict(Chunk.objects.values_list("content", "pk"))
+        self.replace_file(b"v2")
+        self.assertFalse(self.document.injected)  # queued again
+
+        report = self.inject(["Intro.", "Python and Django backend.", "Postgres with pgvector and HNSW."])
+
+        self.embeddings.embed_documents.assert_called_once_with(["Intro.", "Postgres with pgvector and HNSW."])
+        self.assertEqual((report.chunks, report.reused, report.removed), (2, 1, 2))
+        chunks = {chunk.content: chunk for chunk in Chunk.objects.filter(document=self.document)}
+        self.assertEqual(set(chunks), {"Intro.", "Python and Django backend.", "Postgres with pgvector and HNSW."})
+        kept = chunks["Python and Django backend."]
+        self.assertEqual((kept.pk, kept.page), (before["Python and Django backend."], 1))  # moved, not re-embedded
+
+    def test_unchanged_source_is_not_loaded_again(self) -> None:
+        report = self.inject(self.PAGES)
+
+        self.assertEqual((report.documents, report.chunks), (0, 0))
+        self.embeddings.embed_documents.assert_not_called()
+
+    def test_metadata_change_keeps_every_embedding(self) -> None:
+        self.document.language = "pl"
+        self.document.save()
+
+        report = self.inject(self.PAGES)
+
+        self.embeddings.embed_documents.assert_not_called()
+        self.assertEqual((report.chunks, report.reused, report.removed), (0, 3, 0))
+        self.assertEqual(set(Chunk.objects.values_list("locale", flat=True)), {"pl"})
+
+    def test_repeated_text_is_stored_once_per_occurrence(self) -> None:
+        self.replace_file(b"v2")
+
+        report = self.inject([*self.PAGES, "Python and Django backend."])
+
+        self.embeddings.embed_documents.assert_called_once_with(["Python and Django backend."])
+        self.assertEqual(Chunk.objects.filter(content="Python and Django backend.").count(), 2)
+        self.assertEqual(report.reused, 3)
+
+
+class InjectManyDocumentsTestCase(TestCase):
+    def setUp(self) -> None:
+        self._tmp_media = tempfile.mkdtemp()
+        self._override = self.settings(MEDIA_ROOT=self._tmp_media)
+        self._override.enable()
+        self.addCleanup(shutil.rmtree, self._tmp_media, ignore_errors=True)
+        self.addCleanup(self._override.disable)
+
+        embeddings = MagicMock()
+        embeddings.embed_documents.side_effect = lambda texts: [vector(1.0, float(i)) for i in range(len(texts))]
+        self.embeddings = embeddings
+        store_patch = patch("vex.actions.inject_documents.store", return_value=ChunkStore(embeddings))
+        store_patch.start()
+        self.addCleanup(store_patch.stop)
+
+    def test_chunks_of_all_documents_are_embedded_together(self) -> None:
+        english = DocumentFactory(url="https://example.com/en", file=None, injected=False, language="en")
+        polish = DocumentFactory(url="https://example.com/pl", file=None, injected=False, language="pl")
+        DocumentFactory(file=None, url=None, injected=False)  # nothing to inject
+
+        report = inject_documents(VexDocument.objects.order_by("pk"))
+
+        self.embeddings.embed_documents.assert_called_once_with(
+            ["URL: https://example.com/en", "URL: https://example.com/pl"]
+        )
+        self.assertEqual((report.documents, report.chunks), (2, 2))
+        self.assertGreater(report.tokens, 0)
+        self.assertEqual(
+            sorted(Chunk.objects.values_list("document", "locale", "offset")),
+            [(english.pk, "en", 0), (polish.pk, "pl", 0)],
+        )
+        self.assertEqual(VexDocument.objects.filter(injected=True).count(), 2)
+
+    def test_failed_embedding_leaves_documents_to_retry(self) -> None:
+        DocumentFactory(url="https://example.com", file=None, injected=False)
+        self.embeddings.embed_documents.side_effect = RuntimeError("API down")
+
+        with self.assertRaises(RuntimeError):
+            inject_documents(VexDocument.objects.all())
+        self.assertFalse(VexDocument.objects.filter(injected=True).exists())
+        self.assertFalse(Chunk.objects.exists())
+
+    @override_settings(VECTOR_EMBEDDING_BATCH_SIZE=2, VECTOR_EMBEDDING_CONCURRENCY=1)
+    def test_progress_is_reported_after_every_slice(self) -> None:
+        document = DocumentFactory(file=None, injected=False)
+        injector = MagicMock(document=document)
+        read = [0]
+
+        def chunks() -> Iterator[Document]:
+            for i in range(5):
+                read[0] = i + 1
+                yield Document(page_content=f"Chunk {i}", metadata={"document_pk": document.pk, "locale": "en"})
+
+        injector.prepare.return_value = Injection.of(document, "", chunks(), loaded=lambda: read[0] / 5)
+        progress = MagicMock()
+
+        with patch("vex.actions.inject_documents.InjectDocument", return_value=injector):
+            inject_documents([document], on_progress=progress)
+
+        self.assertEqual([call.args for call in progress.call_args_list], [(2, 5), (4, 5), (5, 5)])
+        self.assertEqual(Chunk.objects.filter(document=document).count(), 5)
+
+    @override_settings(VECTOR_EMBEDDING_BATCH_SIZE=2, VECTOR_EMBEDDING_CONCURRENCY=1)
+    def test_pages_are_embedded_and_written_while_the_source_is_read(self) -> None:
+        document = DocumentFactory(file=SimpleUploadedFile("big.pdf", b"%PDF"), url=None, injected=False)
+        events = []
+
+        def pages() -> Iterator[Document]:
+            for page in range(4):
+                events.append(f"page {page}")
+                yield Document(page_content=f"Page {page}", metadata={"page": page})
+
+        self.embeddings.embed_documents.side_effect = lambda texts: events.append(f"embed {len(texts)}") or [
+            vector(1.0) for _ in texts
+        ]
+        with patch.object(InjectDocument, "DOCUMENT_LOADER") as loader:
+            loader.return_value.lazy_load.return_value = pages()
+            inject_documents([document])
+
+        self.assertEqual(events, ["page 0", "page 1", "embed 2", "page 2", "page 3", "embed 2"])
+        self.assertEqual(Chunk.objects.filter(document=document).count(), 4)
+
+    @override_settings(VECTOR_EMBEDDING_BATCH_SIZE=2, VECTOR_EMBEDDING_CONCURRENCY=1)
+    def test_retry_keeps_the_chunks_written_before_a_failure(self) -> None:
+        document = DocumentFactory(file=SimpleUploadedFile("big.pdf", b"%PDF"), url=None, injected=False)
+        pages = [Document(page_content=f"Page {page}", metadata={"page": page}) for page in range(4)]
+        self.embeddings.embed_documents.side_effect = [[vector(1.0)] * 2, RuntimeError("API down")]
+
+        with patch.object(InjectDocument, "DOCUMENT_LOADER") as loader:
+            loader.return_value.lazy_load.side_effect = lambda: iter(pages)
+            with self.assertRaises(RuntimeError):
+                inject_documents([document])
+            self.assertEqual(Chunk.objects.filter(document=document).count(), 2)
+
+            self.embeddings.embed_documents.side_effect = lambda texts: [vector(1.0) for _ in texts]
+            report = inject_documents([document])
+
+        self.embeddings.embed_documents.assert_called_with(["Page 2", "Page 3"])
+        self.assertEqual((report.chunks, report.reused), (2, 2))
+        document.refresh_from_db()
+        self.assertTrue(document.injected)
+
+    def test_admin_action_queues_documents(self) -> None:
+        document = DocumentFactory(url="https://example.com", file=None, injected=True)
+        model_admin = MagicMock()
+
+        queue_inject_documents(model_admin, MagicMock(), VexDocument.objects.all())
+        queue_inject_documents(model_admin, MagicMock(), VexDocument.objects.all())
 
-            InjectDocument(document=doc).inject()
-            doc.refresh_from_db()
-            self.assertFalse(doc.injected)
-            vector_store.add_documents.assert_not_called()
+        self.assertEqual(document.jobs.filter(status=JobStatuses.QUEUED).count(), 1)  # once, however often queued
+        self.assertEqual(model_admin.message_user.call_args.args[1], "1 document(s) queued for injection.")
+        self.assertFalse(Chunk.objects.exists())  # nothing injected within the request
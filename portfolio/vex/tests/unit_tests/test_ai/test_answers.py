@@ -0,0 +1,59 @@
+from unittest.mock import patch
+
+from django.test import TestCase
+
+from vex.ai.answers import SemanticAnswerCache
+
+
+class SemanticAnswerCacheTestCase(TestCase):
+    def setUp(self) -> None:
+        self.cache = SemanticAnswerCache(threshold=0.95, ttl=60, maxsize=2)
+
+    def test_returns_answer_for_near_duplicate_question(self) -> None:
+        self.cache.set([1.0, 0.0, 0.0], "Python, Django", locale="en", version="v1")
+
+        self.assertEqual(self.cache.get([0.99, 0.05, 0.0], locale="en", version="v1"), "Python, Django")
+        self.assertEqual(self.cache.stats, {"hits": 1, "misses": 0, "size": 1})
+
+    def test_misses_below_threshold(self) -> None:
+        self.cache.set([1.0, 0.0, 0.0], "Python, Django", locale="en", version="v1")
+
+        self.assertIsNone(self.cache.get([0.5, 0.5, 0.0], locale="en", version="v1"))
+        self.assertEqual(self.cache.stats["misses"], 1)
+
+    def test_entries_are_scoped_by_locale_and_version(self) -> None:
+        self.cache.set([1.0, 0.0], "English answer", locale="en", version="v1")
+
+        self.assertIsNone(self.cache.get([1.0, 0.0], locale="pl", version="v1"))
+        self.assertIsNone(self.cache.get([1.0, 0.0], locale="en", version="v2"))
+
+    def test_picks_most_similar_entry(self) -> None:
+        self.cache.set([1.0, 0.0], "first", locale="en", version="v1")
+        self.cache.set([0.0, 1.0], "second", locale="en", version="v1")
+
+        self.assertEqual(self.cache.get([0.01, 1.0], locale="en", version="v1"), "second")
+
+    def test_entries_expire_after_ttl(self) -> None:
+        with patch("vex.ai.answers.time.monotonic", return_value=100.0):
+            self.cache.set([1.0, 0.0], "answer", locale="en", version="v1")
+        with patch("vex.ai.answers.time.monotonic", return_value=161.0):
+            self.assertIsNone(self.cache.get([1.0, 0.0], locale="en", version="v1"))
+        self.assertEqual(self.cache.stats["size"], 0)
+
+    def test_evicts_least_recently_used(self) -> None:
+        self.cache.set([1.0, 0.0, 0.0], "a", locale="en", version="v1")
+        self.cache.set([0.0, 1.0, 0.0], "b", locale="en", version="v1")
+        self.cache.get([1.0, 0.0, 0.0], locale="en", version="v1")  # refresh "a"
+        self.cache.set([0.0, 0.0, 1.0], "c", locale="en", version="v1")  # evicts "b"
+
+        self.assertEqual(self.cache.get([1.0, 0.0, 0.0], locale="en", version="v1"), "a")
+        self.assertIsNone(self.cache.get([0.0, 1.0, 0.0], locale="en", version="v1"))
+
+    def test_ignores_empty_answers(self) -> None:
+        self.cache.set([1.0, 0.0], "  ", locale="en", version="v1")
+        self.assertEqual(self.cache.stats["size"], 0)
+
+    def test_clear_drops_entries(self) -> None:
+        self.cache.set([1.0, 0.0], "answer", locale="en", version="v1")
+        self.cache.clear()
+        self.assertIsNone(self.cache.get([1.0, 0.0], locale="en", version="v1"))
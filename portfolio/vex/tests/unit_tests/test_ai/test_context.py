@@ -0,0 +1,89 @@
+# pylint: disable=protected-access
+
+from unittest.mock import patch
+
+from django.test import SimpleTestCase
+from langchain_core.documents import Document
+
+from vex.ai.context import ContextPacker
+
+
+def word_count(text: str, *_args) -> int:
+    return len(text.split())
+
+
+def word_truncate(text: str, limit: int, *_args) -> str:
+    return " ".join(text.split()[:limit])
+
+
+class ContextPackerTestCase(SimpleTestCase):
+    def setUp(self) -> None:
+        self.packer = ContextPacker(budget=100, budgets={"pl": 10}, similarity=0.8)
+        self.packer.MIN_TRUNCATED_TOKENS = 3
+
+        for target, replacement in (("count_tokens", word_count), ("truncate_tokens", word_truncate)):
+            patcher = patch(f"vex.ai.context.{target}", side_effect=replacement)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def test_orders_passages_by_relevance(self) -> None:
+        documents = [
+            Document(page_content="low ranked vector hit", metadata={"score": 0.2}),
+            Document(page_content="high ranked vector hit", metadata={"score": 0.9}),
+            Document(page_content="Python and Django skills"),  # 2 of 2 question terms
+        ]
+        packed = self.packer.pack("django skills", "en", documents)
+        self.assertEqual(
+            packed.passages, ["Python and Django skills", "high ranked vector hit", "low ranked vector hit"]
+        )
+        self.assertTrue(packed.text.startswith("[1] Python and Django skills"))
+
+    def test_drops_exact_and_near_duplicates(self) -> None:
+        documents = [
+            Document(page_content="one two three four five six seven eight nine ten", metadata={"score": 0.5}),
+            Document(page_content="One two three four five six seven eight nine ten.", metadata={"score": 0.4}),
+            Document(page_content="one two three four five six seven eight nine ten eleven", metadata={"score": 0.9}),
+            Document(page_content="something else entirely", metadata={"score": 0.1}),
+            Document(page_content="   "),
+        ]
+        packed = self.packer.pack("q", "en", documents)
+        self.assertEqual(
+            packed.passages, ["one two three four five six seven eight nine ten eleven", "something else entirely"]
+        )
+        self.assertEqual(packed.duplicates, 2)
+        self.assertEqual(packed.original_tokens, 34)
+        self.assertEqual(packed.saved_tokens, 20)
+
+    def test_truncates_at_the_locale_budget(self) -> None:
+        documents = [
+            Document(page_content="a b c d e f", metadata={"score": 0.9}),
+            Document(page_content="g h i j k l", metadata={"score": 0.8}),
+            Document(page_content="m n o", metadata={"score": 0.7}),
+        ]
+        self.assertEqual(self.packer.pack("q", "pl", documents).passages, ["a b c d e f", "g h i j"])
+        self.assertEqual(self.packer.pack("q", "en", documents).tokens, 15)
+
+    def test_skips_too_short_tail(self) -> None:
+        documents = [
+            Document(page_content="a b c d e f g h", metadata={"score": 0.9}),
+            Document(page_content="i j k l", metadata={"score": 0.8}),
+        ]
+        packed = self.packer.pack("q", "pl", documents)
+        self.assertEqual(packed.passages, ["a b c d e f g h"])
+        self.assertEqual(packed.saved_tokens, 4)
+
+    def test_zero_budget_disables_the_limit(self) -> None:
+        packer = ContextPacker(budget=0, similarity=0.8)
+        documents = [Document(page_content=f"{i} " * 200) for i in range(3)]
+        self.assertEqual(packer.pack("q", "en", documents).tokens, 600)
+        self.assertEqual(packer.budget_for("pl"), 0)
+
+    def test_reports_saved_tokens(self) -> None:
+        documents = [Document(page_content="same text here"), Document(page_content="same text here")]
+        with self.assertLogs("vex.ai.context", level="INFO") as logs:
+            self.packer.pack("q", "en", documents)
+            self.packer.pack("q", "en", documents)
+        self.assertIn("3 saved", logs.output[0])
+        self.assertEqual(
+            self.packer.stats, {"packed": 2, "tokens_in": 12, "tokens_out": 6, "duplicates": 2, "saved": 6}
+        )
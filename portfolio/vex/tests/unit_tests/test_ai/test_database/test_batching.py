@@ -0,0 +1,125 @@
+import threading
+from types import SimpleNamespace
+from unittest.mock import MagicMock, patch
+
+from django.test import SimpleTestCase
+
+from vex.ai.database.batching import AdaptiveLimit, BatchedEmbeddings
+
+
+class RateLimited(Exception):
+    status_code = 429
+
+    def __init__(self, retry_after: str | None = None) -> None:
+        super().__init__("Too Many Requests")
+        self.response = SimpleNamespace(headers={"retry-after": retry_after} if retry_after else {})
+
+
+class FakeEmbeddings:
+    """Embeds a text as its length, optionally rate limiting the first requests."""
+
+    def __init__(self, *, rate_limited: int = 0, retry_after: str | None = None, delay: float = 0.0) -> None:
+        self.rate_limited = rate_limited
+        self.retry_after = retry_after
+        self.delay = delay
+        self.requests: list[list[str]] = []
+        self.in_flight = self.max_in_flight = 0
+        self._lock = threading.Lock()
+
+    def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        with self._lock:
+            self.requests.append(texts)
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+            limited = len(self.requests) <= self.rate_limited
+        try:
+            threading.Event().wait(self.delay)  # time.sleep is patched by the tests
+            if limited:
+                raise RateLimited(self.retry_after)
+            return [[float(len(text))] for text in texts]
+        finally:
+            with self._lock:
+                self.in_flight -= 1
+
+    def embed_query(self, text: str) -> list[float]:
+        return [float(len(text))]
+
+
+@patch("vex.ai.database.batching.count_tokens", new=lambda text, model: len(text))
+@patch("vex.ai.database.batching.time.sleep")
+class BatchedEmbeddingsTestCase(SimpleTestCase):
+    def batched(self, embeddings: FakeEmbeddings, **kwargs) -> BatchedEmbeddings:
+        return BatchedEmbeddings(embeddings, model="test", **kwargs)  # type: ignore[arg-type]
+
+    def test_batches_are_bounded_by_texts_and_tokens(self, sleep: MagicMock) -> None:
+        batched = self.batched(FakeEmbeddings(), batch_size=3, batch_tokens=10)
+
+        self.assertEqual(
+            list(batched.batches(["a", "b", "c", "d", "eeeeeeee", "fff", "gggggggggggggggg"])),
+            [["a", "b", "c"], ["d", "eeeeeeee"], ["fff"], ["gggggggggggggggg"]],  # an oversized text goes alone
+        )
+        sleep.assert_not_called()
+
+    def test_concurrent_batches_keep_the_order_of_texts(self, _sleep: MagicMock) -> None:
+        embeddings = FakeEmbeddings(delay=0.01)
+        texts = ["x" * i for i in range(1, 41)]
+
+        vectors = self.batched(embeddings, batch_size=2, concurrency=3).embed_documents(texts)
+
+        self.assertEqual(vectors, [[float(i)] for i in range(1, 41)])
+        self.assertEqual(len(embeddings.requests), 20)
+        self.assertEqual(embeddings.max_in_flight, 3)
+
+    def test_rate_limited_batch_waits_for_retry_after_and_lowers_concurrency(self, sleep: MagicMock) -> None:
+        embeddings = FakeEmbeddings(rate_limited=1, retry_after="2")
+        batched = self.batched(embeddings, concurrency=4)
+
+        self.assertEqual(batched.embed_documents(["ab"]), [[2.0]])
+        sleep.assert_called_once_with(2.0)
+        self.assertEqual(len(embeddings.requests), 2)
+        self.assertLess(batched.limit.limit, 4)
+
+    def test_backoff_grows_exponentially_without_retry_after(self, sleep: MagicMock) -> None:
+        batched = self.batched(FakeEmbeddings(rate_limited=3), backoff=1.0)
+
+        batched.embed_documents(["ab"])
+
+        delays = [call.args[0] for call in sleep.call_args_list]
+        self.assertEqual(len(delays), 3)
+        for attempt, delay in enumerate(delays):
+            self.assertTrue(0.5 * 2**attempt <= delay <= 2**attempt)
+
+    def test_gives_up_after_max_retries(self, sleep: MagicMock) -> None:
+        with self.assertRaises(RateLimited):
+            self.batched(FakeEmbeddings(rate_limited=10), max_retries=2).embed_documents(["ab"])
+        self.assertEqual(sleep.call_count, 2)
+
+    def test_other_errors_are_not_retried(self, sleep: MagicMock) -> None:
+        embeddings = MagicMock()
+        embeddings.embed_documents.side_effect = ValueError("bad input")
+
+        with self.assertRaises(ValueError):
+            self.batched(embeddings).embed_documents(["ab"])
+        sleep.assert_not_called()
+
+    def test_queries_are_passed_through(self, _sleep: MagicMock) -> None:
+        self.assertEqual(self.batched(FakeEmbeddings()).embed_query("abc"), [3.0])
+
+
+class AdaptiveLimitTestCase(SimpleTestCase):
+    def test_halves_on_rate_limit_and_grows_back_additively(self) -> None:
+        limit = AdaptiveLimit(8)
+
+        for expected in (4.0, 2.0, 1.0, 1.0):
+            limit.decrease()
+            self.assertEqual(limit.limit, expected)
+
+        limit.increase()
+        self.assertEqual(limit.limit, 2.0)
+        limit.increase()
+        limit.increase()
+        self.assertAlmostEqual(limit.limit, 2.9)  # about one more slot per window of as many successes
+
+        for _ in range(100):
+            limit.increase()
+        self.assertEqual(limit.limit, 8.0)
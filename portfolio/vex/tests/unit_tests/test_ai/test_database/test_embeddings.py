@@ -0,0 +1,105 @@
+from unittest.mock import MagicMock, patch
+
+from django.db import DatabaseError
+from django.test import TestCase
+from prometheus_client import REGISTRY
+
+from vex.ai.database.embeddings import CachedEmbeddings, normalize
+from vex.models import CachedEmbedding
+
+
+def fake_embeddings() -> MagicMock:
+    embeddings = MagicMock()
+    embeddings.embed_query.side_effect = lambda text: [float(len(text)), 1.0]
+    embeddings.embed_documents.side_effect = lambda texts: [[float(len(t))] for t in texts]
+    return embeddings
+
+
+class NormalizeTestCase(TestCase):
+    def test_normalize_collapses_whitespace_and_case(self) -> None:
+        self.assertEqual(normalize("  What are\n your   SKILLS "), "what are your skills")
+
+    def test_normalize_handles_empty(self) -> None:
+        self.assertEqual(normalize(""), "")
+
+
+class CachedEmbeddingsTestCase(TestCase):
+    def setUp(self) -> None:
+        self.embeddings = fake_embeddings()
+        self.cache = CachedEmbeddings(self.embeddings, model="test-model", maxsize=2)
+
+    def test_miss_embeds_and_persists(self) -> None:
+        vector = self.cache.embed_query("What are your skills")
+
+        self.assertEqual(vector, [20.0, 1.0])
+        self.embeddings.embed_query.assert_called_once_with("what are your skills")
+        self.assertEqual(CachedEmbedding.objects.get(model="test-model").vector, [20.0, 1.0])
+        self.assertEqual(self.cache.stats["misses"], 1)
+
+    def test_repeat_question_hits_memory_without_network_or_database(self) -> None:
+        hits = REGISTRY.get_sample_value("vex_embedding_cache_lookups_total", {"result": "memory_hits"}) or 0.0
+        self.cache.embed_query("What are your skills")
+        with self.assertNumQueries(0):
+            vector = self.cache.embed_query("  what ARE your skills ")
+
+        self.assertEqual(vector, [20.0, 1.0])
+        self.assertEqual(self.embeddings.embed_query.call_count, 1)
+        self.assertEqual(self.cache.stats["memory_hits"], 1)
+        self.assertEqual(self.cache.hit_ratio, 0.5)
+        self.assertEqual(
+            REGISTRY.get_sample_value("vex_embedding_cache_lookups_total", {"result": "memory_hits"}), hits + 1
+        )
+
+    def test_database_tier_survives_process_cache(self) -> None:
+        self.cache.embed_query("What are your skills")
+
+        fresh = CachedEmbeddings(self.embeddings, model="test-model")
+        vector = fresh.embed_query("what are your skills")
+
+        self.assertEqual(vector, [20.0, 1.0])
+        self.assertEqual(self.embeddings.embed_query.call_count, 1)
+        self.assertEqual(fresh.stats, {"memory_hits": 0, "database_hits": 1, "misses": 0, "size": 1})
+
+    def test_cache_is_keyed_by_model(self) -> None:
+        self.cache.embed_query("skills")
+        CachedEmbeddings(self.embeddings, model="other-model").embed_query("skills")
+
+        self.assertEqual(self.embeddings.embed_query.call_count, 2)
+        self.assertEqual(CachedEmbedding.objects.count(), 2)
+
+    def test_memory_tier_evicts_least_recently_used(self) -> None:
+        self.cache.embed_query("a")
+        self.cache.embed_query("b")
+        self.cache.embed_query("a")  # refresh "a"
+        self.cache.embed_query("c")  # evicts "b"
+
+        self.assertEqual(self.cache.stats["size"], 2)
+        with self.assertNumQueries(0):
+            self.cache.embed_query("a")
+        with self.assertNumQueries(1):
+            self.cache.embed_query("b")  # served from the database tier
+
+    def test_documents_bypass_cache(self) -> None:
+        self.assertEqual(self.cache.embed_documents(["ab", "abc"]), [[2.0], [3.0]])
+        self.assertEqual(CachedEmbedding.objects.count(), 0)
+
+    def test_database_errors_fall_back_to_model(self) -> None:
+        with patch.object(CachedEmbedding.objects, "filter", side_effect=DatabaseError("down")):
+            with patch.object(CachedEmbedding.objects, "bulk_create", side_effect=DatabaseError("down")):
+                with self.assertLogs("vex.ai.database.embeddings", level="WARNING"):
+                    vector = self.cache.embed_query("skills")
+        self.assertEqual(vector, [6.0, 1.0])
+        self.assertEqual(self.cache.stats["misses"], 1)
+
+    def test_clear_resets_memory_and_counters(self) -> None:
+        self.cache.embed_query("skills")
+        self.cache.clear()
+        self.assertEqual(self.cache.stats, {"memory_hits": 0, "database_hits": 0, "misses": 0, "size": 0})
+        self.assertEqual(self.cache.hit_ratio, 0.0)
+
+    async def test_async_documents_delegate_to_model(self) -> None:
+        async def aembed(texts):
+            return [[1.0] for _ in texts]
+
+        self.embeddings.aembed_documents.side_effect = aembed
+        self.assertEqual(await self.cache.aembed_documents(["x"]), [[1.0]])
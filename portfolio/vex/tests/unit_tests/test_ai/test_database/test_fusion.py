@@ -0,0 +1,34 @@
+from django.test import SimpleTestCase
+from langchain_core.documents import Document
+
+from vex.ai.database.fusion import reciprocal_rank_fusion
+
+
+def ranking(*contents: str) -> list[Document]:
+    return [Document(page_content=content, metadata={"source": content}) for content in contents]
+
+
+class ReciprocalRankFusionTestCase(SimpleTestCase):
+    def test_chunks_found_by_both_rank_first(self) -> None:
+        fused = reciprocal_rank_fusion(ranking("vague", "django"), ranking("django", "pgvector"), limit=10)
+
+        self.assertEqual([d.page_content for d in fused], ["django", "vague", "pgvector"])
+        self.assertEqual(fused[0].metadata["source"], "django")
+
+    def test_scores_are_scaled_to_first_in_every_list(self) -> None:
+        fused = reciprocal_rank_fusion(ranking("django"), ranking("django"), limit=10, rrf_k=60)
+        self.assertAlmostEqual(fused[0].metadata["score"], 1.0)
+
+        fused = reciprocal_rank_fusion(ranking("a", "b"), ranking("b", "a"), limit=10, rrf_k=60)
+        self.assertLess(fused[0].metadata["score"], 1.0)
+
+    def test_empty_ranking_does_not_lower_scores(self) -> None:
+        fused = reciprocal_rank_fusion(ranking("django"), [], limit=10)
+        self.assertAlmostEqual(fused[0].metadata["score"], 1.0)
+
+    def test_limit(self) -> None:
+        fused = reciprocal_rank_fusion(ranking("a", "b", "c"), ranking("d"), limit=2)
+        self.assertEqual(len(fused), 2)
+
+    def test_nothing_to_fuse(self) -> None:
+        self.assertEqual(reciprocal_rank_fusion([], [], limit=4), [])
@@ -0,0 +1,67 @@
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+
+from vex.ai.database.lexical import search_lexical
+from vex.tests.factories import ChunkFactory, DocumentFactory
+
+
+class LexicalSearchTestCase(TestCase):
+    def setUp(self) -> None:
+        document = DocumentFactory()
+        for locale, content in [
+            ("en", "Built the backend with Django and Postgres"),
+            ("en", "Django, Django REST framework and pgvector power the assistant"),
+            ("en", "Hiking in the mountains"),
+            ("pl", "Backend zbudowany w Django"),
+        ]:
+            ChunkFactory(document=document, locale=locale, content=content, page=1)
+
+    def test_matches_are_ranked_within_locale(self) -> None:
+        documents = search_lexical("django", "en", k=5)
+
+        self.assertEqual(
+            [d.page_content for d in documents],
+            [
+                "Django, Django REST framework and pgvector power the assistant",
+                "Built the backend with Django and Postgres",
+            ],
+        )
+        self.assertEqual((documents[0].metadata["locale"], documents[0].metadata["page"]), ("en", 1))
+        self.assertGreater(documents[0].metadata["score"], documents[1].metadata["score"])
+
+    def test_locale_uses_its_text_search_config(self) -> None:
+        self.assertEqual(len(search_lexical("powers", "en")), 1)  # stemmed by the english config
+        self.assertEqual([d.page_content for d in search_lexical("django", "pl")], ["Backend zbudowany w Django"])
+
+    def test_questions_match_chunks_with_any_of_their_words(self) -> None:
+        documents = search_lexical("Which framework did you use to build the backend?", "en")
+
+        self.assertEqual(
+            [d.page_content for d in documents],
+            [
+                "Built the backend with Django and Postgres",
+                "Django, Django REST framework and pgvector power the assistant",
+            ],
+        )
+        self.assertEqual(
+            [d.page_content for d in search_lexical("Jak zbudowany jest backend tej strony?", "pl")],
+            ["Backend zbudowany w Django"],
+        )
+
+    def test_questions_without_words_match_nothing(self) -> None:
+        self.assertEqual(search_lexical("?!", "en"), [])
+        self.assertEqual(search_lexical("the and of", "en"), [])  # stop words only
+
+    def test_k_limits_results(self) -> None:
+        self.assertEqual(len(search_lexical("django", "en", k=1)), 1)
+
+    def test_search_uses_the_partial_index_of_the_locale(self) -> None:
+        with CaptureQueriesContext(connection) as queries:
+            search_lexical("django", "pl")
+
+        with connection.cursor() as cursor:
+            cursor.execute("SET LOCAL enable_seqscan = off")  # a handful of rows would be scanned otherwise
+            cursor.execute(f"EXPLAIN {queries.captured_queries[-1]['sql']}")
+            plan = "\n".join(line for (line,) in cursor.fetchall())
+        self.assertIn("vex_chunk_fts_pl", plan)
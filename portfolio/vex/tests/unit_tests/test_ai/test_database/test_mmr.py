@@ -0,0 +1,53 @@
+import numpy as np
+from django.test import SimpleTestCase
+
+from vex.ai.database.mmr import maximal_marginal_relevance
+
+
+def reference(query: np.ndarray, candidates: np.ndarray, k: int, lambda_mult: float) -> list[int]:
+    """Textbook MMR, one pair at a time."""
+
+    def cosine(a: np.ndarray, b: np.ndarray) -> float:
+        return float(a @ b / (np.linalg.norm(a) * np.linalg.norm(b)))
+
+    picked = [max(range(len(candidates)), key=lambda i: cosine(query, candidates[i]))]  # the closest goes first
+    while len(picked) < min(k, len(candidates)):
+        scores = {
+            i: lambda_mult * cosine(query, c) - (1 - lambda_mult) * max(cosine(c, candidates[j]) for j in picked)
+            for i, c in enumerate(candidates)
+            if i not in picked
+        }
+        picked.append(max(scores, key=lambda i: scores[i]))
+    return picked
+
+
+class MaximalMarginalRelevanceTestCase(SimpleTestCase):
+    def setUp(self) -> None:
+        self.query = np.array([1.0, 0.0, 0.0])
+        self.candidates = np.array(
+            [
+                [0.9, 0.1, 0.0],  # closest
+                [0.9, 0.11, 0.0],  # near-duplicate of the closest, e.g. an overlapping chunk
+                [0.7, 0.0, 0.7],  # less relevant, but different
+            ]
+        )
+
+    def test_near_duplicates_give_way_to_diverse_candidates(self) -> None:
+        self.assertEqual(maximal_marginal_relevance(self.query, self.candidates, k=2, lambda_mult=0.5), [0, 2])
+
+    def test_lambda_one_is_plain_relevance(self) -> None:
+        self.assertEqual(maximal_marginal_relevance(self.query, self.candidates, k=3, lambda_mult=1.0), [0, 1, 2])
+
+    def test_k_is_bounded_by_candidates(self) -> None:
+        self.assertEqual(len(maximal_marginal_relevance(self.query, self.candidates, k=10, lambda_mult=0.5)), 3)
+        self.assertEqual(maximal_marginal_relevance(self.query, np.empty((0, 3)), k=3, lambda_mult=0.5), [])
+        self.assertEqual(maximal_marginal_relevance(self.query, self.candidates, k=0, lambda_mult=0.5), [])
+
+    def test_matches_pairwise_reference(self) -> None:
+        rng = np.random.default_rng(7)
+        query, candidates = rng.normal(size=32), rng.normal(size=(40, 32))
+        for lambda_mult in (0.0, 0.3, 0.7):
+            self.assertEqual(
+                maximal_marginal_relevance(query, candidates, k=8, lambda_mult=lambda_mult),
+                reference(query, candidates, k=8, lambda_mult=lambda_mult),
+            )
@@ -0,0 +1,92 @@
+from unittest.mock import MagicMock
+
+from django.db import connection
+from django.test import TestCase
+from langchain_core.vectorstores import VectorStoreRetriever
+
+from vex.ai.database.store import ChunkStore
+from vex.models import Chunk
+from vex.tests.factories import ChunkFactory, DocumentFactory, vector
+
+
+def fake_embeddings() -> MagicMock:
+    embeddings = MagicMock()
+    embeddings.embed_query.return_value = vector(1.0, 0.0)
+    embeddings.embed_documents.side_effect = lambda texts: [vector(1.0, float(i)) for i in range(len(texts))]
+    return embeddings
+
+
+class ChunkStoreTestCase(TestCase):
+    def setUp(self) -> None:
+        self.embeddings = fake_embeddings()
+        self.store = ChunkStore(self.embeddings, batch_size=2)
+        self.document = DocumentFactory(language="en")
+        with connection.cursor() as cursor:
+            # Exact searches: the HNSW graph of a tiny table still holds the rows other tests rolled back,
+            # which crowd these out of an approximate one (plans are tested along with the indexes)
+            cursor.execute("SET LOCAL enable_indexscan = off")
+
+    def test_add_texts_keeps_known_metadata_in_columns(self) -> None:
+        ids = self.store.add_texts(
+            ["Django", "pgvector", "Postgres"],
+            [
+                {"document_pk": self.document.pk, "locale": "en", "page": 3, "start_index": 120, "title": "CV"},
+                {"document_pk": self.document.pk, "locale": "en"},
+                {"document_pk": self.document.pk, "locale": "pl"},
+            ],
+        )
+
+        self.assertEqual(len(ids), 3)
+        chunk = Chunk.objects.get(pk=ids[0])
+        self.assertEqual((chunk.document, chunk.locale, chunk.page, chunk.offset), (self.document, "en", 3, 120))
+        self.assertEqual(chunk.metadata, {"title": "CV"})
+        self.assertEqual(len(chunk.embedding), len(vector()))
+
+    def test_similarity_search_filters_on_columns_and_scores_relevance(self) -> None:
+        ChunkFactory(document=self.document, content="close", embedding=vector(1.0, 0.1))
+        ChunkFactory(document=self.document, content="far", embedding=vector(0.0, 1.0))
+        ChunkFactory(document=self.document, content="polish", locale="pl", embedding=vector(1.0, 0.0))
+
+        results = self.store.similarity_search_with_relevance_scores("q", k=5, filter={"locale": "en"})
+
+        self.assertEqual([d.page_content for d, _ in results], ["close", "far"])
+        self.assertAlmostEqual(results[1][1], 0.0, places=5)
+        self.assertEqual(results[0][0].metadata["document_pk"], self.document.pk)
+        self.assertEqual([d.page_content for d in self.store.similarity_search("q", k=1)], ["polish"])
+
+    def test_mmr_skips_near_duplicates(self) -> None:
+        ChunkFactory(document=self.document, content="page 1", embedding=vector(0.9, 0.1))
+        ChunkFactory(document=self.document, content="page 1 overlap", embedding=vector(0.9, 0.11))
+        ChunkFactory(document=self.document, content="other", embedding=vector(0.7, 0.0, 0.7))
+
+        documents = self.store.max_marginal_relevance_search("q", k=2, fetch_k=3, lambda_mult=0.5)
+        self.assertEqual([d.page_content for d in documents], ["page 1", "other"])
+        self.assertEqual(self.store.max_marginal_relevance_search("q", filter={"locale": "pl"}), [])
+
+    def test_works_as_retriever(self) -> None:
+        ChunkFactory(document=self.document, content="Django", embedding=vector(1.0))
+
+        retriever = self.store.as_retriever(search_kwargs={"k": 1, "filter": {"locale": "en"}})
+
+        self.assertIsInstance(retriever, VectorStoreRetriever)
+        self.assertEqual([d.page_content for d in retriever.invoke("Django?")], ["Django"])
+
+    def test_from_texts_and_delete(self) -> None:
+        store = ChunkStore.from_texts(
+            ["a", "b"], self.embeddings, [{"document_pk": self.document.pk, "locale": "en"}] * 2
+        )
+        ids = [str(pk) for pk in Chunk.objects.values_list("pk", flat=True)]
+
+        self.assertEqual(len(ids), 2)
+        self.assertIsNone(store.delete())
+        self.assertTrue(store.delete(ids[:1]))
+        self.assertEqual(Chunk.objects.count(), 1)
+        self.assertEqual(
+            [d.page_content for d in store.similarity_search_by_vector(vector(1.0), k=5)],
+            list(Chunk.objects.values_list("content", flat=True)),
+        )
+
+    def test_deleting_the_document_deletes_its_chunks(self) -> None:
+        ChunkFactory.create_batch(2, document=self.document)
+        self.document.delete()
+        self.assertFalse(Chunk.objects.exists())
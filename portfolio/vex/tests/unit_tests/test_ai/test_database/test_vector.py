@@ -0,0 +1,64 @@
+from unittest.mock import MagicMock, patch
+
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+
+from vex.ai.database.store import ChunkStore
+from vex.ai.database.vector import search_mmr, search_topk
+from vex.tests.factories import ChunkFactory, DocumentFactory, vector
+
+
+class VectorSearchTestCase(TestCase):
+    def setUp(self) -> None:
+        document = DocumentFactory()
+        for locale, content, embedding in [
+            ("en", "Django backend, page 1", vector(0.9, 0.1)),
+            ("en", "Django backend, page 1 (overlap)", vector(0.9, 0.11)),
+            ("en", "Postgres and pgvector", vector(0.7, 0.0, 0.7)),
+            ("en", "Hiking", vector(0.0, 1.0)),
+            ("pl", "Backend w Django", vector(1.0)),
+        ]:
+            ChunkFactory(document=document, locale=locale, content=content, embedding=embedding)
+
+        embeddings = MagicMock()
+        embeddings.embed_query.return_value = vector(1.0)
+        store_patch = patch("vex.ai.database.vector.store", return_value=ChunkStore(embeddings))
+        store_patch.start()
+        self.addCleanup(store_patch.stop)
+
+    def test_mmr_overlapping_chunks_give_way_to_diverse_ones(self) -> None:
+        documents = search_mmr("Django?", "en", k=2, fetch_k=10, lambda_mult=0.5)
+
+        self.assertEqual([d.page_content for d in documents], ["Django backend, page 1", "Postgres and pgvector"])
+        self.assertEqual(documents[0].metadata["locale"], "en")
+        self.assertAlmostEqual(documents[0].metadata["score"], 0.9 / (0.9**2 + 0.1**2) ** 0.5, places=5)
+
+    def test_mmr_candidates_are_limited_to_fetch_k_closest(self) -> None:
+        documents = search_mmr("Django?", "en", k=3, fetch_k=2, lambda_mult=0.5)
+        self.assertEqual(len(documents), 2)
+        self.assertNotIn("Postgres and pgvector", [d.page_content for d in documents])
+
+    def test_mmr_locale_without_chunks(self) -> None:
+        self.assertEqual(search_mmr("Django?", "de"), [])
+
+    def test_topk_filters_on_locale(self) -> None:
+        documents = search_topk("Django?", k=2, _filter={"locale": "pl"})
+        self.assertEqual([d.page_content for d in documents], ["Backend w Django"])
+        self.assertAlmostEqual(documents[0].metadata["score"], 1.0, places=5)
+
+    def test_search_uses_the_hnsw_index_of_its_locale_only(self) -> None:
+        for locale, other in [("en", "pl"), ("pl", "en")]:
+            with self.subTest(locale=locale):
+                with CaptureQueriesContext(connection) as queries:
+                    search_mmr("Django?", locale, k=2, fetch_k=10, ef_search=5, lambda_mult=1.0)
+                executed = [query["sql"] for query in queries.captured_queries]
+                self.assertIn("SET LOCAL hnsw.ef_search = 10", executed)  # never below fetch_k
+
+                search = next(sql for sql in executed if "ORDER BY" in sql)
+                with connection.cursor() as cursor:
+                    cursor.execute("SET LOCAL enable_seqscan = off")  # a handful of rows would be scanned otherwise
+                    cursor.execute(f"EXPLAIN {search}")
+                    plan = "\n".join(line for (line,) in cursor.fetchall())
+                self.assertIn(f"vex_chunk_embedding_hnsw_{locale}", plan)
+                self.assertNotIn(f"vex_chunk_embedding_hnsw_{other}", plan)
@@ -0,0 +1,86 @@
+# pylint: disable=protected-access
+
+import gzip
+import json
+import tempfile
+import threading
+from pathlib import Path
+from unittest.mock import patch
+
+from django.test import SimpleTestCase
+
+from vex.ai.dumps import ContextDumpWriter
+
+
+def read_records(directory: Path) -> list[dict]:
+    records = []
+    for path in sorted(directory.glob(ContextDumpWriter.PATTERN)):
+        with gzip.open(path, "rt", encoding="utf-8") as file:
+            records.extend(json.loads(line) for line in file)
+    return records
+
+
+class ContextDumpWriterTestCase(SimpleTestCase):
+    def setUp(self) -> None:
+        directory = tempfile.TemporaryDirectory()  # pylint: disable=consider-using-with
+        self.addCleanup(directory.cleanup)
+        self.directory = Path(directory.name)
+
+    def writer(self, **kwargs) -> ContextDumpWriter:
+        options = {"max_bytes": 1024 * 1024, "max_files": 10, "queue_size": 100, **kwargs}
+        writer = ContextDumpWriter(self.directory, **options)
+        self.addCleanup(writer.close)
+        return writer
+
+    def test_writes_compressed_jsonl_with_unique_ids(self) -> None:
+        writer = self.writer()
+        for i in range(3):
+            self.assertTrue(writer.submit({"question": f"Pytanie {i}?", "locale": "pl"}))
+        writer.close()
+
+        records = read_records(self.directory)
+        self.assertEqual([r["question"] for r in records], ["Pytanie 0?", "Pytanie 1?", "Pytanie 2?"])
+        self.assertEqual(len({r["id"] for r in records}), 3)
+        self.assertTrue(all(r["created_at"] for r in records))
+        self.assertEqual(writer.stats, {"written": 3, "dropped": 0, "failed": 0, "files": 1, "queued": 0})
+
+    def test_rotates_by_size_and_keeps_newest_files(self) -> None:
+        writer = self.writer(max_bytes=200, max_files=2)
+        for i in range(6):
+            writer.submit({"context": f"{i}" * 150})
+        writer.close()
+
+        self.assertEqual(writer.stats["files"], 6)
+        self.assertEqual(len(list(self.directory.glob(ContextDumpWriter.PATTERN))), 2)
+        self.assertEqual([r["context"][0] for r in read_records(self.directory)], ["4", "5"])
+
+    def test_drops_records_when_queue_is_full(self) -> None:
+        writer = self.writer(queue_size=1)
+        release = threading.Event()
+        writing = threading.Event()
+
+        def blocked_write(_record) -> None:
+            writing.set()
+            release.wait(5)
+
+        with patch.object(writer, "_write", side_effect=blocked_write):
+            writer.submit({"n": 1})  # taken by the writer thread, which then blocks
+            writing.wait(5)
+            self.assertTrue(writer.submit({"n": 2}))  # fills the queue
+            self.assertFalse(writer.submit({"n": 3}))
+            release.set()
+            writer.close()
+
+        self.assertEqual(writer.stats["dropped"], 1)
+
+    def test_failed_write_is_counted(self) -> None:
+        writer = self.writer()
+        with patch.object(writer, "_write", side_effect=OSError("disk full")):
+            with self.assertLogs("vex.ai.dumps", level="ERROR"):
+                writer.submit({"n": 1})
+                writer.close()
+        self.assertEqual(writer.stats["failed"], 1)
+
+    def test_close_without_records_is_a_no_op(self) -> None:
+        self.writer().close()
+        self.assertEqual(list(self.directory.iterdir()), [])
@@ -0,0 +1,94 @@
+# pylint: disable=protected-access
+
+import asyncio
+
+from django.test import SimpleTestCase
+
+from vex.ai.flights import SingleFlight
+
+
+class Producer:
+    def __init__(self, chunks: list[str], *, error: Exception | None = None) -> None:
+        self.chunks = chunks
+        self.error = error
+        self.calls = 0
+        self.closed = False
+        self.release = asyncio.Event()
+
+    async def __call__(self):
+        self.calls += 1
+        try:
+            for chunk in self.chunks:
+                yield chunk
+                await self.release.wait()
+            if self.error is not None:
+                raise self.error
+        finally:
+            self.closed = True
+
+
+async def collect(stream) -> list[str]:
+    return [chunk async for chunk in stream]
+
+
+class SingleFlightTestCase(SimpleTestCase):
+    async def test_followers_replay_backlog_and_share_the_producer(self) -> None:
+        flights = SingleFlight()
+        producer = Producer(["Python", " and", " Django"])
+
+        flight, started = flights.join("key", producer)
+        leader = asyncio.create_task(collect(flight.subscribe()))
+        while not flight.chunks:
+            await asyncio.sleep(0)
+
+        joined, follower_started = flights.join("key", Producer([]))
+        self.assertIs(joined, flight)
+        follower = asyncio.create_task(collect(joined.subscribe()))
+        producer.release.set()
+
+        self.assertEqual(await leader, ["Python", " and", " Django"])
+        self.assertEqual(await follower, ["Python", " and", " Django"])
+        self.assertEqual((started, follower_started, producer.calls), (True, False, 1))
+        self.assertEqual(len(flights), 0)
+
+    async def test_finished_flight_is_not_joined(self) -> None:
+        flights = SingleFlight()
+        producer = Producer(["Python"])
+        producer.release.set()
+
+        first, _ = flights.join("key", producer)
+        self.assertEqual(await collect(first.subscribe()), ["Python"])
+        second, started = flights.join("key", producer)
+        await asyncio.wait({second.task})
+
+        self.assertIsNot(second, first)
+        self.assertTrue(started)
+        self.assertEqual(producer.calls, 2)
+
+    async def test_error_is_raised_to_every_subscriber(self) -> None:
+        flights = SingleFlight()
+        producer = Producer(["Python"], error=RuntimeError("LLM down"))
+        producer.release.set()
+
+        flight, _ = flights.join("key", producer)
+        results = await asyncio.gather(collect(flight.subscribe()), collect(flight.subscribe()), return_exceptions=True)
+
+        self.assertEqual([str(result) for result in results], ["LLM down", "LLM down"])
+        self.assertEqual(len(flights), 0)
+
+    async def test_producer_is_cancelled_once_the_last_subscriber_leaves(self) -> None:
+        flights = SingleFlight()
+        producer = Producer(["Python", " and"])
+        flight, _ = flights.join("key", producer)
+
+        first, second = flight.subscribe(), flight.subscribe()
+        self.assertEqual(await anext(first), "Python")
+        self.assertEqual(await anext(second), "Python")
+
+        await first.aclose()
+        self.assertFalse(producer.closed)  # somebody still listens
+        await second.aclose()
+
+        self.assertTrue(producer.closed)
+        self.assertTrue(flight.task.cancelled())
+        self.assertEqual(len(flights), 0)
@@ -1,9 +1,20 @@
+from unittest.mock import patch
+
 import faker
-from django.test import TestCase
+from django.test import TestCase, override_settings
+from langchain_core.language_models.fake_chat_models import FakeListChatModel
 from langchain_core.messages import AIMessage, HumanMessage, SystemMessage
 
-from vex.ai.history import MessageHistory
+from vex.ai.history import (
+    SUMMARY_PREFIX,
+    HistorySummarizer,
+    MessageHistory,
+    _run_summary,
+    schedule_summary,
+    split_window,
+)
 from vex.choices import Roles
+from vex.models import Conversation
 from vex.tests.factories import ConversationFactory, MessageFactory
 
 fake = faker.Faker()
@@ -15,6 +26,13 @@ class MessageHistoryTestCase(TestCase):
         history = MessageHistory(session)
         self.assertEqual(history.messages, [])
 
+    def test_init_does_not_query_database(self) -> None:
+        with self.assertNumQueries(0):
+            history = MessageHistory(fake.uuid4())
+        self.assertFalse(Conversation.objects.filter(session=history.session_key).exists())
+        self.assertEqual(history.conversation.session, history.session_key)
+        self.assertTrue(Conversation.objects.filter(session=history.session_key).exists())
+
     def test_add_message_persists_with_correct_roles(self) -> None:
         session = fake.uuid4()
         history = MessageHistory(session)
@@ -56,3 +74,123 @@ class MessageHistoryTestCase(TestCase):
         self.assertGreater(conv.messages.count(), 0)
         history.clear()
         self.assertEqual(conv.messages.count(), 0)
+
+    def test_clear_drops_the_summary(self) -> None:
+        conv = ConversationFactory(summary="Visitor asked about skills.")
+        conv.summarized_until = MessageFactory(conversation=conv)
+        conv.save()
+        MessageFactory(conversation=conv)
+
+        history = MessageHistory(conv.session)
+        history.clear()
+        conv.refresh_from_db()
+
+        self.assertEqual((conv.summary, conv.summarized_until), ("", None))
+        self.assertEqual(history.messages, [])
+
+
+@override_settings(RAG_HISTORY_TOKEN_BUDGET=10)
+class MessageHistoryWindowTestCase(TestCase):
+    def setUp(self) -> None:
+        tokens_patch = patch("vex.ai.history.count_tokens", side_effect=lambda text: len(text.split()))
+        tokens_patch.start()
+        self.addCleanup(tokens_patch.stop)
+
+        self.conversation = ConversationFactory()
+        self.messages = [
+            MessageFactory(conversation=self.conversation, role=role, content=content)
+            for role, content in [
+                (Roles.USER, "one two three four"),
+                (Roles.ASSISTANT, "five six seven eight"),
+                (Roles.USER, "nine ten"),
+                (Roles.ASSISTANT, "eleven twelve thirteen"),
+            ]
+        ]
+
+    def test_window_keeps_newest_messages_within_budget(self) -> None:
+        window, overflowed = split_window(self.conversation, budget=10)
+        self.assertEqual(window, self.messages[1:])
+        self.assertTrue(overflowed)
+
+        window, overflowed = split_window(self.conversation, budget=100)
+        self.assertEqual(window, self.messages)
+        self.assertFalse(overflowed)
+
+    def test_window_always_keeps_latest_message(self) -> None:
+        window, overflowed = split_window(self.conversation, budget=1)
+        self.assertEqual(window, self.messages[-1:])
+        self.assertTrue(overflowed)
+
+    def test_messages_prepend_summary_and_schedule_update_on_overflow(self) -> None:
+        self.conversation.summary = "Visitor asked about skills."
+        self.conversation.save()
+
+        with patch("vex.ai.history.schedule_summary") as schedule:
+            msgs = MessageHistory(self.conversation.session).messages
+
+        schedule.assert_called_once_with(self.conversation.pk)
+        self.assertIsInstance(msgs[0], SystemMessage)
+        self.assertEqual(msgs[0].content, SUMMARY_PREFIX + "Visitor asked about skills.")
+        self.assertEqual([m.content for m in msgs[1:]], [m.content for m in self.messages[1:]])
+
+    def test_summarized_messages_are_excluded_from_window(self) -> None:
+        self.conversation.summarized_until = self.messages[1]
+        self.conversation.save()
+
+        with patch("vex.ai.history.schedule_summary") as schedule:
+            msgs = MessageHistory(self.conversation.session).messages
+
+        schedule.assert_not_called()
+        self.assertEqual([m.content for m in msgs], [m.content for m in self.messages[2:]])
+
+    def test_summarizer_folds_overflow_into_summary(self) -> None:
+        llm = FakeListChatModel(responses=[" Visitor counted to four. "])
+
+        self.assertTrue(HistorySummarizer(llm=llm).summarize(self.conversation.pk))
+
+        self.conversation.refresh_from_db()
+        self.assertEqual(self.conversation.summary, "Visitor counted to four.")
+        self.assertEqual(self.conversation.summarized_until, self.messages[0])
+
+    def test_summarizer_skips_conversations_within_budget(self) -> None:
+        with override_settings(RAG_HISTORY_TOKEN_BUDGET=100):
+            self.assertFalse(HistorySummarizer(llm=FakeListChatModel(responses=[])).summarize(self.conversation.pk))
+        self.assertFalse(HistorySummarizer().summarize(0))
+
+    @override_settings(RAG_HISTORY_SUMMARY_BATCH=5)
+    def test_summarizer_folds_overflow_in_batches(self) -> None:
+        extra = MessageFactory(conversation=self.conversation, role=Roles.USER, content="fourteen fifteen")
+        summarizer = HistorySummarizer(llm=FakeListChatModel(responses=["first", "second"]))
+
+        self.assertTrue(summarizer.summarize(self.conversation.pk))
+        self.conversation.refresh_from_db()
+        self.assertEqual(self.conversation.summarized_until, self.messages[0])
+
+        self.assertTrue(summarizer.summarize(self.conversation.pk))
+        self.conversation.refresh_from_db()
+        self.assertEqual(self.conversation.summary, "second")
+        self.assertEqual(self.conversation.summarized_until, self.messages[1])
+        self.assertEqual(split_window(self.conversation, budget=10)[0], [*self.messages[2:], extra])
+
+    def test_schedule_summary_runs_once_per_conversation(self) -> None:
+        with patch("vex.ai.history._summary_executor") as executor:
+            schedule_summary(self.conversation.pk)
+            schedule_summary(self.conversation.pk)
+            self.assertEqual(executor.submit.call_count, 1)
+
+            with (
+                patch("vex.ai.history.summarizer") as summarizer,
+                patch("vex.ai.history.close_old_connections"),  # keep the test transaction's connection
+            ):
+                summarizer.summarize.side_effect = RuntimeError("boom")
+                with self.assertLogs("vex.ai.history", level="ERROR"):
+                    _run_summary(self.conversation.pk)
+
+            schedule_summary(self.conversation.pk)
+            self.assertEqual(executor.submit.call_count, 2)
+
+    @override_settings(RAG_HISTORY_SUMMARY_ENABLED=False)
+    def test_schedule_summary_disabled(self) -> None:
+        with patch("vex.ai.history._summary_executor") as executor:
+            schedule_summary(self.conversation.pk)
+        executor.submit.assert_not_called()
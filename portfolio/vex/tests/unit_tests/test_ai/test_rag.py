@@ -0,0 +1,400 @@
+# pylint: disable=protected-access
+
+import asyncio
+import time
+from unittest.mock import patch
+
+from asgiref.sync import sync_to_async
+from django.test import TestCase, override_settings
+from langchain_core.documents import Document
+from langchain_core.messages import AIMessage, HumanMessage
+from prometheus_client import REGISTRY
+
+from utils.timing import StageStats, StageTimer, current_timer
+from vex.ai.answers import SemanticAnswerCache
+from vex.ai.history import MessageHistory
+from vex.ai.rag import (
+    CachedAnswerChain,
+    ChainRegistry,
+    RagChain,
+    configuration_version,
+    current_configuration_version,
+)
+from vex.choices import Roles
+from vex.models import ContentVersion, Message
+from vex.tests.factories import ConfigurationFactory
+
+
+def slow_leg(content: str, delay: float = 0.0):
+    def leg(*_args, **_kwargs) -> list[Document]:
+        time.sleep(delay)
+        return [Document(page_content=content)]
+
+    return leg
+
+
+def failing_leg(*_args, **_kwargs) -> list[Document]:
+    raise RuntimeError("boom")
+
+
+@override_settings(RAG_DUMP_CONTEXTS=False, RAG_VECTOR_TIMEOUT=1.0, RAG_RELATIONAL_TIMEOUT=1.0)
+class RagChainMergeContextTestCase(TestCase):
+    def setUp(self) -> None:
+        with patch("vex.ai.rag.ChatOpenAI"):
+            self.chain = RagChain()
+        self.context = {"question": "What skills?", "locale": "en"}
+
+        lexical_patch = patch("vex.ai.rag.search_lexical", return_value=[])
+        self.addCleanup(lexical_patch.stop)
+        self.search_lexical = lexical_patch.start()
+
+    @staticmethod
+    def patch_legs(vector, relational):
+        return (
+            patch.object(RagChain, "_get_vector_docs", side_effect=vector),
+            patch.object(RagChain, "_get_structured_docs", side_effect=relational),
+        )
+
+    def test_merge_context_numbers_vector_then_relational(self) -> None:
+        vector_patch, relational_patch = self.patch_legs(slow_leg("vector"), slow_leg("relational"))
+        with vector_patch, relational_patch:
+            merged = self.chain._merge_context(self.context)
+        self.assertEqual(merged, "[1] vector\n\n[2] relational")
+
+    def test_merge_context_runs_legs_concurrently(self) -> None:
+        vector_patch, relational_patch = self.patch_legs(slow_leg("vector", 0.3), slow_leg("relational", 0.3))
+        with vector_patch, relational_patch:
+            started = time.monotonic()
+            merged = self.chain._merge_context(self.context)
+            elapsed = time.monotonic() - started
+        self.assertIn("vector", merged)
+        self.assertIn("relational", merged)
+        self.assertLess(elapsed, 0.55)
+
+    @override_settings(RAG_VECTOR_TIMEOUT=0.1)
+    def test_merge_context_skips_timed_out_leg(self) -> None:
+        vector_patch, relational_patch = self.patch_legs(slow_leg("vector", 0.5), slow_leg("relational"))
+        with vector_patch, relational_patch, self.assertLogs("vex.ai.rag", level="WARNING") as logs:
+            merged = self.chain._merge_context(self.context)
+        self.assertEqual(merged, "[1] relational")
+        self.assertIn("timed out", logs.output[0])
+
+    def test_merge_context_skips_failed_leg(self) -> None:
+        vector_patch, relational_patch = self.patch_legs(slow_leg("vector"), failing_leg)
+        with vector_patch, relational_patch, self.assertLogs("vex.ai.rag", level="WARNING") as logs:
+            merged = self.chain._merge_context(self.context)
+        self.assertEqual(merged, "[1] vector")
+        self.assertIn("boom", logs.output[0])
+
+    @override_settings(RAG_DUMP_CONTEXTS=True)
+    def test_merge_context_hands_dump_to_writer(self) -> None:
+        vector_patch, relational_patch = self.patch_legs(slow_leg("vector"), slow_leg("relational"))
+        with vector_patch, relational_patch, patch("vex.ai.rag.context_dumps") as dumps:
+            merged = self.chain._merge_context(self.context)
+        record = dumps.submit.call_args.args[0]
+        self.assertEqual(record["context"], merged)
+        self.assertEqual((record["question"], record["locale"]), ("What skills?", "en"))
+
+    def test_merge_context_times_stages_of_current_request(self) -> None:
+        timer = StageTimer(stats=StageStats(window=10))
+        token = current_timer.set(timer)
+        self.addCleanup(current_timer.reset, token)
+
+        with (
+            patch("vex.ai.rag.search_mmr", return_value=[Document(page_content="vector")]),
+            patch.object(RagChain, "RELATIONAL_CONTEXT_GETTER") as getter,
+        ):
+            getter.return_value.get_context.return_value = [Document(page_content="relational")]
+            self.chain._merge_context(self.context)
+
+        self.assertEqual(set(timer.stages), {"vector", "lexical", "relational", "pack"})
+
+    @override_settings(RAG_HYBRID_K=2)
+    def test_merge_context_fuses_vector_and_lexical_hits(self) -> None:
+        vector = [Document(page_content=c, metadata={"score": 0.9}) for c in ("vague", "close", "django")]
+        self.search_lexical.return_value = [Document(page_content="django", metadata={"score": 0.4})]
+
+        with (
+            patch("vex.ai.rag.search_mmr", return_value=vector),
+            patch.object(RagChain, "RELATIONAL_CONTEXT_GETTER") as getter,
+        ):
+            getter.return_value.get_context.return_value = []
+            merged = self.chain._merge_context(self.context)
+
+        self.assertEqual(merged, "[1] django\n\n[2] vague")
+        self.search_lexical.assert_called_once_with("What skills?", "en")
+
+    @override_settings(RAG_MMR_ENABLED=False)
+    def test_vector_leg_without_mmr_uses_plain_top_k(self) -> None:
+        with patch("vex.ai.rag.search_topk", return_value=[]) as search_topk, patch("vex.ai.rag.search_mmr") as mmr:
+            RagChain._get_vector_docs("What skills?", "pl")
+        search_topk.assert_called_once_with("What skills?", _filter={"locale": "pl"})
+        mmr.assert_not_called()
+
+    @override_settings(RAG_HYBRID_ENABLED=False)
+    def test_merge_context_without_hybrid_keeps_vector_hits(self) -> None:
+        vector_patch, relational_patch = self.patch_legs(slow_leg("vector"), slow_leg("relational"))
+        with vector_patch, relational_patch:
+            merged = self.chain._merge_context(self.context)
+        self.assertEqual(merged, "[1] vector\n\n[2] relational")
+        self.search_lexical.assert_not_called()
+
+    async def test_amerge_context_runs_legs_concurrently(self) -> None:
+        vector_patch, relational_patch = self.patch_legs(slow_leg("vector", 0.3), slow_leg("relational", 0.3))
+        with vector_patch, relational_patch:
+            started = time.monotonic()
+            merged = await self.chain._amerge_context(self.context)
+            elapsed = time.monotonic() - started
+        self.assertEqual(merged, "[1] vector\n\n[2] relational")
+        self.assertLess(elapsed, 0.55)
+
+    @override_settings(RAG_RELATIONAL_TIMEOUT=0.1)
+    async def test_amerge_context_skips_timed_out_and_failed_legs(self) -> None:
+        vector_patch, relational_patch = self.patch_legs(failing_leg, slow_leg("relational", 0.5))
+        with vector_patch, relational_patch, self.assertLogs("vex.ai.rag", level="WARNING") as logs:
+            merged = await self.chain._amerge_context(self.context)
+        self.assertEqual(merged, "")
+        self.assertEqual(len(logs.output), 2)
+
+
+class FakeChain:
+    def __init__(self, answer: list[str]) -> None:
+        self.answer = answer
+        self.calls = 0
+
+    def record(self, values, config) -> None:
+        self.calls += 1
+        history = MessageHistory(config["configurable"]["session_id"])
+        history.add_messages([HumanMessage(values["question"]), AIMessage("".join(self.answer))])
+
+    async def astream(self, values, config):
+        await sync_to_async(self.record)(values, config)
+        for chunk in self.answer:
+            yield chunk
+
+
+class SlowChain:
+    """Streams like the history runnable: nothing is recorded unless the answer finishes."""
+
+    def __init__(self, answer: list[str], delay: float = 0.0) -> None:
+        self.answer = answer
+        self.delay = delay
+        self.closed = False
+
+    async def astream(self, _values, config):  # pylint: disable=unused-argument
+        try:
+            for chunk in self.answer:
+                yield chunk
+                await asyncio.sleep(self.delay)
+        finally:
+            self.closed = True
+
+
+def fake_embedding(text: str) -> list[float]:
+    return [1.0, 0.0] if "skill" in text.lower() else [0.0, 1.0]
+
+
+@override_settings(RAG_ANSWER_CACHE_ENABLED=True)
+class CachedAnswerChainTestCase(TestCase):
+    def setUp(self) -> None:
+        self.inner = FakeChain(["Python", " and", "\nDjango"])
+        self.cache = SemanticAnswerCache(threshold=0.95, ttl=60, maxsize=8)
+        self.chain = CachedAnswerChain(self.inner, version="v1", cache=self.cache)  # type: ignore[arg-type]
+
+        embeddings_patch = patch("vex.ai.rag.embeddings")
+        self.addCleanup(embeddings_patch.stop)
+        embeddings_patch.start().return_value.embed_query.side_effect = fake_embedding
+
+    @staticmethod
+    def config(session: str) -> dict:
+        return {"configurable": {"session_id": session}}
+
+    async def ask(self, question: str, session: str, locale: str = "en") -> list[str]:
+        return [
+            chunk async for chunk in self.chain.astream({"question": question, "locale": locale}, self.config(session))
+        ]
+
+    async def test_first_question_is_generated_then_served_from_cache(self) -> None:
+        tokens = REGISTRY.get_sample_value("vex_llm_tokens_streamed_total")
+        first = "".join(await self.ask("Skills?", "s1"))
+        second = await self.ask("skills??", "s2")
+        self.assertEqual(REGISTRY.get_sample_value("vex_llm_tokens_streamed_total"), tokens + 3)  # replay not counted
+
+        self.assertEqual(first, "Python and\nDjango")
+        self.assertEqual("".join(second), first)
+        self.assertGreater(len(second), 1)  # replayed in chunks
+        self.assertEqual(self.inner.calls, 1)
+
+        cached = [m async for m in Message.objects.filter(conversation__session="s2").order_by("created_at")]
+        self.assertEqual([(m.role, m.content) for m in cached], [(Roles.USER, "skills??"), (Roles.ASSISTANT, first)])
+
+    async def test_locale_is_part_of_the_key(self) -> None:
+        await self.ask("Skills?", "s1", locale="en")
+        await self.ask("Skills?", "s2", locale="pl")
+        self.assertEqual(self.inner.calls, 2)
+
+    async def test_content_changed_by_another_process_stales_cached_answers(self) -> None:
+        await self.ask("Skills?", "s1")
+        await sync_to_async(ContentVersion.bump)()
+        await self.ask("Skills?", "s2")
+
+        self.assertEqual(self.inner.calls, 2)
+        self.assertEqual(self.cache.stats["size"], 2)  # nothing cleared in this process
+
+    async def test_follow_up_questions_bypass_the_cache(self) -> None:
+        await self.ask("Skills?", "s1")
+        await self.ask("Skills?", "s1")
+
+        self.assertEqual(self.inner.calls, 2)
+        self.assertEqual(self.cache.stats["size"], 1)
+
+    @override_settings(RAG_ANSWER_CACHE_ENABLED=False)
+    async def test_disabled_cache_always_generates(self) -> None:
+        await self.ask("Skills?", "s1")
+        await self.ask("Skills?", "s2")
+
+        self.assertEqual(self.inner.calls, 2)
+        self.assertEqual(self.cache.stats["size"], 0)
+
+    async def test_missing_session_is_rejected(self) -> None:
+        with self.assertRaises(ValueError):
+            await anext(self.chain.astream({"question": "Skills?"}, {}))
+
+    async def test_cancelled_astream_stops_llm_and_saves_truncated_answer(self) -> None:
+        inner = SlowChain(["Python", " and", " Django"], delay=5.0)
+        chain = CachedAnswerChain(inner, version="v1", cache=self.cache)  # type: ignore[arg-type]
+        received: list[str] = []
+
+        async def consume() -> None:
+            async for chunk in chain.astream({"question": "Skills?", "locale": "en"}, self.config("t2")):
+                received.append(chunk)
+
+        task = asyncio.create_task(consume())
+        while not received:
+            await asyncio.sleep(0.01)
+        task.cancel()
+        with self.assertRaises(asyncio.CancelledError):
+            await task
+
+        self.assertTrue(inner.closed)
+        saved = Message.objects.filter(conversation__session="t2").order_by("created_at").values_list("content")
+        self.assertEqual([content async for (content,) in saved], ["Skills?", "Python [truncated]"])
+        self.assertEqual(self.cache.stats["size"], 0)
+
+    async def test_concurrent_identical_questions_share_one_generation(self) -> None:
+        inner = SlowChain(["Python", " and", " Django"], delay=0.01)
+        chain = CachedAnswerChain(inner, version="v1", cache=self.cache)  # type: ignore[arg-type]
+        calls = 0
+        stream = inner.astream
+
+        def counted(values, config):
+            nonlocal calls
+            calls += 1
+            return stream(values, config)
+
+        async def ask(session: str, question: str) -> str:
+            return "".join(
+                [c async for c in chain.astream({"question": question, "locale": "en"}, self.config(session))]
+            )
+
+        with patch.object(inner, "astream", side_effect=counted):
+            answers = await asyncio.gather(ask("f1", "Skills?"), ask("f2", "  skills? "))
+
+        self.assertEqual(answers, ["Python and Django", "Python and Django"])
+        self.assertEqual(calls, 1)
+        saved = Message.objects.filter(conversation__session="f2").order_by("created_at").values_list("content")
+        self.assertEqual([content async for (content,) in saved], ["  skills? ", "Python and Django"])
+
+    @override_settings(RAG_SINGLE_FLIGHT_ENABLED=False)
+    async def test_disabled_single_flight_generates_every_answer(self) -> None:
+        async def ask(session: str) -> list[str]:
+            return [c async for c in self.chain.astream({"question": "Skills?", "locale": "en"}, self.config(session))]
+
+        with override_settings(RAG_ANSWER_CACHE_ENABLED=False):
+            await asyncio.gather(ask("d1"), ask("d2"))
+
+        self.assertEqual(self.inner.calls, 2)
+
+
+class ChainRegistryTestCase(TestCase):
+    def setUp(self) -> None:
+        self.built: list[str] = []
+
+        def factory() -> CachedAnswerChain:
+            version = current_configuration_version()
+            self.built.append(version)
+            return CachedAnswerChain(FakeChain([]), version=version)  # type: ignore[arg-type]
+
+        self.registry = ChainRegistry(factory)
+
+    def test_reuses_chain_while_version_is_unchanged(self) -> None:
+        ConfigurationFactory()
+        first = self.registry.get()
+        with self.assertNumQueries(1):  # only the version lookup
+            second = self.registry.get()
+
+        self.assertIs(first, second)
+        self.assertEqual(len(self.built), 1)
+
+    def test_rebuilds_after_configuration_change(self) -> None:
+        configuration = ConfigurationFactory()
+        first = self.registry.get()
+
+        configuration.temperature = 0.1
+        configuration.save()
+        second = self.registry.get()
+
+        self.assertIsNot(first, second)
+        self.assertEqual(second.version, configuration_version(configuration.updated_at))
+
+    def test_default_version_without_configuration(self) -> None:
+        self.assertEqual(self.registry.get().version, "default")
+
+    def test_ttl_skips_version_lookup(self) -> None:
+        self.registry.ttl = 60
+        first = self.registry.get()
+        with self.assertNumQueries(0):
+            self.assertIs(self.registry.get(), first)
+
+        self.registry.invalidate()
+        with self.assertNumQueries(1):
+            self.registry.get()
+
+    def test_rag_chain_version_follows_configuration(self) -> None:
+        configuration = ConfigurationFactory()
+        configuration.refresh_from_db()
+        with patch("vex.ai.rag.ChatOpenAI"):
+            self.assertEqual(RagChain().version, configuration_version(configuration.updated_at))
+
+
+class RagChainPromptTestCase(TestCase):
+    def setUp(self) -> None:
+        ConfigurationFactory(
+            system_prompt="You are Vex.",
+            i18n={"pl": {"system_prompt": "Jesteś Vex.", "user_prompt": "Pytanie: {question}\nKontekst: {context}"}},
+        )
+        with patch("vex.ai.rag.ChatOpenAI"):
+            self.chain = RagChain()
+
+    def test_prompt_is_compiled_once_per_locale(self) -> None:
+        with self.assertNumQueries(0):  # translations are prefetched with the configuration
+            english = self.chain.prompt({"locale": "en"})
+            polish = self.chain.prompt({"locale": "pl"})
+
+        self.assertIs(self.chain.prompt({"locale": "en"}), english)
+        self.assertIs(self.chain.prompt({"locale": "pl"}), polish)
+        self.assertIsNot(english, polish)
+
+        values = {"question": "Q", "context": "C", "history": []}
+        self.assertEqual(english.invoke(values).messages[0].content, "You are Vex.")
+        self.assertEqual(polish.invoke(values).messages[0].content, "Jesteś Vex.")
+        self.assertEqual(polish.invoke(values).messages[-1].content, "Pytanie: Q\nKontekst: C")
+
+    def test_prompt_defaults_to_default_language(self) -> None:
+        self.assertIs(self.chain.prompt({}), self.chain.prompt({"locale": "en"}))
+
+    def test_prompt_cache_is_bounded(self) -> None:
+        self.chain.PROMPT_CACHE_SIZE = 1
+        self.chain.prompt({"locale": "en"})
+        self.chain.prompt({"locale": "xx"})
+        self.assertEqual(len(self.chain._prompts), 1)
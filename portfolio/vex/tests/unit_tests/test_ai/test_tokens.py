@@ -0,0 +1,52 @@
+from unittest.mock import MagicMock, patch
+
+from django.test import SimpleTestCase
+
+from vex.ai.tokens import count_tokens, encoding_for, truncate_tokens
+
+
+class CountTokensTestCase(SimpleTestCase):
+    def setUp(self) -> None:
+        encoding_for.cache_clear()
+        self.addCleanup(encoding_for.cache_clear)
+
+    def test_counts_with_tokenizer(self) -> None:
+        encoding = MagicMock()
+        encoding.encode.return_value = [1, 2, 3]
+        with patch("vex.ai.tokens.tiktoken.encoding_for_model", return_value=encoding):
+            self.assertEqual(count_tokens("hello world", model="gpt-4o-mini"), 3)
+            self.assertEqual(count_tokens("again", model="gpt-4o-mini"), 3)
+        encoding.encode.assert_called_with("again", disallowed_special=())
+
+    def test_unknown_model_uses_default_encoding(self) -> None:
+        with (
+            patch("vex.ai.tokens.tiktoken.encoding_for_model", side_effect=KeyError("model")),
+            patch("vex.ai.tokens.tiktoken.get_encoding") as get_encoding,
+        ):
+            self.assertIs(encoding_for("unknown-model"), get_encoding.return_value)
+        get_encoding.assert_called_once_with("o200k_base")
+
+    def test_estimates_when_tokenizer_unavailable(self) -> None:
+        with patch("vex.ai.tokens.tiktoken.encoding_for_model", side_effect=OSError("offline")) as loader:
+            with self.assertLogs("vex.ai.tokens", level="WARNING"):
+                self.assertEqual(count_tokens("abcdefghi", model="gpt-4o-mini"), 3)
+            self.assertEqual(count_tokens("abcd", model="gpt-4o-mini"), 1)
+        loader.assert_called_once()  # the failure is cached as well
+
+    def test_empty_text_has_no_tokens(self) -> None:
+        self.assertEqual(count_tokens(""), 0)
+
+    def test_truncates_with_tokenizer(self) -> None:
+        encoding = MagicMock()
+        encoding.encode.return_value = [1, 2, 3, 4]
+        encoding.decode.return_value = "head"
+        with patch("vex.ai.tokens.tiktoken.encoding_for_model", return_value=encoding):
+            self.assertEqual(truncate_tokens("head tail", 2, model="gpt-4o-mini"), "head")
+            self.assertEqual(truncate_tokens("head tail", 4, model="gpt-4o-mini"), "head tail")
+        encoding.decode.assert_called_once_with([1, 2])
+
+    def test_truncates_by_estimate_when_tokenizer_unavailable(self) -> None:
+        with patch("vex.ai.tokens.tiktoken.encoding_for_model", side_effect=OSError("offline")):
+            with self.assertLogs("vex.ai.tokens", level="WARNING"):
+                self.assertEqual(truncate_tokens("abcdefghij", 2, model="gpt-4o-mini"), "abcdefgh")
+        self.assertEqual(truncate_tokens("abc", 0), "")
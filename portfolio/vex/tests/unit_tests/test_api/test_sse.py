@@ -1,45 +1,237 @@
+import asyncio
+import json
 from unittest.mock import patch
 
-from django.test import TestCase
+from django.test import SimpleTestCase, TestCase, override_settings
 from django.urls import reverse
+from prometheus_client import REGISTRY
+
+from utils.timing import mark
+from vex.api.sse import coalesce, heartbeat, sse_event
+
+
+async def consume(response) -> str:
+    return b"".join([part async for part in response.streaming_content]).decode("utf-8")
 
 
 class SSEChatViewTestCase(TestCase):
-    def test_stream_requires_question(self) -> None:
+    async def test_stream_requires_question(self) -> None:
         url = reverse("vex:stream")
-        resp = self.client.get(url)  # no question param
+        resp = await self.async_client.get(url)  # no question param
         self.assertEqual(resp.status_code, 400)
         self.assertIn(b"must contain a question", resp.content)
 
-    def test_stream_happy_path(self) -> None:
+    async def test_stream_happy_path(self) -> None:
         url = reverse("vex:stream")
 
         class FakeChain:
-            def stream(self, *_args, **_kwargs):
+            async def astream(self, *_args, **_kwargs):
                 yield "hello"
                 yield ""
                 yield "world"
 
         with patch("vex.api.sse.get_rag_chain", return_value=FakeChain()):
-            resp = self.client.get(url, {"question": "Q", "session_key": "S", "locale": "en"})
+            resp = await self.async_client.get(url, {"question": "Q", "session_key": "S", "locale": "en"})
             self.assertEqual(resp.status_code, 200)
-            body = b"".join(resp.streaming_content)
-            text = body.decode("utf-8")
+            self.assertTrue(resp.is_async)
+            text = await consume(resp)
             self.assertIn("event: received", text)
-            self.assertIn("data: hello", text)
-            self.assertIn("data: world", text)
+            self.assertIn("data: helloworld\n\n", text)  # coalesced into one frame
             self.assertIn("event: finished", text)
 
-    def test_stream_error_path(self) -> None:
+    async def test_stream_frames_multi_line_chunks(self) -> None:
+        url = reverse("vex:stream")
+
+        class MultiLineChain:
+            async def astream(self, *_args, **_kwargs):
+                yield "first line\n"
+                yield "- second\r\n\nthird"
+
+        with patch("vex.api.sse.get_rag_chain", return_value=MultiLineChain()):
+            resp = await self.async_client.get(url, {"question": "Q"})
+            text = await consume(resp)
+
+        self.assertIn("data: first line\ndata: - second\ndata: \ndata: third\n\n", text)
+
+    @override_settings(SSE_HEARTBEAT_INTERVAL=0.05)
+    async def test_stream_sends_heartbeats_while_waiting(self) -> None:
+        url = reverse("vex:stream")
+
+        class SlowChain:
+            async def astream(self, *_args, **_kwargs):
+                await asyncio.sleep(0.2)
+                yield "late"
+
+        with patch("vex.api.sse.get_rag_chain", return_value=SlowChain()):
+            resp = await self.async_client.get(url, {"question": "Q"})
+            text = await consume(resp)
+
+        self.assertIn(": ping\n\n", text)
+        self.assertLess(text.index(": ping"), text.index("data: late"))
+
+    async def test_stream_disconnect_cancels_chain(self) -> None:
+        url = reverse("vex:stream")
+        state = {"closed": False}
+
+        class EndlessChain:
+            async def astream(self, *_args, **_kwargs):
+                try:
+                    yield "first"
+                    await asyncio.sleep(10)
+                    yield "never"  # pragma: no cover
+                finally:
+                    state["closed"] = True
+
+        with patch("vex.api.sse.get_rag_chain", return_value=EndlessChain()):
+            resp = await self.async_client.get(url, {"question": "Q"})
+            received: list[bytes] = []
+
+            async def read() -> None:
+                async for part in resp.streaming_content:
+                    received.append(part)
+
+            streams = REGISTRY.get_sample_value("vex_sse_streams_active")
+            task = asyncio.create_task(read())
+            while not any(b"first" in part for part in received):
+                await asyncio.sleep(0.01)
+            self.assertEqual(REGISTRY.get_sample_value("vex_sse_streams_active"), streams + 1)
+            task.cancel()  # what the ASGI handler does once the client disconnects
+            with self.assertRaises(asyncio.CancelledError):
+                await task
+
+        self.assertTrue(state["closed"])
+        self.assertEqual(REGISTRY.get_sample_value("vex_sse_streams_active"), streams)
+
+    async def test_stream_reports_stage_timings(self) -> None:
+        url = reverse("vex:stream")
+
+        class MarkingChain:
+            async def astream(self, *_args, **_kwargs):
+                mark("llm")  # what RagChain.prompt does before the model is called
+                await asyncio.sleep(0.01)
+                yield "hello"
+
+        with patch("vex.api.sse.get_rag_chain", return_value=MarkingChain()):
+            resp = await self.async_client.get(url, {"question": "Q"})
+            text = await consume(resp)
+
+        frames = text.strip().split("\n\n")
+        self.assertTrue(frames[-2].startswith("event: timing\ndata: "))
+        self.assertEqual(frames[-1], "event: finished\ndata: done")
+        timings = json.loads(frames[-2].split("data: ", 1)[1])
+        self.assertEqual(set(timings), {"session", "llm_ttft", "llm_total", "total"})
+        self.assertGreaterEqual(timings["llm_ttft"], 10.0)
+
+    async def test_stream_passes_session_and_locale_to_chain(self) -> None:
+        url = reverse("vex:stream")
+        calls: list[tuple] = []
+
+        class RecordingChain:
+            async def astream(self, payload, config):
+                calls.append((payload, config))
+                yield "ok"
+
+        with patch("vex.api.sse.get_rag_chain", return_value=RecordingChain()):
+            resp = await self.async_client.get(url, {"question": " Q ", "session_key": "S", "locale": "pl"})
+            await consume(resp)
+
+        self.assertEqual(calls, [({"question": "Q", "locale": "pl"}, {"configurable": {"session_id": "S"}})])
+
+    async def test_stream_creates_session_when_missing(self) -> None:
+        url = reverse("vex:stream")
+        calls: list[dict] = []
+
+        class RecordingChain:
+            async def astream(self, _payload, config):
+                calls.append(config)
+                yield "ok"
+
+        with patch("vex.api.sse.get_rag_chain", return_value=RecordingChain()):
+            resp = await self.async_client.get(url, {"question": "Q"})
+            await consume(resp)
+
+        self.assertTrue(calls[0]["configurable"]["session_id"])
+
+    async def test_stream_error_path(self) -> None:
         url = reverse("vex:stream")
 
         class BoomChain:
-            def stream(self, *_args, **_kwargs):
+            async def astream(self, *_args, **_kwargs):
                 raise RuntimeError("boom")
+                yield  # pylint: disable=unreachable
 
         with patch("vex.api.sse.get_rag_chain", return_value=BoomChain()):
-            resp = self.client.get(url, {"question": "Q"})
+            resp = await self.async_client.get(url, {"question": "Q"})
             self.assertEqual(resp.status_code, 200)
-            text = b"".join(resp.streaming_content).decode("utf-8")
+            text = await consume(resp)
             self.assertIn("event: error", text)
             self.assertIn("boom", text)
+
+
+async def produce(*items: str | float):
+    for item in items:
+        if isinstance(item, float):
+            await asyncio.sleep(item)
+        else:
+            yield item
+
+
+async def collect(chunks, *, max_bytes: int, max_delay: float) -> list[str]:
+    return [text async for text in coalesce(chunks, max_bytes=max_bytes, max_delay=max_delay)]
+
+
+class SSEEventTestCase(SimpleTestCase):
+    def test_single_line(self) -> None:
+        self.assertEqual(sse_event("hello"), "data: hello\n\n")
+        self.assertEqual(sse_event("ok", event="received"), "event: received\ndata: ok\n\n")
+
+    def test_every_line_gets_a_data_field(self) -> None:
+        self.assertEqual(sse_event("a\nb\r\nc\rd\n"), "data: a\ndata: b\ndata: c\ndata: d\ndata: \n\n")
+
+
+class HeartbeatTestCase(SimpleTestCase):
+    async def test_fills_idle_gaps_only(self) -> None:
+        frames = [frame async for frame in heartbeat(produce("a", 0.12, "b", "c"), interval=0.05)]
+        self.assertEqual(frames[0], "a")
+        self.assertEqual(frames[-2:], ["b", "c"])
+        self.assertIn(len(frames), (4, 5))  # one or two heartbeats while waiting for "b"
+        self.assertTrue(all(frame == ": ping\n\n" for frame in frames[1:-2]))
+
+
+class CoalesceTestCase(SimpleTestCase):
+    async def test_flushes_by_size(self) -> None:
+        chunks = await collect(produce("ab", "cd", "", "ef", "g"), max_bytes=4, max_delay=10.0)
+        self.assertEqual(chunks, ["abcd", "efg"])
+
+    async def test_counts_bytes_not_characters(self) -> None:
+        chunks = await collect(produce("żó", "ł"), max_bytes=4, max_delay=10.0)
+        self.assertEqual(chunks, ["żó", "ł"])
+
+    async def test_flushes_by_time(self) -> None:
+        chunks = await collect(produce("a", "b", 0.2, "c", 0.2, "d"), max_bytes=1024, max_delay=0.05)
+        self.assertEqual(chunks, ["ab", "c", "d"])
+
+    async def test_propagates_source_errors(self) -> None:
+        async def failing():
+            yield "a"
+            raise RuntimeError("boom")
+
+        with self.assertRaisesMessage(RuntimeError, "boom"):
+            await collect(failing(), max_bytes=1024, max_delay=10.0)
+
+    async def test_closing_cancels_pending_read(self) -> None:
+        cancelled = asyncio.Event()
+
+        async def endless():
+            yield "a"
+            try:
+                await asyncio.sleep(10)
+            except asyncio.CancelledError:
+                cancelled.set()
+                raise
+            yield "b"  # pragma: no cover
+
+        stream = coalesce(endless(), max_bytes=1024, max_delay=0.01)
+        self.assertEqual(await anext(stream), "a")
+        await stream.aclose()
+        await asyncio.wait_for(cancelled.wait(), 1)
@@ -0,0 +1,21 @@
+from django.core.management import call_command
+from django.core.management.base import SystemCheckError
+from django.test import SimpleTestCase, override_settings
+
+from vex.checks import check_embedding_model
+
+
+class EmbeddingModelCheckTestCase(SimpleTestCase):
+    def test_model_of_the_column_dimensions_passes(self) -> None:
+        with override_settings(VECTOR_TEXT_EMBEDDING_MODEL="text-embedding-3-small"):
+            self.assertEqual(check_embedding_model(), [])
+
+    def test_model_of_other_dimensions_is_an_error(self) -> None:
+        with override_settings(VECTOR_TEXT_EMBEDDING_MODEL="text-embedding-3-large"):
+            self.assertEqual([message.id for message in check_embedding_model()], ["vex.E001"])
+            with self.assertRaises(SystemCheckError):
+                call_command("check")
+
+    def test_unknown_model_is_a_warning(self) -> None:
+        with override_settings(VECTOR_TEXT_EMBEDDING_MODEL="nomic-embed-text"):
+            self.assertEqual([message.id for message in check_embedding_model()], ["vex.W001"])
@@ -0,0 +1,183 @@
+from datetime import timedelta
+from typing import cast
+from unittest.mock import MagicMock, patch
+
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from vex.actions.inject_documents import InjectionReport, inject_documents
+from vex.ai.database.store import ChunkStore
+from vex.choices import JobStatuses
+from vex.jobs import claim, run
+from vex.models import ContentVersion, Document, IngestionJob
+from vex.tests.factories import DocumentFactory, vector
+
+
+class QueueTestCase(TestCase):
+    def test_saving_a_document_queues_it_once(self) -> None:
+        document = DocumentFactory(injected=False)
+        document.title = "Edited"
+        document.save()
+
+        self.assertEqual(list(document.jobs.values_list("status", flat=True)), [JobStatuses.QUEUED])
+
+    def test_injected_documents_are_not_queued(self) -> None:
+        document = DocumentFactory(injected=True)
+        self.assertFalse(document.jobs.exists())
+
+    def test_changing_the_source_of_an_injected_document_queues_it_again(self) -> None:
+        document = DocumentFactory(url="https://example.com/cv.pdf", file=None, injected=True)
+        document.url = "https://example.com/cv-2026.pdf"
+        document.save()
+
+        document.refresh_from_db()
+        self.assertFalse(document.injected)
+        self.assertEqual(list(document.jobs.values_list("status", flat=True)), [JobStatuses.QUEUED])
+
+    def test_marking_as_injected_does_not_queue_it_again(self) -> None:
+        document = DocumentFactory(url="https://example.com/cv.pdf", file=None, injected=False)
+        document.jobs.all().delete()
+
+        document.mark_as_injected("digest")
+
+        document.refresh_from_db()
+        self.assertTrue(document.injected)
+        self.assertFalse(document.jobs.exists())
+
+    def test_claims_the_longest_waiting_job_and_leases_it(self) -> None:
+        first, second = DocumentFactory(injected=False), DocumentFactory(injected=False)
+
+        job = claim()
+
+        self.assertIsNotNone(job)
+        job = cast(IngestionJob, job)
+        job.refresh_from_db()
+        self.assertEqual((job.document, job.status, job.attempts), (first, JobStatuses.RUNNING, 1))
+        self.assertGreater(job.available_at, timezone.now() + timedelta(seconds=60))
+        self.assertEqual(getattr(claim(), "document", None), second)
+        self.assertIsNone(claim())
+
+    def test_workers_skip_jobs_locked_by_each_other(self) -> None:
+        DocumentFactory(injected=False)
+        with CaptureQueriesContext(connection) as queries:
+            claim()
+        lock = 'FOR UPDATE OF "vex_ingestionjob", "vex_document" SKIP LOCKED'  # the document's other jobs too
+        self.assertTrue(any(lock in query["sql"] for query in queries.captured_queries))
+
+    def test_document_is_not_claimed_again_while_one_of_its_jobs_runs(self) -> None:
+        document = DocumentFactory(injected=False)
+        running = claim()
+        IngestionJob.objects.create(document=document)  # saved again while it is injected
+        other = DocumentFactory(injected=False)
+
+        self.assertEqual(getattr(claim(), "document", None), other)
+        self.assertIsNone(claim())
+
+        IngestionJob.objects.filter(pk=getattr(running, "pk", None)).update(status=JobStatuses.DONE)
+        self.assertEqual(getattr(claim(), "document", None), document)
+
+    def test_job_of_a_lost_worker_is_claimed_again_once_its_lease_expires(self) -> None:
+        DocumentFactory(injected=False)
+        job = claim()
+        self.assertIsNotNone(job)
+        job = cast(IngestionJob, job)
+        self.assertIsNone(claim())
+
+        IngestionJob.objects.filter(pk=job.pk).update(available_at=timezone.now() - timedelta(seconds=1))
+        reclaimed = claim()
+
+        self.assertEqual(getattr(reclaimed, "pk", None), job.pk)
+        self.assertEqual(getattr(reclaimed, "attempts", None), 2)
+
+
+@override_settings(INGESTION_MAX_ATTEMPTS=2, INGESTION_RETRY_DELAY=30)
+class RunTestCase(TestCase):
+    def setUp(self) -> None:
+        self.document = DocumentFactory(injected=False)
+        job = claim()
+        self.assertIsNotNone(job)
+        self.job = cast(IngestionJob, job)
+
+    @patch("vex.jobs.inject_documents")
+    def test_done_job_keeps_progress_and_throughput(self, inject) -> None:
+        def injected(_documents, on_progress):
+            on_progress(3, 4)
+            self.job.refresh_from_db()
+            self.assertEqual(self.job.progress, 75)
+            return InjectionReport(documents=1, chunks=4, reused=0, removed=0, tokens=1200, seconds=1.0)
+
+        inject.side_effect = injected
+        run(self.job)
+
+        self.job.refresh_from_db()
+        self.assertEqual(self.job.status, JobStatuses.DONE)
+        self.assertEqual((self.job.chunks_done, self.job.tokens, self.job.progress), (4, 1200, 100))
+        self.assertIsNotNone(self.job.seconds)
+        inject.assert_called_once()
+        self.assertEqual(inject.call_args.args[0], [self.document])
+
+    def test_document_edited_while_its_job_runs_keeps_the_edit_and_is_queued_again(self) -> None:
+        embeddings = MagicMock()
+        embeddings.embed_documents.side_effect = lambda texts: [vector(1.0)] * len(texts)
+
+        def edited_meanwhile(documents, on_progress):
+            document = Document.objects.get(pk=self.document.pk)  # as the admin saves it
+            document.title, document.url = "Edited", "https://example.com/new.pdf"
+            document.save()
+            return inject_documents(documents, on_progress=on_progress)
+
+        with (
+            patch("vex.actions.inject_documents.store", return_value=ChunkStore(embeddings)),
+            patch("vex.jobs.inject_documents", side_effect=edited_meanwhile),
+        ):
+            run(self.job)
+
+        self.document.refresh_from_db()
+        self.assertEqual((self.document.title, self.document.url), ("Edited", "https://example.com/new.pdf"))
+        self.assertFalse(self.document.injected)
+        self.assertEqual(
+            list(self.document.jobs.order_by("pk").values_list("status", flat=True)),
+            [JobStatuses.DONE, JobStatuses.QUEUED],
+        )
+
+    @patch("vex.jobs.inject_documents", side_effect=RuntimeError("API down"))
+    def test_failed_job_is_retried_after_a_delay_then_given_up(self, _inject) -> None:
+        version = ContentVersion.current()
+        run(self.job)
+
+        self.assertGreater(ContentVersion.current(), version)  # the chunks written before the failure are served
+
+        self.job.refresh_from_db()
+        self.assertEqual((self.job.status, self.job.error), (JobStatuses.QUEUED, "RuntimeError: API down"))
+        self.assertGreater(self.job.available_at, timezone.now() + timedelta(seconds=20))
+        self.assertIsNone(claim())  # not before the delay
+
+        IngestionJob.objects.filter(pk=self.job.pk).update(available_at=timezone.now())
+        job = claim()
+        self.assertIsNotNone(job)
+        job = cast(IngestionJob, job)
+        run(job)
+
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), (JobStatuses.FAILED, 2))
+
+    @patch("vex.jobs.inject_documents")
+    def test_job_whose_workers_keep_dying_is_given_up(self, inject) -> None:
+        IngestionJob.objects.filter(pk=self.job.pk).update(attempts=2, available_at=timezone.now())
+        job = claim()
+        self.assertIsNotNone(job)
+        job = cast(IngestionJob, job)
+
+        run(job)
+
+        inject.assert_not_called()
+        job.refresh_from_db()
+        self.assertEqual(job.status, JobStatuses.FAILED)
+
+    @patch("vex.jobs.inject_documents", side_effect=RuntimeError("Document gone"))
+    def test_job_of_a_deleted_document_is_not_brought_back(self, _inject) -> None:
+        self.document.delete()
+        run(self.job)
+        self.assertFalse(IngestionJob.objects.exists())
@@ -0,0 +1,35 @@
+from io import StringIO
+from unittest.mock import MagicMock, patch
+
+from django.core.management import call_command
+from django.test import TestCase
+
+from vex.choices import JobStatuses
+from vex.models import IngestionJob
+from vex.tests.factories import DocumentFactory
+
+
+class IngestionWorkerCommandTestCase(TestCase):
+    @patch("vex.jobs.inject_documents")
+    def test_burst_runs_queued_jobs_and_exits(self, inject) -> None:
+        DocumentFactory.create_batch(3, injected=False)
+        inject.return_value.chunks = inject.return_value.tokens = 0
+
+        call_command("ingestion_worker", "--burst", stdout=StringIO())
+
+        self.assertEqual(inject.call_count, 3)
+        self.assertEqual(IngestionJob.objects.filter(status=JobStatuses.DONE).count(), 3)
+
+    @patch("vex.management.commands.ingestion_worker.multiprocessing.get_context")
+    def test_starts_and_waits_for_worker_processes(self, get_context) -> None:
+        processes = [MagicMock(), MagicMock()]
+        get_context.return_value.Process.side_effect = processes
+        out = StringIO()
+
+        call_command("ingestion_worker", "--processes", "2", "--burst", stdout=out)
+
+        self.assertEqual(get_context.call_args.args, ("fork",))
+        for process in processes:
+            process.start.assert_called_once()
+            process.join.assert_called_once()
+        self.assertIn("Started 2 ingestion workers", out.getvalue())
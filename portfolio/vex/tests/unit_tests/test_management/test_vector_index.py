@@ -0,0 +1,66 @@
+from io import StringIO
+
+from django.core.management import call_command
+from django.db import connection
+from django.test import TransactionTestCase
+from django.test.utils import CaptureQueriesContext
+
+from vex.tests.factories import ChunkFactory, DocumentFactory, vector
+
+
+def index_definition(locale: str = "en") -> str:
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT indexdef FROM pg_indexes WHERE indexname = %s", [f"vex_chunk_embedding_hnsw_{locale}"])
+        return cursor.fetchone()[0]
+
+
+class VectorIndexCommandTestCase(TransactionTestCase):
+    serialized_rollback = True  # The tables are flushed after every test - the row of ContentVersion is restored
+
+    def setUp(self) -> None:
+        # Built concurrently, outside of the transaction of a TestCase - the indexes of the schema are restored after
+        self.addCleanup(self.call)
+
+    def call(self, *args: str) -> str:
+        out = StringIO()
+        call_command("vector_index", *args, stdout=out)
+        return out.getvalue()
+
+    def test_rebuilds_index_and_reports_before_and_after(self) -> None:
+        document = DocumentFactory()
+        for i in range(5):
+            ChunkFactory(document=document, embedding=vector(1.0, float(i)))
+        output = self.call("--m", "8", "--ef-construction", "32", "--queries", "3", "--ef-search", "20")
+
+        self.assertIn("m='8'", index_definition())
+        self.assertIn("ef_construction='32'", index_definition())
+        self.assertIn("HNSW indexes of 2 locales rebuilt", output)
+        self.assertIn("Before (ef_search=20", output)
+        self.assertIn("After (ef_search=20", output)
+        self.assertEqual(output.count("Latency over 3 searches"), 2)
+        self.assertIn("Execution Time", output)
+
+    def test_rebuilds_with_new_parameters(self) -> None:
+        self.call("--m", "4")
+        self.call("--m", "12")
+        self.assertIn("m='12'", index_definition("en"))
+        self.assertIn("m='12'", index_definition("pl"))
+        self.assertIn("WHERE ((locale)::text = 'pl'::text)", index_definition("pl"))
+
+    def test_builds_next_to_the_old_index_without_locking_searches(self) -> None:
+        with CaptureQueriesContext(connection) as queries:
+            self.call("--m", "8")
+
+        statements = [query["sql"] for query in queries.captured_queries]
+        self.assertTrue(
+            any(sql.startswith('CREATE INDEX CONCURRENTLY "vex_chunk_embedding_hnsw_en_new"') for sql in statements)
+        )
+        self.assertTrue(
+            any(sql.startswith('DROP INDEX CONCURRENTLY IF EXISTS "vex_chunk_embedding_hnsw_en"') for sql in statements)
+        )
+        self.assertIn("m='8'", index_definition("en"))
+
+    def test_empty_store_builds_without_measuring(self) -> None:
+        output = self.call()
+        self.assertIn("USING hnsw", index_definition())
+        self.assertNotIn("Latency", output)
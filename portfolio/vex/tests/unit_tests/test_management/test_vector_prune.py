@@ -0,0 +1,49 @@
+from io import StringIO
+
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+
+from vex.choices import JobStatuses
+from vex.models import Chunk, ContentVersion, Document
+from vex.tests.factories import ChunkFactory, DocumentFactory
+
+
+class VectorPruneCommandTestCase(TestCase):
+    def setUp(self) -> None:
+        self.injected = ChunkFactory(document=DocumentFactory(injected=True))
+        self.queued = ChunkFactory(document=DocumentFactory(injected=False))  # Re-injection pending
+
+        unsourced = DocumentFactory(injected=True)
+        ChunkFactory.create_batch(3, document=unsourced)
+        Document.objects.filter(pk=unsourced.pk).update(url=None)  # Past the signals, as a bulk update would
+
+        abandoned = DocumentFactory(injected=False)
+        abandoned.jobs.update(status=JobStatuses.FAILED)
+        ChunkFactory.create_batch(2, document=abandoned)
+
+    def call(self, *args: str) -> str:
+        out = StringIO()
+        call_command("vector_prune", *args, stdout=out)
+        return out.getvalue()
+
+    def test_removes_orphans_in_batches(self) -> None:
+        version = ContentVersion.current()
+        with CaptureQueriesContext(connection) as queries:
+            output = self.call("--batch-size", "2")
+
+        self.assertGreater(ContentVersion.current(), version)  # no signals sent by the bulk deletes
+
+        self.assertIn("5 orphan chunks removed", output)
+        self.assertCountEqual(Chunk.objects.all(), [self.injected, self.queued])
+        deletes = [query["sql"] for query in queries if query["sql"].startswith('DELETE FROM "vex_chunk"')]
+        self.assertEqual(len(deletes), 3)
+
+    def test_dry_run_only_counts(self) -> None:
+        version = ContentVersion.current()
+        output = self.call("--dry-run")
+
+        self.assertIn("5 orphan chunks found", output)
+        self.assertEqual(ContentVersion.current(), version)
+        self.assertEqual(Chunk.objects.count(), 7)
@@ -59,6 +59,14 @@ class VexModelsTestCase(TestCase):
     def test_document_mark_as_injected(self) -> None:
         doc = Document.objects.create(title="Guide")
         self.assertFalse(doc.injected)
-        doc.mark_as_injected()
+        self.assertTrue(doc.mark_as_injected())
         doc.refresh_from_db()
         self.assertTrue(doc.injected)
+
+    def test_document_changed_since_read_is_not_marked_as_injected(self) -> None:
+        doc = Document.objects.create(title="Guide", url="https://example.com/guide.pdf")
+        Document.objects.filter(pk=doc.pk).update(url="https://example.com/guide-2026.pdf")
+
+        self.assertFalse(doc.mark_as_injected("digest"))
+        doc.refresh_from_db()
+        self.assertEqual((doc.injected, doc.digest, doc.url), (False, "", "https://example.com/guide-2026.pdf"))
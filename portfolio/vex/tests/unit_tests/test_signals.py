@@ -0,0 +1,114 @@
+from unittest.mock import patch
+
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+
+from university.models import Publication
+from vex.ai.answers import answer_cache
+from vex.ai.rag import chain_registry
+from vex.models import Chunk, Configuration, ContentVersion, Document
+from vex.signals import answer_sources
+from vex.tests.factories import ChunkFactory, ConfigurationFactory, DocumentFactory
+from work.models import Skill
+from work.tests.factories import SkillFactory
+
+
+class AnswerCacheInvalidationTestCase(TestCase):
+    def setUp(self) -> None:
+        answer_cache.clear()
+        self.addCleanup(answer_cache.clear)
+
+    def fill(self) -> None:
+        answer_cache.set([1.0, 0.0], "cached", locale="en", version="v1")
+        self.assertEqual(answer_cache.stats["size"], 1)
+
+    def test_sources_include_content_translations_and_configuration(self) -> None:
+        sources = answer_sources()
+        for model in (Skill, Publication, Configuration, Document):
+            self.assertIn(model, sources)
+        self.assertIn(Skill._parler_meta.root_model, sources)  # pylint: disable=protected-access
+        self.assertIn(Configuration._parler_meta.root_model, sources)  # pylint: disable=protected-access
+
+    def test_saving_portfolio_content_clears_cache(self) -> None:
+        self.fill()
+        SkillFactory()
+        self.assertEqual(answer_cache.stats["size"], 0)
+
+    def test_changing_portfolio_content_bumps_content_version_for_other_workers(self) -> None:
+        skill = SkillFactory()
+        before = ContentVersion.current()
+        skill.delete()
+        self.assertGreater(ContentVersion.current(), before)
+
+    def test_deleting_document_clears_cache(self) -> None:
+        document = DocumentFactory()
+        self.fill()
+        document.delete()
+        self.assertEqual(answer_cache.stats["size"], 0)
+
+    def test_saving_configuration_translation_clears_cache(self) -> None:
+        configuration = ConfigurationFactory()
+        self.fill()
+        configuration.set_current_language("pl")
+        configuration.system_prompt = "Jesteś pomocnym asystentem."
+        configuration.save_translations()
+        self.assertEqual(answer_cache.stats["size"], 0)
+
+
+class RagChainInvalidationTestCase(TestCase):
+    def test_configuration_save_invalidates_registry(self) -> None:
+        configuration = ConfigurationFactory()
+        with patch.object(chain_registry, "invalidate") as invalidate:
+            configuration.save()
+        invalidate.assert_called_once()
+
+    def test_translation_save_bumps_configuration_version(self) -> None:
+        configuration = ConfigurationFactory()
+        before = Configuration.objects.get(pk=configuration.pk).updated_at
+
+        configuration.set_current_language("pl")
+        configuration.user_prompt = "Pytanie: {question}\nKontekst: {context}"
+        with patch.object(chain_registry, "invalidate") as invalidate:
+            configuration.save_translations()
+
+        invalidate.assert_called()
+        self.assertGreater(Configuration.objects.get(pk=configuration.pk).updated_at, before)
+
+
+class ChunkCleanupTestCase(TestCase):
+    def test_deleting_document_removes_its_chunks_in_one_indexed_statement(self) -> None:
+        document, other = DocumentFactory(injected=True), DocumentFactory(injected=True)
+        ChunkFactory.create_batch(3, document=document)
+        kept = ChunkFactory(document=other)
+
+        with CaptureQueriesContext(connection) as queries:
+            document.delete()
+
+        deletes = [query["sql"] for query in queries if query["sql"].startswith('DELETE FROM "vex_chunk"')]
+        self.assertEqual(len(deletes), 1)
+        self.assertEqual(list(Chunk.objects.all()), [kept])
+        with connection.cursor() as cursor:
+            cursor.execute("SET LOCAL enable_seqscan = off")
+            cursor.execute(f"EXPLAIN {deletes[0]}")
+            plan = "\n".join(row[0] for row in cursor.fetchall())
+        self.assertIn("vex_chunk_document_id", plan)
+
+    def test_removing_the_source_removes_the_chunks(self) -> None:
+        document = DocumentFactory(injected=True)
+        ChunkFactory.create_batch(2, document=document)
+
+        document.url = None
+        document.save()
+
+        self.assertFalse(document.chunks.exists())
+
+    def test_replacing_the_source_keeps_the_chunks_for_reinjection(self) -> None:
+        document = DocumentFactory(injected=True)
+        ChunkFactory.create_batch(2, document=document)
+
+        document.url = "https://example.com/new.pdf"
+        document.save()
+
+        self.assertEqual(document.chunks.count(), 2)
+        self.assertTrue(document.jobs.exists())
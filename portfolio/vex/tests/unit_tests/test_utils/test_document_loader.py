@@ -0,0 +1,98 @@
+import shutil
+import tempfile
+from concurrent.futures import Future
+from concurrent.futures.process import BrokenProcessPool
+from pathlib import Path
+from unittest.mock import MagicMock, patch
+
+import pymupdf
+from django.test import SimpleTestCase
+
+from vex.utils.document_loader import DocumentLoader
+
+
+class DocumentLoaderTestCase(SimpleTestCase):
+    def setUp(self) -> None:
+        self.directory = Path(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, self.directory, ignore_errors=True)
+
+    def pdf(self, pages: list[str], name: str = "document.pdf") -> str:
+        path = self.directory / name
+        with pymupdf.open() as pdf:
+            for text in pages:
+                page = pdf.new_page()
+                if text:
+                    page.insert_text((72, 72), text)
+            pdf.save(path)
+        return str(path)
+
+    def test_pdf_is_read_page_by_page(self) -> None:
+        loader = DocumentLoader(self.pdf(["First page", "", "Third page"]))
+        pages = loader.lazy_load()
+
+        first = next(pages)
+        self.assertEqual((first.page_content.strip(), first.metadata["page"]), ("First page", 0))
+        self.assertAlmostEqual(loader.loaded, 1 / 3)
+
+        rest = list(pages)  # the blank page is skipped
+        self.assertEqual([page.metadata["page"] for page in rest], [2])
+        self.assertEqual(loader.loaded, 1.0)
+
+    def test_long_pdf_is_read_in_ranges_by_processes_in_order(self) -> None:
+        path = self.pdf([f"Page {number}" if number != 3 else "" for number in range(7)])
+        serial = DocumentLoader(path).load()
+
+        loader = DocumentLoader(path, workers=2, pages_per_task=2)
+        parallel = loader.load()
+
+        self.assertEqual([page.metadata["page"] for page in parallel], [0, 1, 2, 4, 5, 6])
+        self.assertEqual(
+            [(page.page_content, page.metadata) for page in parallel],
+            [(page.page_content, page.metadata) for page in serial],
+        )
+        self.assertEqual(loader.loaded, 1.0)
+
+    def test_unreadable_pdf_loads_nothing(self) -> None:
+        path = self.directory / "broken.pdf"
+        path.write_bytes(b"not a pdf")
+        self.assertEqual(DocumentLoader(str(path)).load(), [])
+
+    def test_error_partway_through_a_pdf_is_raised(self) -> None:
+        loader = DocumentLoader(self.pdf(["First page", "Second page"]))
+        pages = loader.lazy_load()
+        next(pages)
+
+        with patch.object(pymupdf.Page, "get_text", side_effect=RuntimeError("damaged page")):
+            with self.assertRaises(RuntimeError):
+                next(pages)
+        self.assertLess(loader.loaded, 1.0)
+
+    def test_broken_pool_is_raised(self) -> None:
+        task: Future = Future()
+        task.set_exception(BrokenProcessPool("worker died"))
+        pool = MagicMock(submit=MagicMock(return_value=task))
+        loader = DocumentLoader(self.pdf(["Page"] * 3), workers=2, pages_per_task=2)
+
+        with patch("vex.utils.document_loader._pool", return_value=pool), self.assertRaises(BrokenProcessPool):
+            loader.load()
+        pool.shutdown.assert_called_once_with(cancel_futures=True)
+        self.assertEqual(loader.loaded, 0.0)
+
+    def test_missing_text_file_loads_nothing(self) -> None:
+        self.assertEqual(DocumentLoader(str(self.directory / "gone.txt")).load(), [])
+
+    def test_plain_text_is_read_in_sections_at_line_ends(self) -> None:
+        path = self.directory / "notes.txt"
+        path.write_text("".join(f"Line {i}\n" for i in range(10)), encoding="utf-8")
+
+        with patch.object(DocumentLoader, "SECTION_SIZE", 20):
+            sections = DocumentLoader(str(path)).load()
+
+        self.assertEqual("".join(section.page_content for section in sections), path.read_text(encoding="utf-8"))
+        self.assertEqual([section.metadata["offset"] for section in sections], [0, 21, 42, 63])
+        self.assertTrue(all(section.page_content.endswith("\n") for section in sections))
+
+    def test_empty_text_file_is_one_empty_section(self) -> None:
+        path = self.directory / "empty.txt"
+        path.write_text("", encoding="utf-8")
+        self.assertEqual([section.page_content for section in DocumentLoader(str(path)).load()], [""])
@@ -1,41 +1,123 @@
 import logging
+import multiprocessing
 import os
+from collections import deque
+from collections.abc import Iterator
+from concurrent.futures import Future, ProcessPoolExecutor
 
-from langchain_community.document_loaders import PyMuPDFLoader
+import pymupdf
 from langchain_core.documents import Document
 
 logger = logging.getLogger(__name__)
 
 
+def read_pages(path: str, start: int, stop: int) -> list[Document]:
+    """Text of the PDF's pages from `start` up to `stop`, blank ones left out. Runs in the processes of a pool."""
+    with pymupdf.open(path) as pdf:
+        return list(_pages(pdf, path, start, stop))
+
+
+def _pages(pdf: pymupdf.Document, path: str, start: int, stop: int) -> Iterator[Document]:
+    metadata = {key: value for key, value in (pdf.metadata or {}).items() if value}
+    metadata.update(source=path, file_path=path, total_pages=pdf.page_count)
+    for number in range(start, min(stop, pdf.page_count)):
+        if text := pdf[number].get_text().strip():
+            yield Document(page_content=text, metadata={**metadata, "page": number})
+
+
+def _pool(workers: int) -> ProcessPoolExecutor:
+    # Spawned, not forked - the loading process may hold database connections and threads
+    return ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
+
+
 class DocumentLoader:
-    def __init__(self, path: str) -> None:
+    SECTION_SIZE = 64 * 1024  # Characters of plain text per document yielded, cut at the end of a line
+
+    def __init__(self, path: str, *, workers: int = 1, pages_per_task: int = 32) -> None:
         self.path = path
+        self.workers = workers  # Processes parsing the ranges of pages of a PDF longer than one range
+        self.pages_per_task = pages_per_task
+        self.loaded = 0.0  # Part of the source read so far, 0-1
 
     @property
     def extension(self) -> str:
         return os.path.splitext(self.path)[1].lower()
 
     def load(self) -> list[Document]:
+        return list(self.lazy_load())
+
+    def lazy_load(self) -> Iterator[Document]:
+        """Yields the document as it is read - page by page, or section by section of plain text."""
         logger.info("Loading Document from %s with extension %s", self.path, self.extension)
 
         match self.extension:
             case ".pdf":
-                return self._load_pdf()
+                yield from self._load_pdf()
             case _:
-                return self._load_plain_text()
+                yield from self._load_plain_text()
+        self.loaded = 1.0
+
+    def _ranges(self, total: int) -> list[tuple[int, int]]:
+        return [(start, min(start + self.pages_per_task, total)) for start in range(0, total, self.pages_per_task)]
 
-    def _load_pdf(self) -> list[Document]:
+    def _load_pdf(self) -> Iterator[Document]:
+        # Only a PDF that cannot be opened loads nothing - an error partway through fails the injection,
+        # which is retried, rather than leaving the document injected with its pages up to the error
         try:
-            documents = PyMuPDFLoader(self.path).load()
+            pdf = pymupdf.open(self.path)
         except Exception as exception:  # pylint: disable=broad-exception-caught
             logger.error("Error while loading PDF. Exception: %s", exception)
-            return []
-        return [d for d in documents if (d.page_content or "").strip()]
+            return
+        with pdf:
+            total = pdf.page_count
+            if self.workers <= 1 or total <= self.pages_per_task:
+                for number in range(total):
+                    pages = list(_pages(pdf, self.path, number, number + 1))
+                    self.loaded = (number + 1) / total
+                    yield from pages
+                return
+        yield from self._load_pdf_in_parallel(total)
 
-    def _load_plain_text(self) -> list[Document]:
+    def _load_pdf_in_parallel(self, total: int) -> Iterator[Document]:
+        # Ranges are parsed ahead while the pages before them are consumed, and yielded in order.
+        # Two ranges in flight per process keep every process busy, and memory bounded whatever the length.
+        ranges = deque(self._ranges(total))
+        pending: deque[tuple[int, Future[list[Document]]]] = deque()
+        pool = _pool(self.workers)
         try:
-            with open(self.path, encoding="utf-8", errors="ignore") as f:
-                return [Document(page_content=f.read(), metadata={"source": self.path})]
-        except Exception as exception:  # pylint: disable=broad-exception-caught
-            logger.exception("Error while loading plain text. Exception: %s", exception)
-            return []
+            while ranges or pending:
+                while ranges and len(pending) < 2 * self.workers:
+                    start, stop = ranges.popleft()
+                    pending.append((stop, pool.submit(read_pages, self.path, start, stop)))
+                stop, task = pending.popleft()
+                pages = task.result()
+                self.loaded = stop / total
+                yield from pages
+        finally:
+            pool.shutdown(cancel_futures=True)
+
+    def _load_plain_text(self) -> Iterator[Document]:
+        try:
+            f = open(self.path, "rb")  # pylint: disable=consider-using-with
+        except OSError as exception:
+            logger.error("Error while loading plain text. Exception: %s", exception)
+            return
+        with f:
+            size = os.fstat(f.fileno()).st_size or 1
+            read, offset = 0, 0
+            lines: list[str] = []
+            length = 0
+            for line in f:
+                read += len(line)
+                lines.append(line.decode("utf-8", errors="ignore"))
+                length += len(lines[-1])
+                if length >= self.SECTION_SIZE:
+                    self.loaded = read / size
+                    yield self._section(lines, offset)
+                    lines, offset, length = [], offset + length, 0
+        if lines or not offset:
+            yield self._section(lines, offset)
+
+    def _section(self, lines: list[str], offset: int) -> Document:
+        # `offset` of the section in the text, added to the start index of its chunks
+        return Document(page_content="".join(lines), metadata={"source": self.path, "offset": offset})